@@ -1,4 +1,5 @@
 # alert_monitor.py
+import os
 import time
 import threading
 from datetime import datetime, timezone
@@ -6,9 +7,19 @@ from models import db, Alert
 from discord_notifier import DiscordNotifier
 import requests
 
+# 上游接口地址；设置 UPSTREAM_BASE_URL 后全部指向本地模拟交易所（python -m src.fake_exchange）
+UPSTREAM_BASE_URL = os.environ.get('UPSTREAM_BASE_URL', '').rstrip('/')
+BINANCE_API_URL = os.environ.get('BINANCE_API_URL') or (
+    f"{UPSTREAM_BASE_URL}/binance/api/v3" if UPSTREAM_BASE_URL else "https://api.binance.com/api/v3")
+EXCHANGE_RATE_API_URL = os.environ.get('EXCHANGE_RATE_API_URL') or (
+    f"{UPSTREAM_BASE_URL}/exchangerate/v4" if UPSTREAM_BASE_URL else "https://api.exchangerate-api.com/v4")
+
 class AlertMonitor:
     """价格提醒监控器"""
     
+    # 每通知成功这么多个提醒就提交一次触发状态，提交失败时最多只有这么多个提醒会在下一轮重复通知
+    TRIGGER_COMMIT_BATCH = 20
+    
     def __init__(self, app):
         self.app = app
         self.running = False
@@ -45,6 +56,9 @@ class AlertMonitor:
         # 获取所有活跃且未触发的提醒
         active_alerts = Alert.query.filter_by(is_active=True, is_triggered=False).all()
         
+        # 已通知但尚未提交触发状态的提醒，攒够一批就提交
+        notified_ids = []
+        
         for alert in active_alerts:
             try:
                 # 获取当前价格
@@ -74,16 +88,45 @@ class AlertMonitor:
                     )
                     
                     if success:
-                        # 标记为已触发
-                        alert.is_triggered = True
-                        alert.triggered_at = datetime.now(timezone.utc)
-                        db.session.commit()
+                        notified_ids.append(alert.id)
+                        if len(notified_ids) >= self.TRIGGER_COMMIT_BATCH and self._mark_triggered(notified_ids):
+                            notified_ids = []
                         print(f"提醒已触发并通知: {alert.base_currency}/{alert.quote_currency} {alert.condition_type} {alert.target_price}")
                     else:
                         print(f"Discord通知发送失败: {alert.base_currency}/{alert.quote_currency}")
                         
             except Exception as e:
                 print(f"检查提醒 {alert.id} 时出错: {e}")
+        
+        self._mark_triggered(notified_ids)
+    
+    def _mark_triggered(self, alert_ids):
+        """
+        在单个事务中批量标记提醒为已触发
+        
+        返回是否提交成功；失败时调用方保留这些ID，随下一批一起重试
+        """
+        if not alert_ids:
+            return True
+        
+        try:
+            triggered_at = datetime.now(timezone.utc)
+            for start in range(0, len(alert_ids), 500):
+                chunk = alert_ids[start:start + 500]
+                Alert.query.filter(
+                    Alert.id.in_(chunk),
+                    Alert.is_active.is_(True),
+                    Alert.is_triggered.is_(False)
+                ).update(
+                    {'is_triggered': True, 'triggered_at': triggered_at},
+                    synchronize_session=False
+                )
+            db.session.commit()
+            return True
+        except Exception as e:
+            db.session.rollback()
+            print(f"批量写入触发状态时出错: {e}")
+            return False
     
     def _get_current_price(self, base_currency, quote_currency):
         """获取当前价格数据"""
@@ -136,7 +179,7 @@ class AlertMonitor:
                 
                 if base_currency == 'USDT':
                     quote_symbol = f"{quote_currency}USDT"
-                    quote_response = requests.get(f"https://api.binance.com/api/v3/ticker/price?symbol={quote_symbol}")
+                    quote_response = requests.get(f"{BINANCE_API_URL}/ticker/price?symbol={quote_symbol}")
                     
                     if quote_response.status_code == 200:
                         quote_price = float(quote_response.json()['price'])
@@ -149,7 +192,7 @@ class AlertMonitor:
                     
                 elif quote_currency == 'USDT':
                     base_symbol = f"{base_currency}USDT"
-                    base_response = requests.get(f"https://api.binance.com/api/v3/ticker/price?symbol={base_symbol}")
+                    base_response = requests.get(f"{BINANCE_API_URL}/ticker/price?symbol={base_symbol}")
                     
                     if base_response.status_code == 200:
                         base_price = float(base_response.json()['price'])
@@ -164,8 +207,8 @@ class AlertMonitor:
                     base_symbol = f"{base_currency}USDT"
                     quote_symbol = f"{quote_currency}USDT"
                     
-                    base_response = requests.get(f"https://api.binance.com/api/v3/ticker/price?symbol={base_symbol}")
-                    quote_response = requests.get(f"https://api.binance.com/api/v3/ticker/price?symbol={quote_symbol}")
+                    base_response = requests.get(f"{BINANCE_API_URL}/ticker/price?symbol={base_symbol}")
+                    quote_response = requests.get(f"{BINANCE_API_URL}/ticker/price?symbol={quote_symbol}")
                     
                     if base_response.status_code == 200 and quote_response.status_code == 200:
                         base_price = float(base_response.json()['price'])
@@ -184,7 +227,7 @@ class AlertMonitor:
     def _get_fiat_exchange_rate(self, from_currency, to_currency):
         """获取法币汇率"""
         try:
-            url = f"https://api.exchangerate-api.com/v4/latest/{from_currency}"
+            url = f"{EXCHANGE_RATE_API_URL}/latest/{from_currency}"
             response = requests.get(url, timeout=10)
             if response.status_code == 200:
                 data = response.json()
@@ -199,12 +242,12 @@ class AlertMonitor:
         """获取加密货币对法币的汇率"""
         try:
             if fiat_symbol == 'USD':
-                url = f"https://api.binance.com/api/v3/ticker/price?symbol={crypto_symbol}USDT"
+                url = f"{BINANCE_API_URL}/ticker/price?symbol={crypto_symbol}USDT"
                 response = requests.get(url, timeout=10)
                 if response.status_code == 200:
                     return float(response.json()['price'])
             else:
-                url = f"https://api.binance.com/api/v3/ticker/price?symbol={crypto_symbol}USDT"
+                url = f"{BINANCE_API_URL}/ticker/price?symbol={crypto_symbol}USDT"
                 response = requests.get(url, timeout=10)
                 if response.status_code == 200:
                     usd_price = float(response.json()['price'])
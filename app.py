@@ -1,26 +1,52 @@
 # app.py
-from flask import Flask, jsonify, render_template, request
+from flask import Flask, Response, jsonify, render_template, request, stream_with_context
 import requests
 import pandas as pd
+from sqlalchemy import event
 from datetime import datetime, timedelta
+import base64
+import json
 import time
 import os
 from models import db, Alert
 from discord_notifier import DiscordNotifier
-from alert_monitor import AlertMonitor
+from alert_monitor import AlertMonitor, BINANCE_API_URL, EXCHANGE_RATE_API_URL
 
 app = Flask(__name__)
 
 # 数据库配置
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///crypto_alerts.db'
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///crypto_alerts.db')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
+# SQLite 连接设置：WAL 模式下网页读取不等待监控线程的写入，写入之间最多等待 busy_timeout
+SQLITE_PRAGMAS = [
+    'PRAGMA journal_mode=WAL',
+    'PRAGMA synchronous=NORMAL',
+    'PRAGMA busy_timeout=5000',
+    'PRAGMA mmap_size=268435456',
+    'PRAGMA cache_size=-65536',
+]
+
+
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    """为每个新的数据库连接执行 SQLITE_PRAGMAS"""
+    cursor = dbapi_connection.cursor()
+    for pragma in SQLITE_PRAGMAS:
+        cursor.execute(pragma)
+    cursor.close()
+
+
 # 初始化数据库
 db.init_app(app)
 
 # 创建数据库表
 with app.app_context():
+    if db.engine.dialect.name == 'sqlite':
+        event.listen(db.engine, 'connect', set_sqlite_pragmas)
     db.create_all()
+    # create_all 不会给已有的表补建索引
+    for index in Alert.__table__.indexes:
+        index.create(db.engine, checkfirst=True)
 
 # 初始化价格监控器
 alert_monitor = AlertMonitor(app)
@@ -32,7 +58,7 @@ def get_fiat_exchange_rate(from_currency, to_currency):
     """获取法币汇率（使用免费的汇率API）"""
     try:
         # 使用exchangerate-api.com的免费API
-        url = f"https://api.exchangerate-api.com/v4/latest/{from_currency}"
+        url = f"{EXCHANGE_RATE_API_URL}/latest/{from_currency}"
         response = requests.get(url, timeout=10)
         if response.status_code == 200:
             data = response.json()
@@ -48,13 +74,13 @@ def get_crypto_to_fiat_rate(crypto_symbol, fiat_symbol):
     try:
         if fiat_symbol == 'USD':
             # 直接获取加密货币对USD的价格
-            url = f"https://api.binance.com/api/v3/ticker/price?symbol={crypto_symbol}USDT"
+            url = f"{BINANCE_API_URL}/ticker/price?symbol={crypto_symbol}USDT"
             response = requests.get(url, timeout=10)
             if response.status_code == 200:
                 return float(response.json()['price'])
         else:
             # 先获取加密货币对USD的价格，再转换为目标法币
-            url = f"https://api.binance.com/api/v3/ticker/price?symbol={crypto_symbol}USDT"
+            url = f"{BINANCE_API_URL}/ticker/price?symbol={crypto_symbol}USDT"
             response = requests.get(url, timeout=10)
             if response.status_code == 200:
                 usd_price = float(response.json()['price'])
@@ -74,26 +100,46 @@ def is_fiat_currency(symbol):
 def get_binance_price_history(symbol, interval='1h', days=30):
     """通过币安API获取K线数据。"""
     limit = days * 24
-    url = "https://api.binance.com/api/v3/klines"
+    url = f"{BINANCE_API_URL}/klines"
     params = {"symbol": symbol, "interval": interval, "limit": int(limit)}
     
     try:
         r = requests.get(url, params=params)
         r.raise_for_status()
-        data = r.json()
-        
-        df = pd.DataFrame(data, columns=[
-            'timestamp', 'open', 'high', 'low', 'close', 'volume', 
-            'close_time', 'quote_asset_volume', 'number_of_trades', 
-            'taker_buy_base_asset_volume', 'taker_buy_quote_asset_volume', 'ignore'
-        ])
-        df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
-        df['price'] = pd.to_numeric(df['close'])
-        return df[['timestamp', 'price']].set_index('timestamp')
+        return parse_binance_klines(r.json())
     except Exception as e:
         print(f"Error fetching data for {symbol}: {e}")
         return None
 
+def parse_binance_klines(data):
+    """将币安K线JSON转换为以时间为索引的收盘价序列。"""
+    df = pd.DataFrame(data, columns=[
+        'timestamp', 'open', 'high', 'low', 'close', 'volume', 
+        'close_time', 'quote_asset_volume', 'number_of_trades', 
+        'taker_buy_base_asset_volume', 'taker_buy_quote_asset_volume', 'ignore'
+    ])
+    df['timestamp'] = pd.to_datetime(df['timestamp'], unit='ms')
+    df['price'] = pd.to_numeric(df['close'])
+    return df[['timestamp', 'price']].set_index('timestamp')
+
+def join_price_ratio(base_prices, quote_prices):
+    """按时间合并两个价格序列并计算比例（price_base / price_quote）。"""
+    df = base_prices.join(quote_prices, lsuffix="_base", rsuffix="_quote", how="inner")
+    df["ratio"] = df["price_base"] / df["price_quote"]
+    return df
+
+def build_chart_payload(df, base_currency, quote_currency):
+    """生成前端图表使用的数据（Chart.js 需要标签(labels)和数据(data)）。"""
+    return {
+        "labels": df.index.strftime('%Y-%m-%d %H:%M').tolist(),
+        "op_arb_data": df["ratio"].round(4).tolist(),
+        "op_prices": df["price_base"].round(4).tolist(),
+        "arb_prices": df["price_quote"].round(4).tolist(),
+        "base_currency": base_currency,
+        "quote_currency": quote_currency,
+        "pair_name": f"{base_currency}/{quote_currency}"
+    }
+
 # API 接口，用于向前端提供数据
 @app.route('/api/data')
 def get_ratio_data():
@@ -139,12 +185,11 @@ def get_ratio_data():
             return jsonify({"error": f"Failed to fetch data for {quote_currency}/USDT from Binance"}), 500
         
         # 创建USDT价格数据（固定为1）和计算比例
-        quote_prices = base_prices.copy()
-        quote_prices['price'] = 1.0  # USDT价格固定为1
+        usdt_prices = base_prices.copy()
+        usdt_prices['price'] = 1.0  # USDT价格固定为1
         
         # 合并数据并计算比例 (USDT/其他货币 = 1/其他货币价格)
-        df = base_prices.join(quote_prices, lsuffix="_quote", rsuffix="_base", how="inner")
-        df["ratio"] = df["price_base"] / df["price_quote"]  # 1 / 其他货币价格
+        df = join_price_ratio(usdt_prices, base_prices)
         
     elif quote_currency == 'USDT':
         # 如果计价货币是USDT，直接获取基础货币对USDT的价格
@@ -159,8 +204,7 @@ def get_ratio_data():
         quote_prices['price'] = 1.0  # USDT价格固定为1
         
         # 合并数据并计算比例
-        df = base_prices.join(quote_prices, lsuffix="_base", rsuffix="_quote", how="inner")
-        df["ratio"] = df["price_base"] / df["price_quote"]  # 基础货币价格 / 1
+        df = join_price_ratio(base_prices, quote_prices)  # 基础货币价格 / 1
         
     else:
         # 正常情况：两个货币都不是USDT
@@ -174,21 +218,10 @@ def get_ratio_data():
             return jsonify({"error": f"Failed to fetch data for {base_currency}/{quote_currency} from Binance"}), 500
 
         # 合并数据并计算比例
-        df = base_prices.join(quote_prices, lsuffix="_base", rsuffix="_quote", how="inner")
-        df["ratio"] = df["price_base"] / df["price_quote"]
+        df = join_price_ratio(base_prices, quote_prices)
     
     # 准备返回给前端的JSON数据
-    # Chart.js 需要标签(labels)和数据(data)
-    data = {
-        "labels": df.index.strftime('%Y-%m-%d %H:%M').tolist(),
-        "op_arb_data": df["ratio"].round(4).tolist(),
-        "op_prices": df["price_base"].round(4).tolist(),
-        "arb_prices": df["price_quote"].round(4).tolist(),
-        "base_currency": base_currency,
-        "quote_currency": quote_currency,
-        "pair_name": f"{base_currency}/{quote_currency}"
-    }
-    return jsonify(data)
+    return jsonify(build_chart_payload(df, base_currency, quote_currency))
 
 # 获取当前价格的API
 @app.route('/api/current')
@@ -205,7 +238,7 @@ def get_current_prices():
         if base_currency == 'USDT':
             # 如果基础货币是USDT，获取计价货币对USDT的价格，然后取倒数
             quote_symbol = f"{quote_currency}USDT"
-            quote_response = requests.get(f"https://api.binance.com/api/v3/ticker/price?symbol={quote_symbol}")
+            quote_response = requests.get(f"{BINANCE_API_URL}/ticker/price?symbol={quote_symbol}")
             
             if quote_response.status_code == 200:
                 quote_price = float(quote_response.json()['price'])
@@ -227,7 +260,7 @@ def get_current_prices():
         elif quote_currency == 'USDT':
             # 如果计价货币是USDT，直接获取基础货币对USDT的价格
             base_symbol = f"{base_currency}USDT"
-            base_response = requests.get(f"https://api.binance.com/api/v3/ticker/price?symbol={base_symbol}")
+            base_response = requests.get(f"{BINANCE_API_URL}/ticker/price?symbol={base_symbol}")
             
             if base_response.status_code == 200:
                 base_price = float(base_response.json()['price'])
@@ -251,8 +284,8 @@ def get_current_prices():
             base_symbol = f"{base_currency}USDT"
             quote_symbol = f"{quote_currency}USDT"
             
-            base_response = requests.get(f"https://api.binance.com/api/v3/ticker/price?symbol={base_symbol}")
-            quote_response = requests.get(f"https://api.binance.com/api/v3/ticker/price?symbol={quote_symbol}")
+            base_response = requests.get(f"{BINANCE_API_URL}/ticker/price?symbol={base_symbol}")
+            quote_response = requests.get(f"{BINANCE_API_URL}/ticker/price?symbol={quote_symbol}")
             
             if base_response.status_code == 200 and quote_response.status_code == 200:
                 base_price = float(base_response.json()['price'])
@@ -366,7 +399,7 @@ def get_current_prices_new():
             if base_currency == 'USDT':
                 # 如果基础货币是USDT
                 quote_symbol = f"{quote_currency}USDT"
-                quote_response = requests.get(f"https://api.binance.com/api/v3/ticker/price?symbol={quote_symbol}")
+                quote_response = requests.get(f"{BINANCE_API_URL}/ticker/price?symbol={quote_symbol}")
                 
                 if quote_response.status_code == 200:
                     quote_price = float(quote_response.json()['price'])
@@ -392,7 +425,7 @@ def get_current_prices_new():
             elif quote_currency == 'USDT':
                 # 如果计价货币是USDT
                 base_symbol = f"{base_currency}USDT"
-                base_response = requests.get(f"https://api.binance.com/api/v3/ticker/price?symbol={base_symbol}")
+                base_response = requests.get(f"{BINANCE_API_URL}/ticker/price?symbol={base_symbol}")
                 
                 if base_response.status_code == 200:
                     base_price = float(base_response.json()['price'])
@@ -420,8 +453,8 @@ def get_current_prices_new():
                 base_symbol = f"{base_currency}USDT"
                 quote_symbol = f"{quote_currency}USDT"
                 
-                base_response = requests.get(f"https://api.binance.com/api/v3/ticker/price?symbol={base_symbol}")
-                quote_response = requests.get(f"https://api.binance.com/api/v3/ticker/price?symbol={quote_symbol}")
+                base_response = requests.get(f"{BINANCE_API_URL}/ticker/price?symbol={base_symbol}")
+                quote_response = requests.get(f"{BINANCE_API_URL}/ticker/price?symbol={quote_symbol}")
                 
                 if base_response.status_code == 200 and quote_response.status_code == 200:
                     base_price = float(base_response.json()['price'])
@@ -458,14 +491,141 @@ def index():
 
 # =================== 价格提醒功能 API ===================
 
+# 提醒列表可以选择的字段，未指定 fields 时不返回 Webhook URL
+ALERT_LIST_FIELDS = ['id', 'base_currency', 'quote_currency', 'condition_type', 'target_price',
+                     'discord_webhook_url', 'is_active', 'is_triggered', 'created_at', 'triggered_at',
+                     'user_identifier', 'note']
+ALERT_DEFAULT_FIELDS = [name for name in ALERT_LIST_FIELDS if name != 'discord_webhook_url']
+ALERT_PAGE_SIZE = 100  # 默认每页数量
+ALERT_PAGE_SIZE_MAX = 1000  # 每页数量上限，也是 NDJSON 导出每批读取的行数
+
+
+def encode_cursor(created_at, alert_id):
+    """把上一页最后一行的 (created_at, id) 编码为游标"""
+    raw = json.dumps([created_at.isoformat(), alert_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """解析游标，格式错误时抛出 ValueError"""
+    try:
+        created_at, alert_id = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        return datetime.fromisoformat(created_at), int(alert_id)
+    except (ValueError, TypeError):
+        raise ValueError(f"无效的游标: {cursor}")
+
+
+def build_alert_query(fields, base_currency=None, quote_currency=None, state='all', after=None):
+    """
+    构造按 (created_at, id) 倒序的提醒查询，只选择需要的列
+    
+    after 为上一页最后一行的 (created_at, id)，查询从它之后开始（keyset 分页）
+    """
+    columns = dict.fromkeys(['id', 'created_at'] + fields)
+    query = db.select(*(getattr(Alert, name) for name in columns))
+    
+    if base_currency:
+        query = query.where(Alert.base_currency == base_currency.upper())
+    if quote_currency:
+        query = query.where(Alert.quote_currency == quote_currency.upper())
+    
+    if state == 'active':
+        query = query.filter_by(is_active=True, is_triggered=False)
+    elif state == 'triggered':
+        query = query.filter_by(is_triggered=True)
+    elif state == 'inactive':
+        query = query.filter_by(is_active=False)
+    
+    if after is not None:
+        query = query.where(db.tuple_(Alert.created_at, Alert.id) < after)
+    
+    return query.order_by(Alert.created_at.desc(), Alert.id.desc())
+
+
+def alert_row_to_dict(row, fields):
+    """查询结果行转换为字典"""
+    result = {'id': row.id}
+    for name in fields:
+        value = getattr(row, name)
+        result[name] = value.isoformat() if isinstance(value, datetime) else value
+    return result
+
+
+def export_alerts_ndjson(fields, **filters):
+    """逐批读取全部提醒，每行输出一个 JSON 对象"""
+    after = None
+    while True:
+        rows = db.session.execute(
+            build_alert_query(fields, after=after, **filters).limit(ALERT_PAGE_SIZE_MAX)
+        ).all()
+        for row in rows:
+            yield json.dumps(alert_row_to_dict(row, fields), ensure_ascii=False) + '\n'
+        if len(rows) < ALERT_PAGE_SIZE_MAX:
+            return
+        after = (rows[-1].created_at, rows[-1].id)
+
+
 @app.route('/api/alerts', methods=['GET'])
 def get_alerts():
-    """获取所有提醒列表"""
+    """
+    获取提醒列表（按创建时间倒序，游标分页）
+    
+    查询参数: limit、cursor（上一页返回的 next_cursor）、fields（逗号分隔）、
+    base / quote（货币对）、state（all / active / triggered / inactive）、
+    format=ndjson（流式导出全部结果）
+    """
     try:
-        alerts = Alert.query.order_by(Alert.created_at.desc()).all()
+        fields = ALERT_DEFAULT_FIELDS
+        if request.args.get('fields'):
+            requested = {name.strip() for name in request.args['fields'].split(',') if name.strip()}
+            unknown = requested - set(ALERT_LIST_FIELDS)
+            if unknown:
+                return jsonify({
+                    "status": "error",
+                    "message": f"不支持的字段: {', '.join(sorted(unknown))}"
+                }), 400
+            fields = [name for name in ALERT_LIST_FIELDS if name in requested]
+        
+        state = request.args.get('state', 'all')
+        if state not in ('all', 'active', 'triggered', 'inactive'):
+            return jsonify({
+                "status": "error",
+                "message": "state 必须是 all、active、triggered 或 inactive"
+            }), 400
+        
+        filters = {
+            'base_currency': request.args.get('base'),
+            'quote_currency': request.args.get('quote'),
+            'state': state
+        }
+        
+        if request.args.get('format') == 'ndjson':
+            return Response(stream_with_context(export_alerts_ndjson(fields, **filters)),
+                            mimetype='application/x-ndjson')
+        
+        try:
+            limit = min(int(request.args.get('limit', ALERT_PAGE_SIZE)), ALERT_PAGE_SIZE_MAX)
+            if limit <= 0:
+                raise ValueError("limit 必须是正整数")
+            cursor = request.args.get('cursor')
+            after = decode_cursor(cursor) if cursor else None
+        except ValueError as e:
+            return jsonify({
+                "status": "error",
+                "message": str(e)
+            }), 400
+        
+        # 多取一行判断是否还有下一页
+        rows = db.session.execute(build_alert_query(fields, after=after, **filters).limit(limit + 1)).all()
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id)
+        
         return jsonify({
             "status": "success",
-            "data": [alert.to_dict() for alert in alerts]
+            "data": [alert_row_to_dict(row, fields) for row in rows],
+            "next_cursor": next_cursor
         })
     except Exception as e:
         return jsonify({
@@ -626,8 +786,9 @@ def test_webhook():
         }), 500
 
 if __name__ == '__main__':
-    # 启动价格监控服务
-    alert_monitor.start()
+    # 启动价格监控服务（MONITOR_IN_PROCESS=false 时由独立进程负责）
+    if os.environ.get('MONITOR_IN_PROCESS', 'true').lower() == 'true':
+        alert_monitor.start()
     
     try:
         # 启动Web服务器
@@ -637,4 +798,5 @@ if __name__ == '__main__':
         app.run(debug=True, port=5008)
     finally:
         # 停止监控服务
-        alert_monitor.stop()
+        if alert_monitor.running:
+            alert_monitor.stop()
@@ -0,0 +1,344 @@
+#!/usr/bin/env python
+# benchmarks/loadtest.py
+"""
+Web 接口的 HTTP 压力测试
+
+按固定比例混合请求 /、/api/data、/api/current_prices 和 /api/alerts，上游接口指向
+本进程内启动的模拟交易所（src.services.fake_exchange），逐级提高并发，输出每个
+接口的吞吐量和延迟分位数。被测应用可以是:
+
+    默认         在本进程内用多线程 WSGI 服务运行旧版 app.py
+    --serve CMD  启动一个命令作为被测服务（如 gunicorn），{port} 替换为端口
+    --target URL 已经运行的服务（需自行将其 UPSTREAM_BASE_URL 指向 --fake-port）
+
+前两种方式会把 UPSTREAM_BASE_URL 和临时数据库 DATABASE_URL 传给被测应用，并预先写入
+--alerts 个提醒。比较 worker 类型或缓存设置时，分别运行并用 --compare 对比:
+    python benchmarks/loadtest.py --serve "gunicorn -w 4 -k sync -b 127.0.0.1:{port} app:app" --output sync.json
+    python benchmarks/loadtest.py --serve "gunicorn -w 4 -k gthread --threads 8 -b 127.0.0.1:{port} app:app" \\
+        --compare sync.json
+
+压测客户端本身是 Python 线程，并发很高时客户端可能先成为瓶颈，此时 p50 会随并发线性上升
+而吞吐量不变，可以在另一台机器上运行客户端（--target）。
+
+用法:
+    python benchmarks/loadtest.py [--concurrency 1,4,16,32] [--duration 10] [--warmup 2]
+                                  [--mix mix.json] [--alerts 200] [--cassette exchange.json]
+                                  [--latency-ms 0] [--error-rate 0] [--rate-limit-rate 0]
+                                  [--env KEY=VALUE ...] [--seed 0] [--output result.json]
+                                  [--compare before.json]
+"""
+import argparse
+import json
+import logging
+import os
+import random
+import shlex
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+import numpy as np  # noqa: E402
+import requests  # noqa: E402
+
+from src.benchmark import format_table  # noqa: E402
+from src.services.fake_exchange import (Cassette, FakeExchange, FakeExchangeServer,  # noqa: E402
+                                        FaultInjector, synthesize_cassette)
+from src.services.load_generator import ScriptedPriceService  # noqa: E402
+
+# 默认请求组合: (接口名称, 路径, 权重)，货币对使用模拟交易所中存在的符号
+DEFAULT_MIX = [
+    ('index', '/', 1),
+    ('data', '/api/data?base=BTC&quote=ETH&timespan=30d', 1),
+    ('data', '/api/data?base=SOL&quote=BTC&timespan=7d', 1),
+    ('data', '/api/data?base=ETH&quote=USDT&timespan=1d', 1),
+    ('current_prices', '/api/current_prices?base=BTC&quote=USD', 2),
+    ('current_prices', '/api/current_prices?base=ETH&quote=EUR', 1),
+    ('current_prices', '/api/current_prices?base=SOL&quote=BTC', 1),
+    ('alerts', '/api/alerts', 2),
+]
+
+# 等待被测服务就绪的最长时间（秒）
+STARTUP_TIMEOUT = 30
+
+
+class Sample:
+    """一次请求的结果"""
+
+    __slots__ = ('endpoint', 'status', 'latency')
+
+    def __init__(self, endpoint: str, status: int, latency: float):
+        self.endpoint = endpoint
+        self.status = status
+        self.latency = latency
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description='CryptoChart Pro Web 接口压力测试')
+    parser.add_argument('--concurrency', default='1,4,16,32', help='逐级测试的并发数，逗号分隔')
+    parser.add_argument('--duration', type=float, default=10, help='每级并发的持续时间（秒）')
+    parser.add_argument('--warmup', type=float, default=2, help='正式测量前的预热时间（秒）')
+    parser.add_argument('--mix', default=None,
+                        help='请求组合 JSON 文件（[[名称, 路径, 权重], ...]），默认 DEFAULT_MIX')
+    parser.add_argument('--target', default=None, help='已经运行的被测服务地址')
+    parser.add_argument('--serve', default=None, help='启动被测服务的命令，{port} 替换为端口')
+    parser.add_argument('--env', action='append', default=[],
+                        help='传给被测服务的环境变量（KEY=VALUE，可重复），如缓存设置')
+    parser.add_argument('--alerts', type=int, default=200, help='预先写入的提醒数量')
+    parser.add_argument('--cassette', default=None,
+                        help='模拟交易所使用的 cassette，默认用脚本价格路径生成')
+    parser.add_argument('--fake-port', type=int, default=0, help='模拟交易所端口，默认随机')
+    parser.add_argument('--latency-ms', type=float, default=0, help='模拟交易所的固定延迟（毫秒）')
+    parser.add_argument('--jitter-ms', type=float, default=0, help='模拟交易所的随机延迟上限（毫秒）')
+    parser.add_argument('--error-rate', type=float, default=0, help='模拟交易所返回 503 的比例')
+    parser.add_argument('--rate-limit-rate', type=float, default=0, help='模拟交易所返回 429 的比例')
+    parser.add_argument('--timeout', type=float, default=30, help='单个请求的超时时间（秒）')
+    parser.add_argument('--seed', type=int, default=0, help='请求顺序和故障注入的随机种子')
+    parser.add_argument('--output', default=None, help='结果写入的 JSON 文件')
+    parser.add_argument('--compare', default=None, help='与之对比的上一次结果 JSON 文件')
+    return parser.parse_args(argv)
+
+
+def free_port() -> int:
+    """获取一个空闲的本地端口"""
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_fake_exchange(args: argparse.Namespace) -> FakeExchangeServer:
+    """启动模拟交易所"""
+    if args.cassette:
+        cassette = Cassette.load(args.cassette)
+    else:
+        cassette = synthesize_cassette(ScriptedPriceService(0, seed=args.seed))
+
+    faults = FaultInjector(args.latency_ms, args.jitter_ms, args.error_rate,
+                           args.rate_limit_rate, seed=args.seed)
+    server = FakeExchangeServer(FakeExchange(cassette, faults), port=args.fake_port)
+    server.start()
+    return server
+
+
+def seed_alerts(count: int) -> None:
+    """通过旧版应用向 DATABASE_URL 指向的数据库写入提醒"""
+    import app as legacy
+    from models import db, Alert
+
+    rng = random.Random(0)
+    with legacy.app.app_context():
+        for i in range(count):
+            db.session.add(Alert(
+                base_currency=rng.choice(['BTC', 'ETH', 'SOL']), quote_currency='USDT',
+                condition_type=rng.choice(['above', 'below']),
+                target_price=round(rng.uniform(10, 70000), 2),
+                discord_webhook_url=f'https://discord.com/api/webhooks/{i}/loadtest',
+                note='loadtest'
+            ))
+        db.session.commit()
+
+
+def serve_in_process() -> Tuple[str, Any]:
+    """在后台线程中用多线程 WSGI 服务运行旧版应用"""
+    from werkzeug.serving import make_server
+    import app as legacy
+
+    # 逐条请求日志会明显拖慢服务
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    server = make_server('127.0.0.1', 0, legacy.app, threaded=True)
+    threading.Thread(target=server.serve_forever, name='LoadTestApp', daemon=True).start()
+    return f'http://127.0.0.1:{server.server_port}', server
+
+
+def serve_command(command: str, env: Dict[str, str]) -> Tuple[str, subprocess.Popen]:
+    """启动被测服务命令并等待其就绪"""
+    port = free_port()
+    process = subprocess.Popen(shlex.split(command.format(port=port)), cwd=BASE_DIR,
+                               env={**os.environ, **env})
+    url = f'http://127.0.0.1:{port}'
+
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"被测服务已退出，退出码 {process.returncode}")
+        try:
+            requests.get(url + '/', timeout=1)
+            return url, process
+        except requests.RequestException:
+            time.sleep(0.2)
+
+    process.terminate()
+    raise RuntimeError(f"被测服务在 {STARTUP_TIMEOUT} 秒内没有就绪")
+
+
+def run_level(url: str, mix: List[Tuple[str, str, float]], concurrency: int, duration: float,
+              timeout: float, seed: int) -> Tuple[List[Sample], float]:
+    """
+    以固定并发持续发送请求（闭环：每个客户端收到响应后立即发送下一个）
+
+    Returns:
+        (请求结果列表, 实际持续时间)
+    """
+    weights = [weight for _, _, weight in mix]
+    results: List[List[Sample]] = [[] for _ in range(concurrency)]
+    start_event = threading.Event()
+    deadline = [0.0]
+
+    def client(index: int) -> None:
+        rng = random.Random(seed * 1000 + index)
+        session = requests.Session()
+        samples = results[index]
+        start_event.wait()
+        while time.perf_counter() < deadline[0]:
+            endpoint, path, _ = rng.choices(mix, weights)[0]
+            started = time.perf_counter()
+            try:
+                status = session.get(url + path, timeout=timeout).status_code
+            except requests.RequestException:
+                status = 0
+            samples.append(Sample(endpoint, status, time.perf_counter() - started))
+        session.close()
+
+    threads = [threading.Thread(target=client, args=(i,), daemon=True) for i in range(concurrency)]
+    for thread in threads:
+        thread.start()
+
+    started = time.perf_counter()
+    deadline[0] = started + duration
+    start_event.set()
+    for thread in threads:
+        thread.join()
+    return [sample for samples in results for sample in samples], time.perf_counter() - started
+
+
+def summarize(samples: List[Sample], elapsed: float) -> Dict[str, Dict[str, Any]]:
+    """按接口统计吞吐量、错误数和延迟分位数（毫秒）"""
+    groups: Dict[str, List[Sample]] = {}
+    for sample in samples:
+        groups.setdefault(sample.endpoint, []).append(sample)
+    groups['total'] = samples
+
+    summary = {}
+    for endpoint, group in sorted(groups.items()):
+        if not group:
+            continue
+        latencies = np.array([sample.latency for sample in group]) * 1000
+        summary[endpoint] = {
+            'requests': len(group),
+            'rps': round(len(group) / elapsed, 2),
+            'errors': sum(1 for sample in group if not 200 <= sample.status < 400),
+            'p50_ms': round(float(np.percentile(latencies, 50)), 2),
+            'p90_ms': round(float(np.percentile(latencies, 90)), 2),
+            'p99_ms': round(float(np.percentile(latencies, 99)), 2),
+            'max_ms': round(float(latencies.max()), 2)
+        }
+    return summary
+
+
+def format_report(result: Dict[str, Any], baseline: Optional[Dict[str, Any]] = None) -> str:
+    """生成结果表格，给出基线时附上吞吐量和 p99 的对比"""
+    header = ['并发', '接口', '请求数', '吞吐 (req/s)', '错误', 'p50 (ms)', 'p90 (ms)', 'p99 (ms)', '最大 (ms)']
+    if baseline is not None:
+        header += ['基线吞吐', '基线 p99']
+
+    rows = []
+    for level, endpoints in result['levels'].items():
+        for endpoint, stats in endpoints.items():
+            row = [level, endpoint, f"{stats['requests']:,}", f"{stats['rps']:,.1f}", str(stats['errors']),
+                   f"{stats['p50_ms']:,.1f}", f"{stats['p90_ms']:,.1f}", f"{stats['p99_ms']:,.1f}",
+                   f"{stats['max_ms']:,.1f}"]
+            if baseline is not None:
+                before = baseline.get('levels', {}).get(level, {}).get(endpoint)
+                row += [_change(before and before['rps'], stats['rps']),
+                        _change(before and before['p99_ms'], stats['p99_ms'])]
+            rows.append(row)
+    return format_table(header, rows)
+
+
+def _change(before: Optional[float], current: float) -> str:
+    if not before:
+        return '-'
+    return f"{before:,.1f} ({(current - before) / before * 100:+.1f}%)"
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    压力测试入口
+
+    Returns:
+        进程退出码
+    """
+    args = parse_args(argv)
+    levels = [int(level) for level in args.concurrency.split(',') if level.strip()]
+
+    mix = DEFAULT_MIX
+    if args.mix:
+        with open(args.mix, encoding='utf-8') as f:
+            mix = [tuple(item) for item in json.load(f)]
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    fake = start_fake_exchange(args)
+    server = None
+    directory = tempfile.TemporaryDirectory(prefix='cryptochart-loadtest-')
+    try:
+        if args.target:
+            url = args.target.rstrip('/')
+        else:
+            # 旧版应用在导入时读取这些变量，必须在导入前设置
+            env = dict(item.split('=', 1) for item in args.env)
+            env.update(UPSTREAM_BASE_URL=fake.url,
+                       DATABASE_URL=f"sqlite:///{os.path.join(directory.name, 'loadtest.db')}",
+                       MONITOR_IN_PROCESS='false')
+            os.environ.update(env)
+            seed_alerts(args.alerts)
+            url, server = serve_command(args.serve, env) if args.serve else serve_in_process()
+
+        print(f"被测服务: {url}，模拟交易所: {fake.url}")
+        if args.warmup > 0:
+            run_level(url, mix, min(levels), args.warmup, args.timeout, args.seed)
+
+        result: Dict[str, Any] = {
+            'created_at': datetime.utcnow().isoformat(),
+            'target': args.serve or args.target or 'in-process',
+            'env': args.env,
+            'parameters': {'duration': args.duration, 'alerts': args.alerts, 'latency_ms': args.latency_ms,
+                           'error_rate': args.error_rate, 'rate_limit_rate': args.rate_limit_rate},
+            'levels': {}
+        }
+        for level in levels:
+            samples, elapsed = run_level(url, mix, level, args.duration, args.timeout, args.seed)
+            result['levels'][str(level)] = summarize(samples, elapsed)
+            total = result['levels'][str(level)].get('total', {})
+            print(f"并发 {level}: {total.get('rps', 0):,.1f} req/s, p99 {total.get('p99_ms', 0):,.1f} ms")
+        result['upstream'] = fake.exchange.get_stats()
+    finally:
+        if isinstance(server, subprocess.Popen):
+            server.terminate()
+            server.wait(timeout=10)
+        elif server is not None:
+            server.shutdown()
+        fake.stop()
+        directory.cleanup()
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+
+    print(format_report(result, baseline))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,273 @@
+#!/usr/bin/env python
+# benchmarks/microbench.py
+"""
+请求热点路径的微基准测试
+
+覆盖每个请求都会经过的代码：K线 JSON 解析、get_ratio_data 的合并与比例计算、
+图表标签格式化、大数据量 jsonify、get_price_statistics、Alert.to_dict 和提醒条件评估。
+所有输入由固定种子生成，结果与仓库中的基线（benchmarks/baseline.json）对比，
+中位数超过基线的 (1 + 容差) 倍时视为退化，退出码为 1。
+
+用法:
+    python benchmarks/microbench.py [--filter kline] [--tolerance 0.25] [--repeat 7]
+                                    [--baseline benchmarks/baseline.json] [--save]
+
+在同一台机器上改动前后运行才有可比性；更换机器或依赖版本后用 --save 重新生成基线。
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import timeit
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BASE_DIR)
+
+import numpy as np  # noqa: E402
+
+# 基线文件
+BASELINE_PATH = os.path.join(BASE_DIR, 'benchmarks', 'baseline.json')
+
+# 固定输入的规模
+KLINE_COUNT = 1000  # 币安单次请求的K线上限
+ALERT_COUNT = 1000
+BOOK_ALERT_COUNT = 10000
+SEED = 20240101
+
+# 已注册的用例: 名称 -> (说明, 准备函数)，准备函数返回被计时的无参函数
+CASES: Dict[str, Tuple[str, Callable[[], Callable[[], object]]]] = {}
+
+
+def case(name: str, description: str):
+    """注册一个用例"""
+    def register(setup):
+        CASES[name] = (description, setup)
+        return setup
+    return register
+
+
+def kline_rows(count: int = KLINE_COUNT, start_price: float = 3.0, seed: int = SEED) -> list:
+    """生成币安格式的小时K线（字符串价格，与接口返回一致）"""
+    rng = np.random.default_rng(seed)
+    closes = start_price * np.exp(np.cumsum(rng.normal(0, 0.01, count)))
+    start_ms = 1704067200000  # 2024-01-01 00:00 UTC
+    rows = []
+    for i, close in enumerate(closes):
+        open_time = start_ms + i * 3600000
+        rows.append([open_time, f'{close:.8f}', f'{close * 1.004:.8f}', f'{close * 0.996:.8f}',
+                     f'{close:.8f}', '1234.50000000', open_time + 3599999, '3703.50000000',
+                     120, '617.25000000', '1851.75000000', '0'])
+    return rows
+
+
+def legacy_app():
+    """导入旧版单文件应用（app.py）"""
+    import app as legacy
+    return legacy
+
+
+def sample_alerts(model, count: int = ALERT_COUNT) -> list:
+    """生成未保存到数据库的提醒对象"""
+    rng = np.random.default_rng(SEED)
+    created = datetime(2024, 1, 1)
+    alerts = []
+    for i in range(count):
+        alert = model(
+            base_currency='bitcoin', quote_currency='usd',
+            condition_type='above' if i % 2 else 'below',
+            target_price=float(rng.uniform(50000, 70000)),
+            discord_webhook_url=f'https://discord.com/api/webhooks/{i}/token',
+            note='benchmark', is_active=True, is_triggered=False,
+            created_at=created + timedelta(minutes=i)
+        )
+        alert.id = i + 1
+        # 旧版模型没有以下字段
+        if hasattr(model, 'trigger_count'):
+            alert.trigger_count = 0
+            alert.updated_at = alert.created_at
+        alerts.append(alert)
+    return alerts
+
+
+@case('kline_json_to_frame', '旧版: K线 JSON -> 收盘价 DataFrame (1000 行)')
+def bench_kline_json_to_frame():
+    legacy = legacy_app()
+    text = json.dumps(kline_rows())
+    return lambda: legacy.parse_binance_klines(json.loads(text))
+
+
+@case('kline_json_to_array', 'PriceService: K线 JSON -> ndarray (1000 行)')
+def bench_kline_json_to_array():
+    from src.services.price_service import PriceService
+    text = json.dumps(kline_rows())
+    return lambda: PriceService.parse_klines(json.loads(text))
+
+
+@case('ratio_join', 'get_ratio_data: 合并两个价格序列并计算比例 (1000 行)')
+def bench_ratio_join():
+    legacy = legacy_app()
+    base = legacy.parse_binance_klines(kline_rows(start_price=3.0, seed=SEED))
+    quote = legacy.parse_binance_klines(kline_rows(start_price=1.2, seed=SEED + 1))
+    return lambda: legacy.join_price_ratio(base, quote)
+
+
+@case('chart_payload', 'get_ratio_data: 标签格式化与四舍五入 (1000 行)')
+def bench_chart_payload():
+    legacy = legacy_app()
+    df = legacy.join_price_ratio(legacy.parse_binance_klines(kline_rows(start_price=3.0, seed=SEED)),
+                                 legacy.parse_binance_klines(kline_rows(start_price=1.2, seed=SEED + 1)))
+    return lambda: legacy.build_chart_payload(df, 'OP', 'ARB')
+
+
+@case('jsonify_chart', 'jsonify 图表数据 (1000 点)')
+def bench_jsonify_chart():
+    legacy = legacy_app()
+    df = legacy.join_price_ratio(legacy.parse_binance_klines(kline_rows(start_price=3.0, seed=SEED)),
+                                 legacy.parse_binance_klines(kline_rows(start_price=1.2, seed=SEED + 1)))
+    payload = legacy.build_chart_payload(df, 'OP', 'ARB')
+    legacy.app.app_context().push()
+    return lambda: legacy.jsonify(payload).get_data()
+
+
+@case('jsonify_alerts', 'jsonify 提醒列表 (1000 个)')
+def bench_jsonify_alerts():
+    legacy = legacy_app()
+    from src.models import Alert
+    payload = {'status': 'success', 'alerts': [alert.to_dict() for alert in sample_alerts(Alert)]}
+    legacy.app.app_context().push()
+    return lambda: legacy.jsonify(payload).get_data()
+
+
+@case('price_statistics', 'PriceService.get_price_statistics (1000 个价格)')
+def bench_price_statistics():
+    from src.services.price_service import PriceService
+    service = PriceService()
+    prices = [float(row[4]) for row in kline_rows()]
+    return lambda: service.get_price_statistics(prices)
+
+
+@case('alert_to_dict', 'Alert.to_dict (1000 个)')
+def bench_alert_to_dict():
+    from src.models import Alert
+    alerts = sample_alerts(Alert)
+    return lambda: [alert.to_dict() for alert in alerts]
+
+
+@case('legacy_alert_to_dict', '旧版 models.Alert.to_dict (1000 个)')
+def bench_legacy_alert_to_dict():
+    from models import Alert
+    alerts = sample_alerts(Alert)
+    return lambda: [alert.to_dict() for alert in alerts]
+
+
+@case('condition_check', 'AlertService.check_alert_condition (1000 个提醒)')
+def bench_condition_check():
+    from src.models import Alert
+    from src.services.alert_book import AlertBook
+    from src.services.alert_service import AlertService
+    service = AlertService(book=AlertBook())
+    alerts = sample_alerts(Alert)
+    return lambda: [alert for alert in alerts if service.check_alert_condition(alert, 60000.0)]
+
+
+@case('book_evaluate', 'AlertBook.evaluate 区间穿越 (单个货币对 10000 个提醒)')
+def bench_book_evaluate():
+    from src.services.alert_book import AlertBook, AlertRecord, PairSnapshot
+    rng = np.random.default_rng(SEED)
+    book = AlertBook()
+    for i, target in enumerate(rng.uniform(50000, 70000, BOOK_ALERT_COUNT)):
+        book.add(AlertRecord(i + 1, 'bitcoin', 'usd', 'above' if target > 60000 else 'below',
+                             float(target), armed_at=0))
+    snapshot = PairSnapshot('bitcoin', 'usd', 60000.0, 59400.0, 60600.0, 1, None, None, 0)
+    return lambda: book.evaluate(snapshot)
+
+
+def measure(func: Callable[[], object], repeat: int) -> Dict[str, float]:
+    """
+    测量单次调用耗时（自动选择循环次数，使每轮至少 0.2 秒）
+
+    Returns:
+        中位数和最小值（微秒）
+    """
+    timer = timeit.Timer(func)
+    number, _ = timer.autorange()
+    samples = [elapsed / number * 1e6 for elapsed in timer.repeat(repeat=repeat, number=number)]
+    return {'median_us': round(statistics.median(samples), 3), 'min_us': round(min(samples), 3)}
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description='CryptoChart Pro 请求热点路径微基准测试')
+    parser.add_argument('--filter', default=None, help='只运行名称包含该字符串的用例')
+    parser.add_argument('--repeat', type=int, default=7, help='每个用例的测量轮数')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='允许中位数超过基线的比例，超过视为退化')
+    parser.add_argument('--baseline', default=BASELINE_PATH, help='基线文件')
+    parser.add_argument('--save', action='store_true', help='将本次结果写入基线文件')
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    微基准测试入口
+
+    Returns:
+        进程退出码（有退化时为 1）
+    """
+    from src.benchmark import format_table
+
+    args = parse_args(argv)
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    results: Dict[str, Dict[str, float]] = {}
+    for name, (description, setup) in CASES.items():
+        if args.filter and args.filter not in name:
+            continue
+        results[name] = measure(setup(), args.repeat)
+
+    previous = baseline.get('results', {})
+    regressions = []
+    rows = []
+    for name, result in results.items():
+        before = previous.get(name, {}).get('median_us')
+        change = ''
+        if before:
+            ratio = result['median_us'] / before
+            change = f'{(ratio - 1) * 100:+.1f}%'
+            if ratio > 1 + args.tolerance:
+                change += ' 退化'
+                regressions.append(name)
+        rows.append([name, CASES[name][0], f"{before:,.1f}" if before else '-',
+                     f"{result['median_us']:,.1f}", f"{result['min_us']:,.1f}", change])
+
+    machine = {'python': platform.python_version(), 'platform': platform.platform(),
+               'processor': platform.processor() or platform.machine()}
+    if baseline and baseline.get('machine') != machine:
+        print(f"注意: 基线在不同的环境中生成 {baseline.get('machine')}")
+    print(format_table(['用例', '说明', '基线中位数 (µs)', '本次中位数 (µs)', '本次最小值 (µs)', '变化'], rows))
+
+    if args.save:
+        merged = dict(previous)
+        merged.update(results)
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump({'created_at': datetime.utcnow().isoformat(), 'machine': machine,
+                       'results': merged}, f, ensure_ascii=False, indent=2)
+            f.write('\n')
+        print(f"基线已写入 {args.baseline}")
+        return 0
+
+    if regressions:
+        print(f"性能退化: {', '.join(regressions)}")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,11 +1,45 @@
 # discord_notifier.py
 import requests
 import json
+import random
+import time
 from datetime import datetime
 
 class DiscordNotifier:
     """Discord通知器"""
     
+    # 遇到429时最多重试的次数，以及愿意等待的最长retry_after（秒）
+    MAX_RATE_LIMIT_RETRIES = 3
+    MAX_RETRY_AFTER = 10
+    
+    @staticmethod
+    def _post(webhook_url, data):
+        """发送Webhook请求，遇到429时按retry_after等待后重试"""
+        for attempt in range(DiscordNotifier.MAX_RATE_LIMIT_RETRIES + 1):
+            response = requests.post(
+                webhook_url,
+                headers={"Content-Type": "application/json"},
+                data=json.dumps(data),
+                timeout=10
+            )
+            
+            if response.status_code != 429 or attempt == DiscordNotifier.MAX_RATE_LIMIT_RETRIES:
+                return response
+            
+            try:
+                retry_after = float(response.json().get('retry_after'))
+            except (ValueError, TypeError, AttributeError):
+                retry_after = float(response.headers.get('Retry-After', 1))
+            
+            if retry_after > DiscordNotifier.MAX_RETRY_AFTER:
+                print(f"Discord限流等待时间过长({retry_after}秒)，放弃本次发送")
+                return response
+            
+            print(f"Discord限流，{retry_after:.2f}秒后重试")
+            time.sleep(retry_after + random.uniform(0, 0.25))
+        
+        return response
+    
     @staticmethod
     def send_alert(webhook_url, alert_data, current_price, current_ratio):
         """发送价格提醒到Discord"""
@@ -64,12 +98,7 @@ class DiscordNotifier:
             }
             
             # 发送到Discord
-            response = requests.post(
-                webhook_url,
-                headers={"Content-Type": "application/json"},
-                data=json.dumps(data),
-                timeout=10
-            )
+            response = DiscordNotifier._post(webhook_url, data)
             
             if response.status_code == 204:
                 print(f"Discord通知发送成功: {alert_data['base_currency']}/{alert_data['quote_currency']}")
@@ -108,12 +137,7 @@ class DiscordNotifier:
                 "embeds": [test_embed]
             }
             
-            response = requests.post(
-                webhook_url,
-                headers={"Content-Type": "application/json"},
-                data=json.dumps(data),
-                timeout=10
-            )
+            response = DiscordNotifier._post(webhook_url, data)
             
             return response.status_code == 204
             
@@ -7,6 +7,14 @@ db = SQLAlchemy()
 class Alert(db.Model):
     """价格提醒模型"""
     __tablename__ = 'alerts'
+    __table_args__ = (
+        # 活跃提醒的部分索引，价格监控每轮只查询这些行
+        db.Index('ix_alerts_active_pair_target', 'base_currency', 'quote_currency',
+                 'condition_type', 'target_price',
+                 sqlite_where=db.text('is_active = 1 AND is_triggered = 0')),
+        # 列表接口的游标分页
+        db.Index('ix_alerts_created_at_id', 'created_at', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     
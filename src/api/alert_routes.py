@@ -2,10 +2,13 @@
 """
 提醒相关API路由
 """
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, Response, current_app, jsonify, request, stream_with_context, url_for
+import json
 import logging
+from ..config import get_config
 from ..services import AlertService, NotificationService
-from ..models import db
+from ..models import db, CheckRequest
+from ..utils.pagination import decode_cursor, parse_fields, parse_limit
 
 logger = logging.getLogger(__name__)
 
@@ -15,22 +18,60 @@ alert_bp = Blueprint('alert', __name__, url_prefix='/api')
 # 创建服务实例
 alert_service = AlertService()
 notification_service = NotificationService()
+config = get_config()
 
 
 @alert_bp.route('/alerts', methods=['GET'])
 def get_alerts():
-    """获取提醒列表"""
+    """
+    获取提醒列表（按创建时间倒序，游标分页）
+    
+    查询参数:
+        limit: 每页数量，默认 ALERT_PAGE_SIZE，最大 ALERT_PAGE_SIZE_MAX
+        cursor: 上一页返回的 next_cursor
+        fields: 逗号分隔的返回字段，默认不包含 discord_webhook_url
+        base_currency / quote_currency: 按货币对筛选
+        state: all（默认）、active、triggered 或 inactive
+        user_identifier: 按用户筛选
+        format: 为 ndjson 时以每行一个 JSON 对象的形式流式返回全部结果（忽略分页参数）
+    """
     try:
-        user_identifier = request.args.get('user_identifier')
-        active_only = request.args.get('active_only', 'false').lower() == 'true'
+        fields = parse_fields(request.args.get('fields'), AlertService.LIST_FIELDS,
+                              AlertService.DEFAULT_LIST_FIELDS)
         
-        alerts = alert_service.get_alerts(user_identifier, active_only)
+        state = request.args.get('state', 'all')
+        # 兼容旧参数
+        if request.args.get('active_only', 'false').lower() == 'true':
+            state = 'active'
+        if state not in AlertService.LIST_STATES:
+            return jsonify({'error': f'state 必须是 {", ".join(AlertService.LIST_STATES)} 之一'}), 400
+        
+        filters = {
+            'base_currency': request.args.get('base_currency'),
+            'quote_currency': request.args.get('quote_currency'),
+            'state': state,
+            'user_identifier': request.args.get('user_identifier')
+        }
+        
+        if request.args.get('format') == 'ndjson':
+            lines = (json.dumps(alert, ensure_ascii=False) + '\n'
+                     for alert in alert_service.iter_alerts(fields, config.ALERT_PAGE_SIZE_MAX, **filters))
+            return Response(stream_with_context(lines), mimetype='application/x-ndjson')
+        
+        limit = parse_limit(request.args.get('limit'), config.ALERT_PAGE_SIZE, config.ALERT_PAGE_SIZE_MAX)
+        cursor = request.args.get('cursor')
+        after = decode_cursor(cursor) if cursor else None
+        
+        alerts, next_cursor = alert_service.list_alerts(fields, limit, after, **filters)
         
         return jsonify({
             'success': True,
-            'data': [alert.to_dict() for alert in alerts]
+            'data': alerts,
+            'next_cursor': next_cursor
         })
         
+    except ValueError as e:
+        return jsonify({'error': f'参数错误: {str(e)}'}), 400
     except Exception as e:
         logger.error(f"获取提醒列表时发生错误: {e}")
         return jsonify({'error': '服务器内部错误'}), 500
@@ -46,8 +87,10 @@ def create_alert():
             return jsonify({'error': '请求数据格式错误'}), 400
         
         # 验证必需字段
+        # 规则提醒使用 rule 表达式代替目标价格
+        price_field = 'rule' if data.get('condition_type') == 'rule' else 'target_price'
         required_fields = ['base_currency', 'quote_currency', 'condition_type', 
-                          'target_price', 'discord_webhook_url']
+                          price_field, 'discord_webhook_url']
         
         for field in required_fields:
             if field not in data:
@@ -58,10 +101,11 @@ def create_alert():
             base_currency=data['base_currency'],
             quote_currency=data['quote_currency'],
             condition_type=data['condition_type'],
-            target_price=float(data['target_price']),
+            target_price=float(data.get('target_price', 0)),
             discord_webhook_url=data['discord_webhook_url'],
             user_identifier=data.get('user_identifier'),
-            note=data.get('note')
+            note=data.get('note'),
+            rule=data.get('rule')
         )
         
         if alert:
@@ -79,6 +123,94 @@ def create_alert():
         return jsonify({'error': '服务器内部错误'}), 500
 
 
+def _bulk_items(key: str):
+    """
+    读取批量请求中的列表，请求体可以是列表或 {key: [...]}
+    
+    Returns:
+        (列表, 错误响应)，格式正确时错误响应为None
+    """
+    data = request.get_json(silent=True)
+    items = data.get(key) if isinstance(data, dict) else data
+    if not isinstance(items, list) or not items:
+        return None, (jsonify({'error': f'请求数据必须是非空列表或包含 {key} 列表的对象'}), 400)
+    if len(items) > config.ALERT_BULK_MAX_ITEMS:
+        return None, (jsonify({'error': f'单次最多处理 {config.ALERT_BULK_MAX_ITEMS} 个提醒'}), 400)
+    return items, None
+
+
+def _bulk_response(results, status: int = 200):
+    succeeded = sum(1 for result in results if result['success'])
+    return jsonify({
+        'success': True,
+        'data': {
+            'succeeded': succeeded,
+            'failed': len(results) - succeeded,
+            'results': results
+        }
+    }), status
+
+
+@alert_bp.route('/alerts/bulk', methods=['POST'])
+def create_alerts_bulk():
+    """
+    批量创建提醒
+    
+    请求体为提醒对象列表（或 {"alerts": [...]}），字段同 POST /api/alerts。
+    每个提醒单独验证，通过的提醒在一个事务中写入，results 按请求顺序给出每个提醒的结果。
+    """
+    try:
+        items, error = _bulk_items('alerts')
+        if error:
+            return error
+        
+        results = alert_service.create_alerts_bulk(items)
+        return _bulk_response(results, 201 if any(result['success'] for result in results) else 200)
+        
+    except Exception as e:
+        logger.error(f"批量创建提醒时发生错误: {e}")
+        return jsonify({'error': '服务器内部错误'}), 500
+
+
+@alert_bp.route('/alerts/bulk', methods=['PATCH'])
+def update_alerts_bulk():
+    """
+    批量更新提醒
+    
+    请求体为更新对象列表（或 {"alerts": [...]}），每个对象包含 id 和要修改的字段，
+    可修改的字段见 AlertService.BULK_UPDATE_FIELDS（is_active 用于启用或停用）。
+    """
+    try:
+        items, error = _bulk_items('alerts')
+        if error:
+            return error
+        
+        return _bulk_response(alert_service.update_alerts_bulk(items))
+        
+    except Exception as e:
+        logger.error(f"批量更新提醒时发生错误: {e}")
+        return jsonify({'error': '服务器内部错误'}), 500
+
+
+@alert_bp.route('/alerts/bulk', methods=['DELETE'])
+def delete_alerts_bulk():
+    """
+    批量删除提醒
+    
+    请求体为提醒ID列表（或 {"ids": [...]}）
+    """
+    try:
+        alert_ids, error = _bulk_items('ids')
+        if error:
+            return error
+        
+        return _bulk_response(alert_service.delete_alerts_bulk(alert_ids))
+        
+    except Exception as e:
+        logger.error(f"批量删除提醒时发生错误: {e}")
+        return jsonify({'error': '服务器内部错误'}), 500
+
+
 @alert_bp.route('/alerts/<int:alert_id>', methods=['DELETE'])
 def delete_alert(alert_id):
     """删除提醒"""
@@ -160,10 +292,31 @@ def test_webhook():
 
 @alert_bp.route('/alerts/check', methods=['POST'])
 def force_check_alerts():
-    """强制检查所有提醒"""
+    """
+    强制检查所有提醒
+    
+    请求交给监控领导者执行（可能是其他 Web 进程或独立监控进程），本进程不参与评估。
+    领导者在 MONITOR_FORCE_CHECK_TIMEOUT 内完成时直接返回结果，否则返回 202 和请求ID，
+    可通过 GET /api/alerts/check/<id> 查询结果。
+    """
     try:
-        stats = alert_service.check_all_alerts()
+        monitor = current_app.extensions.get('monitor_service')
+        if monitor is None:
+            return jsonify({'error': '监控服务未初始化'}), 503
+        
+        check_request = monitor.request_check()
+        
+        if check_request.status == CheckRequest.STATUS_FAILED:
+            return jsonify({'error': f'强制检查失败: {check_request.error}'}), 500
+        
+        if check_request.status != CheckRequest.STATUS_DONE:
+            return jsonify({
+                'success': True,
+                'data': check_request.to_dict(),
+                'message': '检查请求已提交，领导者尚未完成检查'
+            }), 202, {'Location': url_for('alert.get_check_request', request_id=check_request.id)}
         
+        stats = check_request.to_dict()['result']
         return jsonify({
             'success': True,
             'data': stats,
@@ -175,6 +328,24 @@ def force_check_alerts():
         return jsonify({'error': '服务器内部错误'}), 500
 
 
+@alert_bp.route('/alerts/check/<int:request_id>', methods=['GET'])
+def get_check_request(request_id):
+    """查询强制检查请求的状态和结果"""
+    try:
+        check_request = CheckRequest.query.get(request_id)
+        if not check_request:
+            return jsonify({'error': '检查请求不存在'}), 404
+        
+        return jsonify({
+            'success': True,
+            'data': check_request.to_dict()
+        })
+        
+    except Exception as e:
+        logger.error(f"查询强制检查请求 {request_id} 时发生错误: {e}")
+        return jsonify({'error': '服务器内部错误'}), 500
+
+
 # 错误处理
 @alert_bp.errorhandler(404)
 def not_found(error):
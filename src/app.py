@@ -5,17 +5,19 @@ CryptoChart Pro 主应用程序
 """
 import os
 import sys
-from flask import Flask, render_template, jsonify
+from flask import Flask, Response, render_template, jsonify, request
 import logging
+from sqlalchemy import text
 
 # 添加src目录到Python路径
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from config import get_config
-from models import db, Alert
+from models import db, Alert, configure_engine, get_lock_stats, read_db, upgrade_schema
 from services import MonitorService
 from api import price_bp, alert_bp
 from utils import setup_logging
+from utils.metrics import CONTENT_TYPE, REGISTRY
 
 # 全局变量
 monitor_service = None
@@ -54,10 +56,13 @@ def create_app(config_name=None):
     app.register_blueprint(price_bp)
     app.register_blueprint(alert_bp)
     
-    # 创建数据库表
+    # 配置 SQLite 连接并创建数据库表
     with app.app_context():
+        configure_engine(db.engine, app.config)
+        read_db.init_app(app, db.engine)
         try:
             db.create_all()
+            upgrade_schema(db.engine)
             logger.info("数据库表创建成功")
         except Exception as e:
             logger.error(f"数据库初始化失败: {e}")
@@ -70,9 +75,12 @@ def create_app(config_name=None):
     
     # 启动监控服务
     global monitor_service
-    monitor_service = MonitorService()
+    monitor_service = MonitorService(app)
+    app.extensions['monitor_service'] = monitor_service
     
-    if not app.config.get('TESTING', False):
+    if not config.MONITOR_IN_PROCESS:
+        logger.info("进程内监控已关闭，价格监控由独立进程 (python -m src.worker) 负责")
+    elif not app.config.get('TESTING', False):
         if monitor_service.start():
             logger.info("价格监控服务已启动")
         else:
@@ -96,7 +104,7 @@ def register_routes(app):
         
         try:
             # 检查数据库连接
-            db.session.execute('SELECT 1')
+            db.session.execute(text('SELECT 1'))
             db_status = 'healthy'
         except Exception:
             db_status = 'unhealthy'
@@ -104,15 +112,24 @@ def register_routes(app):
         # 检查监控服务状态
         monitor_status = monitor_service.get_status() if monitor_service else {'running': False}
         
+        # 进程内监控关闭时，监控由独立进程负责，不影响 Web 进程的健康状态
+        monitor_ok = monitor_status['running'] or not app.config.get('MONITOR_IN_PROCESS', True)
+        
         status = {
-            'status': 'healthy' if db_status == 'healthy' and monitor_status['running'] else 'unhealthy',
+            'status': 'healthy' if db_status == 'healthy' and monitor_ok else 'unhealthy',
             'database': db_status,
             'monitor_service': monitor_status,
+            'database_locks': get_lock_stats(db.engine),
             'version': '2.0.0'
         }
         
         return jsonify(status), 200 if status['status'] == 'healthy' else 503
     
+    @app.route('/metrics')
+    def metrics():
+        """Prometheus 文本格式的指标"""
+        return Response(REGISTRY.render(), mimetype=CONTENT_TYPE)
+    
     @app.route('/api/monitor/status')
     def monitor_status():
         """获取监控服务状态"""
@@ -129,6 +146,23 @@ def register_routes(app):
                 'error': '监控服务未初始化'
             }), 500
     
+    @app.route('/api/monitor/ticks')
+    def monitor_ticks():
+        """获取最近若干轮检查的分阶段耗时记录（最新的在前）"""
+        global monitor_service
+        
+        if not monitor_service:
+            return jsonify({
+                'success': False,
+                'error': '监控服务未初始化'
+            }), 500
+        
+        limit = request.args.get('limit', type=int)
+        return jsonify({
+            'success': True,
+            'data': monitor_service.alert_service.ticks.recent(limit)
+        })
+    
     @app.route('/api/monitor/restart', methods=['POST'])
     def restart_monitor():
         """重启监控服务"""
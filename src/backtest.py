@@ -0,0 +1,110 @@
+# src/backtest.py
+"""
+提醒回测命令行工具
+
+在历史K线上回放提醒，输出每个提醒的触发时间和触发次数汇总，不发送任何通知。
+提醒来自 JSON 文件（提醒定义列表）或数据库中的活跃提醒。
+
+用法:
+    python -m src.backtest --start 2024-01-01 [--end 2025-01-01] [--interval 1m]
+                           [--alerts alerts.json] [--store instance/candles] [--output result.json]
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+from datetime import datetime, timezone
+from typing import List, Optional
+
+from .config import get_config
+from .services.backtest_service import BacktestService, CandleStore
+from .utils import setup_logging
+
+logger = logging.getLogger(__name__)
+
+# 项目根目录
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def parse_time(text: str) -> datetime:
+    """解析 UTC 时间（YYYY-MM-DD 或 ISO 格式）"""
+    moment = datetime.fromisoformat(text)
+    return moment if moment.tzinfo else moment.replace(tzinfo=timezone.utc)
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description='CryptoChart Pro 提醒回测')
+    parser.add_argument('--config', default=None,
+                        help='配置名称（development / production / testing），默认读取 FLASK_ENV')
+    parser.add_argument('--start', required=True, type=parse_time,
+                        help='回测开始时间（UTC，YYYY-MM-DD 或 ISO 格式）')
+    parser.add_argument('--end', default=None, type=parse_time,
+                        help='回测结束时间（UTC），默认当前时间')
+    parser.add_argument('--interval', default=None,
+                        help='K线周期，默认 BACKTEST_INTERVAL')
+    parser.add_argument('--alerts', default=None,
+                        help='提醒定义 JSON 文件，默认使用数据库中的活跃提醒')
+    parser.add_argument('--store', default=None,
+                        help='本地K线存储目录，默认 BACKTEST_CANDLE_DIR')
+    parser.add_argument('--output', default=None,
+                        help='完整结果写入的 JSON 文件，默认只输出汇总')
+    return parser.parse_args(argv)
+
+
+def load_alerts(args: argparse.Namespace) -> list:
+    """从文件或数据库读取提醒定义"""
+    if args.alerts:
+        with open(args.alerts, encoding='utf-8') as f:
+            return json.load(f)
+
+    from .models import Alert
+    from .worker import create_worker_app
+
+    app = create_worker_app(args.config)
+    with app.app_context():
+        return [alert.to_dict() for alert in Alert.get_active_alerts()]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    回测入口
+
+    Returns:
+        进程退出码
+    """
+    args = parse_args(argv)
+    config = get_config(args.config)
+    setup_logging(logging.INFO, app_name="CryptoChartBacktest")
+
+    alerts = load_alerts(args)
+    if not alerts:
+        logger.error("没有需要回测的提醒")
+        return 1
+
+    store = CandleStore(os.path.join(BASE_DIR, args.store or config.BACKTEST_CANDLE_DIR))
+    service = BacktestService(store=store)
+
+    try:
+        result = service.run(
+            alerts,
+            start=args.start,
+            end=args.end or datetime.now(timezone.utc),
+            interval=args.interval or config.BACKTEST_INTERVAL
+        )
+    except ValueError as e:
+        logger.error(f"回测参数错误: {e}")
+        return 2
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+
+    summary = {key: value for key, value in result.items() if key != 'results'}
+    print(json.dumps(summary, ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,344 @@
+# src/benchmark.py
+"""
+提醒监控基准测试命令行工具
+
+在临时数据库中生成大量合成提醒，用本地脚本价格源驱动 AlertService.check_all_alerts，
+输出每秒检查轮数、单轮耗时 p50/p99、峰值内存和数据库写入量。不访问任何网络接口，
+也不发送通知。
+
+在改动前后各运行一次，用 --compare 指定改动前保存的结果即可得到对比表:
+    python -m src.benchmark --alerts 100000 --output before.json
+    python -m src.benchmark --alerts 100000 --compare before.json
+
+用法:
+    python -m src.benchmark [--alerts 100000] [--bases 40] [--rule-ratio 0.02] [--ticks 50]
+                            [--volatility 0.002] [--spread 0.03] [--seed 42] [--shards 0]
+                            [--scheduled] [--database scratch.db] [--output result.json]
+                            [--compare before.json]
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+import numpy as np
+from flask import Flask
+from sqlalchemy import event
+
+from .config import get_config
+from .models import configure_engine, db, read_db, upgrade_schema
+from .services.alert_book import AlertBook
+from .services.alert_service import AlertService
+from .services.load_generator import LoadGenerator, NullNotificationService, ScriptedPriceService
+from .services.shard_pool import ShardPool
+from .services.tick_trace import TickRecorder
+from .utils import setup_logging
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+# 对比表中的指标: (键, 名称, 是否越小越好)
+REPORT_METRICS = (
+    ('ticks_per_second', '每秒检查轮数', False),
+    ('tick_p50_ms', '单轮耗时 p50 (ms)', True),
+    ('tick_p99_ms', '单轮耗时 p99 (ms)', True),
+    ('tick_max_ms', '单轮耗时最大值 (ms)', True),
+    ('load_seconds', '提醒簿加载 (s)', True),
+    ('peak_rss_mb', '峰值内存 (MB)', True),
+    ('db_write_statements', '数据库写语句数', True),
+    ('db_rows_written', '数据库写入行数', True),
+    ('db_bytes_written', '数据库文件增长 (字节)', True),
+    ('alerts_triggered', '触发的提醒数', None),
+    ('upstream_calls', '价格源调用数', True),
+)
+
+
+class WriteCounter:
+    """统计数据库引擎执行的写语句数和影响的行数"""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.statements = 0
+        self.rows = 0
+        event.listen(engine, 'after_cursor_execute', self._after_execute)
+
+    def _after_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip()[:6].upper() in ('INSERT', 'UPDATE', 'DELETE'):
+            self.statements += 1
+            self.rows += max(cursor.rowcount, 0)
+
+    def reset(self) -> None:
+        self.statements = 0
+        self.rows = 0
+
+    def close(self) -> None:
+        event.remove(self.engine, 'after_cursor_execute', self._after_execute)
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description='CryptoChart Pro 提醒监控基准测试')
+    parser.add_argument('--config', default=None,
+                        help='配置名称（development / production / testing），默认读取 FLASK_ENV')
+    parser.add_argument('--alerts', type=int, default=100000, help='合成提醒数量')
+    parser.add_argument('--bases', type=int, default=40, help='使用的基础货币数量')
+    parser.add_argument('--rule-ratio', type=float, default=0.02, help='规则提醒所占比例')
+    parser.add_argument('--ticks', type=int, default=50, help='检查轮数')
+    parser.add_argument('--volatility', type=float, default=0.002, help='价格路径每一步的波动率')
+    parser.add_argument('--spread', type=float, default=0.03,
+                        help='目标价格相对起始价格的对数标准差')
+    parser.add_argument('--seed', type=int, default=42, help='随机种子')
+    parser.add_argument('--shards', type=int, default=0, help='分片评估进程数')
+    parser.add_argument('--scheduled', action='store_true',
+                        help='按自适应调度只检查到期的货币对（默认每轮检查全部货币对）')
+    parser.add_argument('--database', default=None,
+                        help='临时数据库文件路径（不能已存在），默认在临时目录中创建')
+    parser.add_argument('--output', default=None, help='结果写入的 JSON 文件')
+    parser.add_argument('--compare', default=None, help='与之对比的上一次结果 JSON 文件')
+    return parser.parse_args(argv)
+
+
+def create_scratch_app(config_name: Optional[str], path: str) -> Flask:
+    """创建使用临时 SQLite 数据库的最小应用"""
+    app = Flask(__name__)
+    app.config.from_object(get_config(config_name))
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{os.path.abspath(path)}'
+    db.init_app(app)
+    with app.app_context():
+        configure_engine(db.engine, app.config)
+        read_db.init_app(app, db.engine)
+        db.create_all()
+        upgrade_schema(db.engine)
+    return app
+
+
+def peak_rss_mb() -> Optional[float]:
+    """本进程的峰值常驻内存（MB），平台不支持时返回None"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 单位为 KB，macOS 为字节
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def database_bytes(path: str) -> int:
+    """数据库文件及其日志文件的总大小"""
+    return sum(os.path.getsize(name) for name in (path, path + '-wal', path + '-journal')
+               if os.path.exists(name))
+
+
+def run(args: argparse.Namespace, path: str) -> Dict[str, Any]:
+    """
+    生成负载并执行基准测试
+
+    Args:
+        args: 命令行参数
+        path: 临时数据库文件路径
+
+    Returns:
+        结果字典
+    """
+    app = create_scratch_app(args.config, path)
+    prices = ScriptedPriceService(args.ticks, args.volatility, args.seed)
+    notifications = NullNotificationService()
+    generator = LoadGenerator(prices, bases=args.bases, rule_ratio=args.rule_ratio,
+                              spread=args.spread, seed=args.seed)
+
+    with app.app_context():
+        started = time.perf_counter()
+        generator.populate(args.alerts)
+        populate_seconds = time.perf_counter() - started
+
+        service = AlertService(book=AlertBook(), price_service=prices,
+                               notification_service=notifications)
+        service.ticks = TickRecorder(args.ticks)
+
+        shards = None
+        if args.shards > 0:
+            shards = ShardPool(args.shards, start_method=service.config.MONITOR_SHARD_START_METHOD,
+                               timeout=service.config.MONITOR_SHARD_TIMEOUT)
+            shards.start(service.alert_book)
+            service.shards = shards
+
+        writes = WriteCounter(db.engine)
+        try:
+            started = time.perf_counter()
+            service.alert_book.load()
+            load_seconds = time.perf_counter() - started
+
+            prices.calls = 0
+            writes.reset()
+            size_before = database_bytes(path)
+            latencies = []
+            totals = {'checked': 0, 'triggered': 0, 'crossed': 0, 'errors': 0}
+
+            started = time.perf_counter()
+            for _ in range(args.ticks):
+                prices.advance()
+                tick_started = time.perf_counter()
+                stats = service.check_all_alerts(force=not args.scheduled)
+                latencies.append(time.perf_counter() - tick_started)
+                for key in totals:
+                    totals[key] += stats.get(key, 0)
+            elapsed = time.perf_counter() - started
+        finally:
+            writes.close()
+            if shards is not None:
+                service.shards = None
+                shards.stop()
+
+        db_bytes_written = database_bytes(path) - size_before
+        db.session.remove()
+
+    latencies_ms = np.array(latencies) * 1000
+    phases: Dict[str, List[float]] = {}
+    for trace in service.ticks.recent():
+        for name, value in trace['phases_ms'].items():
+            phases.setdefault(name, []).append(value)
+
+    return {
+        'created_at': datetime.utcnow().isoformat(),
+        'parameters': {
+            'alerts': args.alerts,
+            'bases': args.bases,
+            'rule_ratio': args.rule_ratio,
+            'ticks': args.ticks,
+            'volatility': args.volatility,
+            'spread': args.spread,
+            'seed': args.seed,
+            'shards': args.shards,
+            'scheduled': args.scheduled
+        },
+        'pairs': len(service.alert_book.pairs()),
+        'populate_seconds': round(populate_seconds, 3),
+        'load_seconds': round(load_seconds, 3),
+        'ticks_per_second': round(args.ticks / elapsed, 3) if elapsed > 0 else None,
+        'tick_p50_ms': round(float(np.percentile(latencies_ms, 50)), 2) if args.ticks else None,
+        'tick_p99_ms': round(float(np.percentile(latencies_ms, 99)), 2) if args.ticks else None,
+        'tick_max_ms': round(float(latencies_ms.max()), 2) if args.ticks else None,
+        'phase_p50_ms': {name: round(float(np.percentile(values, 50)), 2)
+                         for name, values in phases.items()},
+        'peak_rss_mb': peak_rss_mb(),
+        'db_write_statements': writes.statements,
+        'db_rows_written': writes.rows,
+        'db_bytes_written': db_bytes_written,
+        'alerts_checked': totals['checked'],
+        'alerts_triggered': totals['triggered'],
+        'alerts_crossed': totals['crossed'],
+        'errors': totals['errors'],
+        'notifications_sent': notifications.sent,
+        'upstream_calls': prices.calls
+    }
+
+
+def format_report(result: Dict[str, Any], baseline: Optional[Dict[str, Any]] = None) -> str:
+    """
+    生成结果表格，给出基线时附上对比列
+
+    Args:
+        result: 本次结果
+        baseline: 上一次结果
+
+    Returns:
+        表格文本
+    """
+    header = ['指标', '本次'] if baseline is None else ['指标', '基线', '本次', '变化']
+    rows = []
+    for key, title, lower_is_better in REPORT_METRICS:
+        current = result.get(key)
+        if baseline is None:
+            rows.append([title, _cell(current)])
+            continue
+
+        before = baseline.get(key)
+        change = ''
+        if isinstance(before, (int, float)) and isinstance(current, (int, float)) and before:
+            delta = (current - before) / before * 100
+            change = f'{delta:+.1f}%'
+            if lower_is_better is not None and abs(delta) >= 5:
+                change += ' 改善' if (delta < 0) == lower_is_better else ' 退化'
+        rows.append([title, _cell(before), _cell(current), change])
+
+    return format_table(header, rows)
+
+
+def format_table(header: List[str], rows: List[List[str]]) -> str:
+    """
+    生成按列对齐的文本表格（中文字符按两列宽度对齐）
+
+    Args:
+        header: 表头
+        rows: 各行单元格文本
+
+    Returns:
+        表格文本
+    """
+    widths = [max(_width(row[i]) for row in [header] + rows) for i in range(len(header))]
+    lines = [_line(header, widths), _line(['-' * width for width in widths], widths)]
+    lines.extend(_line(row, widths) for row in rows)
+    return '\n'.join(lines)
+
+
+def _cell(value: Any) -> str:
+    if value is None:
+        return '-'
+    if isinstance(value, float):
+        return f'{value:,.2f}'
+    if isinstance(value, int):
+        return f'{value:,}'
+    return str(value)
+
+
+def _width(text: str) -> int:
+    # 中文字符在终端中占两列
+    return sum(2 if ord(char) > 0x2e80 else 1 for char in text)
+
+
+def _line(cells: List[str], widths: List[int]) -> str:
+    return ' | '.join(cell + ' ' * (width - _width(cell)) for cell, width in zip(cells, widths))
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    基准测试入口
+
+    Returns:
+        进程退出码
+    """
+    args = parse_args(argv)
+    setup_logging(logging.WARNING, app_name="CryptoChartBenchmark")
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    if args.database:
+        if os.path.exists(args.database):
+            logger.error(f"数据库文件已存在，基准测试只写入新的临时数据库: {args.database}")
+            return 2
+        result = run(args, args.database)
+    else:
+        with tempfile.TemporaryDirectory(prefix='cryptochart-bench-') as directory:
+            result = run(args, os.path.join(directory, 'benchmark.db'))
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+
+    if baseline is not None and baseline.get('parameters') != result['parameters']:
+        print(f"注意: 基线参数不同 {baseline.get('parameters')}")
+    print(format_report(result, baseline))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
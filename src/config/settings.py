@@ -16,19 +16,91 @@ class Config:
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///instance/crypto_alerts.db'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     
-    # API 配置
-    COINGECKO_API_URL = 'https://api.coingecko.com/api/v3'
+    # SQLite 连接配置（见 src/models/engine.py）
+    SQLITE_JOURNAL_MODE = os.environ.get('SQLITE_JOURNAL_MODE', 'wal')  # WAL 模式下读取不等待写入
+    SQLITE_SYNCHRONOUS = os.environ.get('SQLITE_SYNCHRONOUS', 'normal')  # WAL 模式下 NORMAL 只在检查点时同步磁盘
+    SQLITE_BUSY_TIMEOUT = int(os.environ.get('SQLITE_BUSY_TIMEOUT', 5000))  # 等待写锁的最长时间（毫秒）
+    SQLITE_MMAP_SIZE = int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))  # 内存映射读取的上限（字节），0 表示关闭
+    SQLITE_CACHE_SIZE = int(os.environ.get('SQLITE_CACHE_SIZE', -65536))  # 每个连接的页缓存，负数单位为 KiB
+    SQLITE_READ_POOL_SIZE = int(os.environ.get('SQLITE_READ_POOL_SIZE', 8))  # 只读连接池大小
+    SQLITE_LOCK_WAIT_WARNING = 1.0  # 写锁等待超过该时长（秒）时记录警告
+    
+    # API 配置（设置 UPSTREAM_BASE_URL 后全部指向本地模拟交易所，见 src/fake_exchange.py）
+    UPSTREAM_BASE_URL = os.environ.get('UPSTREAM_BASE_URL', '').rstrip('/')
+    COINGECKO_API_URL = os.environ.get('COINGECKO_API_URL') or (
+        f'{UPSTREAM_BASE_URL}/coingecko/api/v3' if UPSTREAM_BASE_URL else 'https://api.coingecko.com/api/v3')
+    BINANCE_API_URL = os.environ.get('BINANCE_API_URL') or (
+        f'{UPSTREAM_BASE_URL}/binance/api/v3' if UPSTREAM_BASE_URL else 'https://api.binance.com/api/v3')
     API_REQUEST_TIMEOUT = 30
     
+    # 列表接口分页配置
+    ALERT_PAGE_SIZE = int(os.environ.get('ALERT_PAGE_SIZE', 100))  # GET /api/alerts 默认每页数量
+    ALERT_PAGE_SIZE_MAX = 1000  # 每页数量上限，也是 NDJSON 导出每批读取的行数
+    ALERT_STATISTICS_RECONCILE_INTERVAL = int(os.environ.get('ALERT_STATISTICS_RECONCILE_INTERVAL', 60))  # 提醒统计计数器与数据库校正的间隔（秒）
+    
+    # 批量提醒接口配置
+    ALERT_BULK_MAX_ITEMS = int(os.environ.get('ALERT_BULK_MAX_ITEMS', 1000))  # 单次批量请求的提醒数量上限
+    ALERT_VALIDATION_CACHE_TTL = int(os.environ.get('ALERT_VALIDATION_CACHE_TTL', 3600))  # 货币对和 Webhook 验证通过结果的缓存时间（秒）
+    
     # 价格监控配置
     PRICE_CHECK_INTERVAL = 30  # 秒
     MAX_RETRIES = 3
     RETRY_DELAY = 5  # 秒
+    ALERT_JOURNAL_RETENTION_HOURS = 24  # 提醒变更日志保留时长（小时）
+    ADAPTIVE_SCHEDULING = os.environ.get('ADAPTIVE_SCHEDULING', 'true').lower() == 'true'  # 按距离和波动率调度检查
+    CHECK_INTERVAL_FLOOR = int(os.environ.get('CHECK_INTERVAL_FLOOR', 5))  # 单个货币对的最短检查间隔（秒）
+    CHECK_INTERVAL_CEILING = int(os.environ.get('CHECK_INTERVAL_CEILING', 600))  # 单个货币对的最长检查间隔（秒）
+    CHECK_SCHEDULE_SIGMAS = 3.0  # 调度时假设价格以几倍标准差的速度移动
+    CHECK_NEAR_TARGET = float(os.environ.get('CHECK_NEAR_TARGET', 0.01))  # 距最近目标在该比例以内的货币对至少每 PRICE_CHECK_INTERVAL 检查一次
+    CROSSING_DETECTION = os.environ.get('CROSSING_DETECTION', 'true').lower() == 'true'  # 用两次检查之间的1分钟K线高低点判断穿越
+    CROSSING_LOOKBACK_LIMIT = 900  # K线回看的最长时间（秒）
+    MONITOR_TICK_HISTORY = 100  # 保留最近多少轮检查的分阶段耗时记录
+    
+    # 监控选主配置
+    MONITOR_LEADER_BACKEND = os.environ.get('MONITOR_LEADER_BACKEND', 'database')  # 'database'、'file' 或 'none'
+    MONITOR_LEASE_NAME = 'price-monitor'  # 租约名称
+    MONITOR_LEASE_TTL = 15  # 租约有效期（秒），领导者失联后最多经过该时长完成切换
+    MONITOR_LEASE_HEARTBEAT = 5  # 续约和竞选间隔（秒）
+    MONITOR_FORCE_CHECK_TIMEOUT = 10  # POST /api/alerts/check 等待领导者完成强制检查的最长时间（秒），超时返回 202
+    MONITOR_CHECK_REQUEST_POLL = 1  # 领导者查询和请求方等待强制检查请求的间隔（秒）
+    MONITOR_CHECK_REQUEST_RETENTION_HOURS = 24  # 强制检查请求保留时长（小时）
+    MONITOR_LOCK_FILE = os.environ.get('MONITOR_LOCK_FILE', 'instance/price-monitor.lock')  # 文件锁路径（单机部署）
     
     # Discord 配置
     DISCORD_WEBHOOK_URL = os.environ.get('DISCORD_WEBHOOK_URL')
     DISCORD_ENABLED = bool(DISCORD_WEBHOOK_URL)
     
+    # 通知发送配置
+    NOTIFICATION_TIMEOUT = 10  # 单次发送超时（秒）
+    NOTIFICATION_WORKERS = int(os.environ.get('NOTIFICATION_WORKERS', 4))  # 发送线程数
+    NOTIFICATION_QUEUE_SIZE = int(os.environ.get('NOTIFICATION_QUEUE_SIZE', 1000))  # 发送队列容量
+    NOTIFICATION_FLUSH_INTERVAL = 1  # 发送结果写回数据库的间隔（秒）
+    NOTIFICATION_BATCH_WINDOW = 2  # 同一Webhook的通知合并窗口（秒）
+    NOTIFICATION_MAX_ATTEMPTS = 5  # 限流或服务端错误时的最大尝试次数
+    OUTBOX_MAX_ATTEMPTS = 8  # 发件箱中单条通知的最大投递轮数
+    OUTBOX_RETRY_BASE = 30  # 发件箱重试的基础退避时间（秒），按轮数指数增长
+    OUTBOX_REPLAY_BATCH = 500  # 每次重放的最大通知数
+    OUTBOX_RETENTION_HOURS = 72  # 已投递和已放弃的通知保留时长（小时）
+    OUTBOX_PRUNE_INTERVAL = 3600  # 清理发件箱的间隔（秒）
+    
+    # 监控进程配置
+    MONITOR_IN_PROCESS = os.environ.get('MONITOR_IN_PROCESS', 'true').lower() == 'true'  # Web 进程内是否启动监控
+    MONITOR_WORKER_CHECK_INTERVAL = int(os.environ.get('MONITOR_WORKER_CHECK_INTERVAL', PRICE_CHECK_INTERVAL))  # 独立监控进程的检查间隔（秒）
+    MONITOR_WORKER_NOTIFICATION_WORKERS = int(os.environ.get('MONITOR_WORKER_NOTIFICATION_WORKERS', NOTIFICATION_WORKERS))  # 独立监控进程的发送线程数
+    MONITOR_WORKER_LOG_FILE = os.environ.get('MONITOR_WORKER_LOG_FILE', 'logs/monitor-worker.log')  # 独立监控进程的日志文件
+    MONITOR_WORKER_METRICS_PORT = int(os.environ.get('MONITOR_WORKER_METRICS_PORT', 0))  # 独立监控进程的 /metrics 端口，0 表示不提供
+    MONITOR_SHARDS = int(os.environ.get('MONITOR_SHARDS', 0))  # 分片评估进程数，0 表示在监控线程内评估
+    MONITOR_SHARD_TIMEOUT = 10  # 等待分片回复评估结果的最长时间（秒）
+    MONITOR_SHARD_START_METHOD = os.environ.get('MONITOR_SHARD_START_METHOD', 'spawn')  # 分片进程的启动方式
+    
+    # 回测配置
+    BACKTEST_CANDLE_DIR = os.environ.get('BACKTEST_CANDLE_DIR', 'instance/candles')  # 本地K线存储目录
+    BACKTEST_INTERVAL = '1m'  # 默认回测K线周期
+    
+    # 模拟交易所配置（离线性能测试）
+    FAKE_EXCHANGE_CASSETTE = os.environ.get('FAKE_EXCHANGE_CASSETTE', 'instance/cassettes/exchange.json')  # 录制的上游响应文件
+    FAKE_EXCHANGE_PORT = int(os.environ.get('FAKE_EXCHANGE_PORT', 8765))  # 模拟交易所端口
+    
     # 应用配置
     HOST = os.environ.get('HOST', '127.0.0.1')
     PORT = int(os.environ.get('PORT', 5008))
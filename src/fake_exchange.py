@@ -0,0 +1,114 @@
+# src/fake_exchange.py
+"""
+本地模拟交易所命令行工具
+
+从 cassette 回放币安、CoinGecko 和汇率接口的响应，可注入延迟、错误和 429 限流。
+启动后将 UPSTREAM_BASE_URL 设置为输出的地址，Web 进程、监控进程和基准测试
+都会改为请求本地服务。
+
+录制（需要网络）: 以 --mode record 启动后照常使用应用，退出时保存 cassette。
+生成（无需网络）: --synthesize 用脚本价格路径生成 cassette 后再回放。
+
+用法:
+    python -m src.fake_exchange [--cassette instance/cassettes/exchange.json] [--mode replay]
+                                [--synthesize] [--host 127.0.0.1] [--port 8765]
+                                [--latency-ms 0] [--jitter-ms 0] [--error-rate 0]
+                                [--rate-limit-rate 0] [--retry-after 1] [--seed 0] [--no-rebase]
+"""
+import argparse
+import logging
+import os
+import signal
+import sys
+import threading
+from typing import List, Optional
+
+from .config import get_config
+from .services.fake_exchange import (Cassette, FakeExchange, FakeExchangeServer, FaultInjector,
+                                     synthesize_cassette)
+from .services.load_generator import ScriptedPriceService
+from .utils import setup_logging
+
+logger = logging.getLogger(__name__)
+
+# 项目根目录
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 录制模式下定期保存的间隔（秒）
+SAVE_INTERVAL = 30
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description='CryptoChart Pro 本地模拟交易所')
+    parser.add_argument('--config', default=None,
+                        help='配置名称（development / production / testing），默认读取 FLASK_ENV')
+    parser.add_argument('--cassette', default=None, help='cassette 文件，默认 FAKE_EXCHANGE_CASSETTE')
+    parser.add_argument('--mode', choices=FakeExchange.MODES, default='replay',
+                        help='replay 只回放录制的响应；record 转发到真实上游并录制')
+    parser.add_argument('--synthesize', action='store_true',
+                        help='用脚本价格路径生成 cassette（覆盖已有文件）')
+    parser.add_argument('--host', default='127.0.0.1', help='监听地址')
+    parser.add_argument('--port', type=int, default=None, help='端口，默认 FAKE_EXCHANGE_PORT')
+    parser.add_argument('--latency-ms', type=float, default=0, help='每个请求的固定延迟（毫秒）')
+    parser.add_argument('--jitter-ms', type=float, default=0, help='在固定延迟上增加的随机延迟上限（毫秒）')
+    parser.add_argument('--error-rate', type=float, default=0, help='返回 503 的请求比例')
+    parser.add_argument('--rate-limit-rate', type=float, default=0, help='返回 429 的请求比例')
+    parser.add_argument('--retry-after', type=int, default=1, help='429 响应的 Retry-After（秒）')
+    parser.add_argument('--seed', type=int, default=0, help='故障注入和价格生成的随机种子')
+    parser.add_argument('--no-rebase', action='store_true',
+                        help='回放K线时不按当前时间平移')
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    模拟交易所入口
+
+    Returns:
+        进程退出码
+    """
+    args = parse_args(argv)
+    config = get_config(args.config)
+    setup_logging(logging.INFO, app_name="CryptoChartFakeExchange")
+
+    path = os.path.join(BASE_DIR, args.cassette or config.FAKE_EXCHANGE_CASSETTE)
+    if args.synthesize:
+        cassette = synthesize_cassette(ScriptedPriceService(0, seed=args.seed), path)
+        cassette.save()
+        logger.info(f"已生成 cassette: {path}（{len(cassette)} 条响应）")
+    else:
+        cassette = Cassette.load(path)
+
+    if args.mode == 'replay' and not len(cassette):
+        logger.error(f"cassette 为空或不存在: {path}（先录制或使用 --synthesize）")
+        return 1
+
+    faults = FaultInjector(args.latency_ms, args.jitter_ms, args.error_rate,
+                           args.rate_limit_rate, args.retry_after, args.seed)
+    exchange = FakeExchange(cassette, faults, mode=args.mode, rebase_time=not args.no_rebase)
+    server = FakeExchangeServer(exchange, args.host, args.port or config.FAKE_EXCHANGE_PORT)
+
+    stop_event = threading.Event()
+
+    def handle_signal(signum, frame):
+        logger.info(f"收到信号 {signum}，准备退出")
+        stop_event.set()
+
+    signal.signal(signal.SIGTERM, handle_signal)
+    signal.signal(signal.SIGINT, handle_signal)
+
+    url = server.start()
+    logger.info(f"模拟交易所已启动（{args.mode}，{len(cassette)} 条响应）: export UPSTREAM_BASE_URL={url}")
+
+    while not stop_event.wait(timeout=SAVE_INTERVAL):
+        if cassette.dirty:
+            cassette.save()
+
+    server.stop()
+    logger.info(f"模拟交易所已停止: {exchange.get_stats()}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
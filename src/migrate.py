@@ -0,0 +1,114 @@
+# src/migrate.py
+"""
+数据库结构迁移命令行工具
+
+Web 进程和监控进程启动时会自动执行迁移；也可以在部署前单独运行，
+或用 --check-plans 确认监控的热点查询使用了活跃提醒的部分索引（未使用时退出码为 1）。
+
+用法:
+    python -m src.migrate [--config production] [--database path/to.db] [--dry-run] [--check-plans]
+"""
+import argparse
+import logging
+import os
+import sys
+from datetime import datetime
+from typing import Dict, List, Optional
+from flask import Flask
+from sqlalchemy import func, select, tuple_
+
+from .benchmark import format_table
+from .config import get_config
+from .models import Alert, configure_engine, db
+from .models.migrations import (ACTIVE_ALERT_INDEX, CREATED_AT_INDEX, check_query_plans,
+                                get_schema_version, latest_version, upgrade_schema)
+from .services.alert_book import AlertBook
+from .utils import setup_logging
+
+logger = logging.getLogger(__name__)
+
+# 项目根目录
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def plan_checks() -> Dict[str, tuple]:
+    """监控热点查询及其应当使用的索引"""
+    active = {'is_active': True, 'is_triggered': False}
+    return {
+        'alert_book_load': (AlertBook.active_query(), ACTIVE_ALERT_INDEX),
+        'active_pairs': (
+            select(Alert.base_currency, Alert.quote_currency, func.count(Alert.id))
+            .filter_by(**active).group_by(Alert.base_currency, Alert.quote_currency),
+            ACTIVE_ALERT_INDEX
+        ),
+        'active_pair_thresholds': (
+            select(Alert.id, Alert.target_price).filter_by(
+                base_currency='bitcoin', quote_currency='usd', condition_type='above', **active
+            ).order_by(Alert.target_price),
+            ACTIVE_ALERT_INDEX
+        ),
+        'alert_list_page': (
+            select(Alert.id, Alert.created_at, Alert.target_price)
+            .where(tuple_(Alert.created_at, Alert.id) < (datetime(2024, 1, 1), 1000))
+            .order_by(Alert.created_at.desc(), Alert.id.desc()).limit(100),
+            CREATED_AT_INDEX
+        ),
+    }
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """解析命令行参数"""
+    parser = argparse.ArgumentParser(description='CryptoChart Pro 数据库结构迁移')
+    parser.add_argument('--config', default=None,
+                        help='配置名称（development / production / testing），默认读取 FLASK_ENV')
+    parser.add_argument('--database', default=None, help='SQLite 数据库文件，默认使用配置中的数据库')
+    parser.add_argument('--dry-run', action='store_true', help='只列出待执行的迁移')
+    parser.add_argument('--check-plans', action='store_true',
+                        help='迁移后检查热点查询的执行计划')
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    迁移入口
+
+    Returns:
+        进程退出码
+    """
+    args = parse_args(argv)
+    setup_logging(logging.INFO, app_name="CryptoChartMigrate")
+
+    app = Flask(__name__, instance_path=os.path.join(BASE_DIR, 'instance'))
+    app.config.from_object(get_config(args.config))
+    if args.database:
+        app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{os.path.abspath(args.database)}'
+    db.init_app(app)
+
+    with app.app_context():
+        configure_engine(db.engine, app.config)
+        with db.engine.connect() as conn:
+            current = get_schema_version(conn)
+        logger.info(f"数据库结构版本 {current}，最新版本 {latest_version()}")
+
+        if args.dry_run:
+            for item in upgrade_schema(db.engine, dry_run=True):
+                print(f"{item.version}: {item.description}")
+            return 0
+
+        db.create_all()
+        upgrade_schema(db.engine)
+
+        if not args.check_plans:
+            return 0
+
+        with db.engine.connect() as conn:
+            results = check_query_plans(conn, plan_checks())
+
+    print(format_table(['查询', '执行计划', '结果'],
+                       [[name, '; '.join(result['plan']), '通过' if result['ok'] else '未使用索引']
+                        for name, result in results.items()]))
+    return 0 if all(result['ok'] for result in results.values()) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -7,5 +7,12 @@ from flask_sqlalchemy import SQLAlchemy
 db = SQLAlchemy()
 
 from .alert import Alert
+from .alert_change import AlertChange
+from .notification_outbox import NotificationOutbox
+from .monitor_lease import MonitorLease
+from .check_request import CheckRequest
+from .engine import configure_engine, get_lock_stats, read_db
+from .migrations import upgrade_schema
 
-__all__ = ['db', 'Alert']
+__all__ = ['db', 'Alert', 'AlertChange', 'NotificationOutbox', 'MonitorLease', 'CheckRequest',
+           'configure_engine', 'get_lock_stats', 'read_db', 'upgrade_schema']
@@ -10,6 +10,14 @@ from . import db
 class Alert(db.Model):
     """价格提醒模型"""
     __tablename__ = 'alerts'
+    __table_args__ = (
+        # 监控只读取活跃提醒并按货币对分组，部分索引只包含这些行（已有数据库由迁移 2 创建）
+        db.Index('ix_alerts_active_pair_target', 'base_currency', 'quote_currency',
+                 'condition_type', 'target_price',
+                 sqlite_where=db.text('is_active = 1 AND is_triggered = 0')),
+        # 列表接口的游标分页
+        db.Index('ix_alerts_created_at_id', 'created_at', 'id'),
+    )
     
     # 主键
     id = db.Column(db.Integer, primary_key=True)
@@ -19,15 +27,16 @@ class Alert(db.Model):
     quote_currency = db.Column(db.String(10), nullable=False, index=True)  # 计价货币，如 USD
     
     # 提醒条件
-    condition_type = db.Column(db.String(20), nullable=False)  # 'above' 或 'below'
-    target_price = db.Column(db.Float, nullable=False)  # 目标价格
+    condition_type = db.Column(db.String(20), nullable=False)  # 'above'、'below' 或 'rule'
+    target_price = db.Column(db.Float, nullable=False)  # 目标价格（规则提醒为0）
+    rule = db.Column(db.Text, nullable=True)  # 规则表达式（仅 'rule' 类型）
     
     # Discord 通知设置
     discord_webhook_url = db.Column(db.Text, nullable=False)  # Discord Webhook URL
     
     # 提醒状态
-    is_active = db.Column(db.Boolean, default=True, index=True)  # 是否激活
-    is_triggered = db.Column(db.Boolean, default=False, index=True)  # 是否已触发
+    is_active = db.Column(db.Boolean, default=True)  # 是否激活
+    is_triggered = db.Column(db.Boolean, default=False)  # 是否已触发
     
     # 时间戳
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
@@ -49,6 +58,7 @@ class Alert(db.Model):
             'quote_currency': self.quote_currency,
             'condition_type': self.condition_type,
             'target_price': self.target_price,
+            'rule': self.rule,
             'discord_webhook_url': self.discord_webhook_url,
             'is_active': self.is_active,
             'is_triggered': self.is_triggered,
@@ -0,0 +1,64 @@
+# src/models/alert_change.py
+"""
+提醒变更日志数据模型
+"""
+from datetime import datetime, timedelta
+from typing import Optional
+from . import db
+
+
+class AlertChange(db.Model):
+    """提醒变更日志，记录影响监控的提醒变更，供监控服务增量同步"""
+    __tablename__ = 'alert_changes'
+    # 清理过期记录可能清空整张表，AUTOINCREMENT 保证序号不会从 1 重新分配，
+    # 否则新变更的序号不大于监控已同步到的位置，永远不会被应用（已有数据库由迁移 4 重建）
+    __table_args__ = {'sqlite_autoincrement': True}
+    
+    # 自增序号，同步时按序号递增读取
+    id = db.Column(db.Integer, primary_key=True)
+    
+    alert_id = db.Column(db.Integer, nullable=False)
+    action = db.Column(db.String(20), nullable=False)  # 'create', 'update', 'delete', 'trigger'
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False, index=True)
+    
+    @classmethod
+    def record(cls, alert_id: int, action: str) -> 'AlertChange':
+        """
+        在当前事务中记录一条变更（由调用方提交）
+        
+        Args:
+            alert_id: 提醒ID
+            action: 变更类型
+            
+        Returns:
+            变更记录
+        """
+        change = cls(alert_id=alert_id, action=action)
+        db.session.add(change)
+        return change
+    
+    @classmethod
+    def latest_id(cls) -> int:
+        """获取最新的变更序号"""
+        return db.session.query(db.func.max(cls.id)).scalar() or 0
+    
+    @classmethod
+    def prune(cls, max_age_hours: int, before_id: Optional[int] = None) -> int:
+        """
+        清理过期的变更记录
+        
+        Args:
+            max_age_hours: 保留时长（小时）
+            before_id: 只清理序号不大于该值的记录
+            
+        Returns:
+            清理的记录数
+        """
+        cutoff = datetime.utcnow() - timedelta(hours=max_age_hours)
+        query = cls.query.filter(cls.created_at < cutoff)
+        if before_id is not None:
+            query = query.filter(cls.id <= before_id)
+        return query.delete(synchronize_session=False)
+    
+    def __repr__(self) -> str:
+        return f'<AlertChange {self.id} {self.action} alert={self.alert_id}>'
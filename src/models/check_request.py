@@ -0,0 +1,126 @@
+# src/models/check_request.py
+"""
+强制检查请求数据模型
+"""
+import json
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+from . import db
+
+
+class CheckRequest(db.Model):
+    """
+    通过 API 请求的强制检查
+
+    任何进程都可以写入请求，由监控领导者在下一轮领取并执行，结果写回本表供请求方查询。
+    同一轮领取的所有待执行请求共用一次检查。
+    """
+    __tablename__ = 'check_requests'
+    __table_args__ = {'sqlite_autoincrement': True}
+
+    STATUS_PENDING = 'pending'
+    STATUS_RUNNING = 'running'
+    STATUS_DONE = 'done'
+    STATUS_FAILED = 'failed'
+
+    id = db.Column(db.Integer, primary_key=True)
+    status = db.Column(db.String(20), nullable=False, default=STATUS_PENDING, index=True)
+
+    # 执行检查的领导者标识（主机名:进程ID）
+    holder = db.Column(db.String(200), nullable=True)
+
+    # 检查结果统计（JSON）或失败原因
+    result = db.Column(db.Text, nullable=True)
+    error = db.Column(db.String(200), nullable=True)
+
+    # 时间戳
+    requested_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    started_at = db.Column(db.DateTime, nullable=True)
+    completed_at = db.Column(db.DateTime, nullable=True)
+
+    @property
+    def finished(self) -> bool:
+        """检查是否已经结束"""
+        return self.status in (self.STATUS_DONE, self.STATUS_FAILED)
+
+    @classmethod
+    def claim_pending(cls, holder: str) -> List[int]:
+        """
+        领取所有待执行的请求（由调用方提交）
+
+        Args:
+            holder: 领导者标识
+
+        Returns:
+            领取的请求ID
+        """
+        ids = [row.id for row in db.session.query(cls.id).filter(cls.status == cls.STATUS_PENDING)]
+        if ids:
+            cls.query.filter(cls.id.in_(ids), cls.status == cls.STATUS_PENDING).update(
+                {cls.status: cls.STATUS_RUNNING, cls.holder: holder, cls.started_at: datetime.utcnow()},
+                synchronize_session=False
+            )
+        return ids
+
+    @classmethod
+    def complete(cls, ids: List[int], stats: Optional[Dict[str, Any]],
+                 error: Optional[str] = None) -> None:
+        """
+        写入检查结果（由调用方提交）
+
+        Args:
+            ids: 请求ID
+            stats: 检查结果统计，检查失败时为None
+            error: 失败原因
+        """
+        if not ids:
+            return
+        values = {cls.completed_at: datetime.utcnow()}
+        if stats is not None:
+            values.update({cls.status: cls.STATUS_DONE, cls.result: json.dumps(stats, default=str)})
+        else:
+            values.update({cls.status: cls.STATUS_FAILED, cls.error: (error or '检查失败')[:200]})
+        cls.query.filter(cls.id.in_(ids)).update(values, synchronize_session=False)
+
+    @classmethod
+    def requeue_running(cls) -> int:
+        """
+        把执行中的请求放回待执行（前任领导者退出或失联时没有写入结果，由调用方提交）
+
+        Returns:
+            放回的请求数
+        """
+        return cls.query.filter(cls.status == cls.STATUS_RUNNING).update(
+            {cls.status: cls.STATUS_PENDING, cls.holder: None, cls.started_at: None},
+            synchronize_session=False
+        )
+
+    @classmethod
+    def prune(cls, max_age_hours: int) -> int:
+        """
+        清理过期的请求（包括一直没有领导者领取的请求）
+
+        Args:
+            max_age_hours: 保留时长（小时）
+
+        Returns:
+            清理的记录数
+        """
+        cutoff = datetime.utcnow() - timedelta(hours=max_age_hours)
+        return cls.query.filter(cls.requested_at < cutoff).delete(synchronize_session=False)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为字典格式"""
+        return {
+            'id': self.id,
+            'status': self.status,
+            'holder': self.holder,
+            'result': json.loads(self.result) if self.result else None,
+            'error': self.error,
+            'requested_at': self.requested_at.isoformat() if self.requested_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'completed_at': self.completed_at.isoformat() if self.completed_at else None
+        }
+
+    def __repr__(self) -> str:
+        return f'<CheckRequest {self.id} {self.status}>'
@@ -0,0 +1,222 @@
+# src/models/engine.py
+"""
+SQLite 连接配置与只读会话
+
+SQLite 默认使用回滚日志：监控线程提交时 Web 进程的读取要等待，两个写入同时发生时
+立即报 database is locked。configure_engine 在每个新连接上设置 WAL、synchronous=NORMAL、
+mmap、busy_timeout 和页缓存。WAL 模式下读取不等待写入，写入之间由 busy_timeout 排队。
+
+只读接口通过 read_db.session 查询：使用单独的连接池，连接设置了 query_only，
+不会和监控的写事务争用同一个连接池。
+
+SQLite 不提供锁等待时间。WAL 模式下事务中的第一条写语句要先取得写锁，
+它的耗时近似为锁等待时间，记入 cryptochart_db_lock_wait_seconds；
+等待超过 busy_timeout 失败的次数记入 cryptochart_db_lock_errors_total。
+"""
+import logging
+import sqlite3
+import threading
+import time
+import weakref
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+from flask import current_app
+from flask.globals import app_ctx
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import scoped_session, sessionmaker
+
+from ..utils.metrics import DB_LOCK_ERRORS, DB_LOCK_WAIT_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# app.extensions 中只读引擎的键
+READ_ENGINE_KEY = 'cryptochart_read_engine'
+
+# 会开始写事务的语句
+WRITE_STATEMENTS = ('INSERT', 'UPDATE', 'DELETE', 'REPLAC')
+
+# 引擎 -> 锁等待统计
+_trackers: 'weakref.WeakKeyDictionary[Engine, LockWaitTracker]' = weakref.WeakKeyDictionary()
+
+
+def is_sqlite_file(engine: Engine) -> bool:
+    """引擎是否连接到 SQLite 数据库文件（内存数据库返回False）"""
+    database = engine.url.database or ''
+    return (engine.dialect.name == 'sqlite' and database not in ('', ':memory:')
+            and not database.startswith('file::memory:'))
+
+
+def sqlite_pragmas(settings: Mapping[str, Any], in_memory: bool = False) -> List[Tuple[str, Any]]:
+    """
+    根据配置生成每个新连接要执行的 PRAGMA
+
+    Args:
+        settings: 应用配置
+        in_memory: 是否为内存数据库（不使用 WAL 和 mmap）
+
+    Returns:
+        (名称, 值) 列表
+    """
+    pragmas = []
+    if not in_memory:
+        pragmas.append(('journal_mode', settings.get('SQLITE_JOURNAL_MODE', 'wal')))
+    pragmas += [
+        ('synchronous', settings.get('SQLITE_SYNCHRONOUS', 'normal')),
+        ('busy_timeout', int(settings.get('SQLITE_BUSY_TIMEOUT', 5000))),
+        ('cache_size', int(settings.get('SQLITE_CACHE_SIZE', -65536))),
+    ]
+    if not in_memory:
+        pragmas.append(('mmap_size', int(settings.get('SQLITE_MMAP_SIZE', 0))))
+    return pragmas
+
+
+def configure_engine(engine: Engine, settings: Mapping[str, Any]) -> Optional['LockWaitTracker']:
+    """
+    为 SQLite 引擎设置连接 PRAGMA 并记录锁等待，其他数据库不做处理
+
+    应在创建第一个连接之前调用（db.init_app 之后、db.create_all 之前）。
+
+    Args:
+        engine: 写入使用的引擎（db.engine）
+        settings: 应用配置
+
+    Returns:
+        锁等待统计，非 SQLite 引擎返回None
+    """
+    if engine.dialect.name != 'sqlite':
+        return None
+
+    _listen_pragmas(engine, sqlite_pragmas(settings, in_memory=not is_sqlite_file(engine)))
+    tracker = LockWaitTracker(engine, float(settings.get('SQLITE_LOCK_WAIT_WARNING', 1.0)))
+    _trackers[engine] = tracker
+    return tracker
+
+
+def get_lock_stats(engine: Engine) -> Optional[Dict[str, Any]]:
+    """获取引擎的锁等待统计，未配置时返回None"""
+    tracker = _trackers.get(engine)
+    return tracker.get_stats() if tracker else None
+
+
+def _listen_pragmas(engine: Engine, pragmas: List[Tuple[str, Any]]) -> None:
+    def apply_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas:
+                cursor.execute(f'PRAGMA {name}={value}')
+        finally:
+            cursor.close()
+
+    event.listen(engine, 'connect', apply_pragmas)
+    # 已经建立的连接没有执行过 PRAGMA，丢弃后按需重新建立
+    engine.dispose()
+
+
+class LockWaitTracker:
+    """统计写连接取得写锁的等待时间和锁超时次数"""
+
+    def __init__(self, engine: Engine, warning_seconds: float = 1.0):
+        self.warning_seconds = warning_seconds
+        self._lock = threading.Lock()
+        self._waits = 0
+        self._total = 0.0
+        self._max = 0.0
+        self._errors = 0
+
+        event.listen(engine, 'before_cursor_execute', self._before_execute)
+        event.listen(engine, 'after_cursor_execute', self._after_execute)
+        event.listen(engine, 'commit', self._release)
+        event.listen(engine, 'rollback', self._release)
+        event.listen(engine, 'reset', self._reset)
+        event.listen(engine, 'handle_error', self._handle_error)
+
+    def _before_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if 'lock_held' not in conn.info and statement.lstrip()[:6].upper() in WRITE_STATEMENTS:
+            conn.info['lock_wait_started'] = time.perf_counter()
+
+    def _after_execute(self, conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.pop('lock_wait_started', None)
+        if started is None:
+            return
+
+        conn.info['lock_held'] = True
+        wait = time.perf_counter() - started
+        DB_LOCK_WAIT_SECONDS.observe(wait)
+        with self._lock:
+            self._waits += 1
+            self._total += wait
+            self._max = max(self._max, wait)
+        if wait >= self.warning_seconds:
+            logger.warning(f"等待数据库写锁 {wait:.2f} 秒: {statement[:80]}")
+
+    def _release(self, conn):
+        conn.info.pop('lock_held', None)
+
+    def _reset(self, dbapi_connection, connection_record, reset_state=None):
+        connection_record.info.pop('lock_held', None)
+        connection_record.info.pop('lock_wait_started', None)
+
+    def _handle_error(self, context):
+        if context.connection is not None:
+            context.connection.info.pop('lock_wait_started', None)
+
+        error = context.original_exception
+        if isinstance(error, sqlite3.OperationalError) and 'locked' in str(error):
+            DB_LOCK_ERRORS.inc()
+            with self._lock:
+                self._errors += 1
+            logger.warning(f"数据库锁等待超时: {context.statement and context.statement[:80]}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取统计信息"""
+        with self._lock:
+            return {
+                'waits': self._waits,
+                'total_wait_seconds': round(self._total, 3),
+                'max_wait_seconds': round(self._max, 3),
+                'lock_errors': self._errors
+            }
+
+
+class ReadOnlyDatabase:
+    """只读接口使用的会话，连接来自单独的 query_only 连接池"""
+
+    def __init__(self):
+        self._sessions = scoped_session(sessionmaker(autoflush=False),
+                                        scopefunc=lambda: id(app_ctx._get_current_object()))
+
+    def init_app(self, app, engine: Engine) -> None:
+        """
+        为应用创建只读引擎，内存数据库和非 SQLite 数据库继续使用 db.session
+
+        Args:
+            app: Flask应用
+            engine: 写入使用的引擎（db.engine）
+        """
+        read_engine = None
+        if is_sqlite_file(engine):
+            read_engine = create_engine(engine.url, pool_size=app.config.get('SQLITE_READ_POOL_SIZE', 8),
+                                        max_overflow=app.config.get('SQLITE_READ_POOL_SIZE', 8))
+            _listen_pragmas(read_engine, sqlite_pragmas(app.config) + [('query_only', 'on')])
+
+        app.extensions[READ_ENGINE_KEY] = read_engine
+        app.teardown_appcontext(self._remove)
+
+    @property
+    def session(self):
+        """当前应用上下文的只读会话"""
+        engine = current_app.extensions.get(READ_ENGINE_KEY)
+        if engine is None:
+            from . import db
+            return db.session
+        if self._sessions.registry.has():
+            return self._sessions()
+        return self._sessions(bind=engine)
+
+    def _remove(self, exception=None) -> None:
+        self._sessions.remove()
+
+
+# 全局只读会话
+read_db = ReadOnlyDatabase()
@@ -0,0 +1,237 @@
+# src/models/migrations.py
+"""
+数据库结构迁移
+
+db.create_all 只创建不存在的表，不会给已有的表增加列或索引。这里按版本号顺序执行迁移，
+已执行到的版本保存在 SQLite 的 PRAGMA user_version 中，启动时（db.create_all 之后）
+调用 upgrade_schema 即可把旧数据库升级到当前结构。新建的数据库由 db.create_all
+直接得到最新结构，迁移只会把版本号写到最新。
+
+SQLite 的 DDL 不在 pysqlite 的隐式事务中，每个迁移都必须可以重复执行
+（检查列是否存在、CREATE INDEX IF NOT EXISTS），中途失败后重新启动会从失败的版本继续。
+
+迁移之后还会对照模型补齐已有表中缺少的可空列（add_missing_columns），模型新增可空列
+而忘记编写迁移时，旧数据库不会因为 "no such column" 导致所有查询失败。
+"""
+import logging
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+from sqlalchemy import MetaData, inspect
+from sqlalchemy.engine import Connection, Engine
+
+logger = logging.getLogger(__name__)
+
+# 活跃提醒的复合部分索引，与模型中的声明一致（旧版 models.py 使用同名索引）
+ACTIVE_ALERT_INDEX = 'ix_alerts_active_pair_target'
+ACTIVE_ALERT_INDEX_WHERE = 'is_active = 1 AND is_triggered = 0'
+
+# 列表接口按 (created_at, id) 倒序的游标分页索引
+CREATED_AT_INDEX = 'ix_alerts_created_at_id'
+
+
+class Migration(NamedTuple):
+    version: int
+    description: str
+    upgrade: Callable[[Connection], None]
+
+
+# 已注册的迁移，按版本号排列
+MIGRATIONS: List[Migration] = []
+
+
+def migration(version: int, description: str):
+    """注册一个迁移，版本号必须连续递增"""
+    def register(upgrade):
+        if MIGRATIONS and version != MIGRATIONS[-1].version + 1:
+            raise ValueError(f"迁移版本号不连续: {version}")
+        MIGRATIONS.append(Migration(version, description, upgrade))
+        return upgrade
+    return register
+
+
+# 旧版 models.py 创建的 alerts 表缺少的列: (列名, 定义)
+ALERT_COLUMNS = (
+    ('rule', 'TEXT'),
+    ('updated_at', 'DATETIME'),
+    ('user_identifier', 'VARCHAR(100)'),
+    ('note', 'TEXT'),
+    ('trigger_count', 'INTEGER DEFAULT 0'),
+)
+
+
+@migration(1, '补齐 alerts 表的规则、更新时间和触发次数等列')
+def add_alert_columns(conn: Connection) -> None:
+    existing = {column['name'] for column in inspect(conn).get_columns('alerts')}
+    for name, definition in ALERT_COLUMNS:
+        if name not in existing:
+            conn.exec_driver_sql(f'ALTER TABLE alerts ADD COLUMN {name} {definition}')
+
+
+@migration(2, '用活跃提醒的复合部分索引替换 is_active、is_triggered 单列索引')
+def add_active_alert_index(conn: Connection) -> None:
+    # 布尔列的单列索引区分度很低，但会被优先选中，导致部分索引不被使用
+    conn.exec_driver_sql('DROP INDEX IF EXISTS ix_alerts_is_active')
+    conn.exec_driver_sql('DROP INDEX IF EXISTS ix_alerts_is_triggered')
+    conn.exec_driver_sql(
+        f'CREATE INDEX IF NOT EXISTS {ACTIVE_ALERT_INDEX} ON alerts '
+        f'(base_currency, quote_currency, condition_type, target_price) '
+        f'WHERE {ACTIVE_ALERT_INDEX_WHERE}'
+    )
+
+
+@migration(3, '提醒列表游标分页使用的 (created_at, id) 索引')
+def add_created_at_index(conn: Connection) -> None:
+    conn.exec_driver_sql(f'CREATE INDEX IF NOT EXISTS {CREATED_AT_INDEX} ON alerts (created_at, id)')
+
+
+@migration(4, '重建 alert_changes 表，序号使用 AUTOINCREMENT 避免清理后被重新分配')
+def rebuild_alert_changes(conn: Connection) -> None:
+    table_sql = conn.exec_driver_sql(
+        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = 'alert_changes'"
+    ).scalar()
+    if table_sql is None or 'AUTOINCREMENT' in table_sql.upper():
+        return
+    # CREATE TABLE 自动提交；INSERT 开启事务后，复制、替换表和重建索引在同一事务中完成，
+    # 中途失败时旧表保持不变，重新执行会先删除残留的新表
+    conn.exec_driver_sql('DROP TABLE IF EXISTS alert_changes_new')
+    conn.exec_driver_sql(
+        'CREATE TABLE alert_changes_new ('
+        'id INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT, '
+        'alert_id INTEGER NOT NULL, '
+        'action VARCHAR(20) NOT NULL, '
+        'created_at DATETIME NOT NULL)'
+    )
+    # 带序号插入会把 sqlite_sequence 推进到当前最大序号
+    conn.exec_driver_sql(
+        'INSERT INTO alert_changes_new (id, alert_id, action, created_at) '
+        'SELECT id, alert_id, action, created_at FROM alert_changes'
+    )
+    conn.exec_driver_sql('DROP TABLE alert_changes')
+    conn.exec_driver_sql('ALTER TABLE alert_changes_new RENAME TO alert_changes')
+    conn.exec_driver_sql(
+        'CREATE INDEX IF NOT EXISTS ix_alert_changes_created_at ON alert_changes (created_at)'
+    )
+
+
+def add_missing_columns(conn: Connection, metadata: MetaData) -> List[str]:
+    """
+    给已有的表补齐模型中声明、数据库中缺少的可空列
+
+    非空列需要默认值或数据回填，不能自动添加，只输出错误，应编写迁移。
+
+    Args:
+        conn: 数据库连接
+        metadata: 模型的元数据
+
+    Returns:
+        补齐的列，如 'alerts.rule'
+    """
+    inspector = inspect(conn)
+    existing_tables = set(inspector.get_table_names())
+
+    added = []
+    for table in metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        existing = {column['name'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            if column.primary_key or not column.nullable:
+                logger.error(f"{table.name}.{column.name} 是非空列，无法自动补齐，请编写迁移")
+                continue
+            column_type = column.type.compile(dialect=conn.dialect)
+            conn.exec_driver_sql(f'ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}')
+            added.append(f'{table.name}.{column.name}')
+
+    if added:
+        conn.commit()
+        logger.warning(f"已补齐缺少迁移的列: {', '.join(added)}")
+    return added
+
+
+def get_schema_version(conn: Connection) -> int:
+    """数据库当前的结构版本"""
+    return conn.exec_driver_sql('PRAGMA user_version').scalar() or 0
+
+
+def latest_version() -> int:
+    """代码中最新的结构版本"""
+    return MIGRATIONS[-1].version if MIGRATIONS else 0
+
+
+def upgrade_schema(engine: Engine, dry_run: bool = False,
+                   metadata: Optional[MetaData] = None) -> List[Migration]:
+    """
+    执行尚未执行的迁移并补齐缺少的可空列，非 SQLite 数据库不做处理
+
+    Args:
+        engine: 数据库引擎
+        dry_run: 只返回待执行的迁移，不修改数据库
+        metadata: 用于补齐列的模型元数据，默认为 db.metadata
+
+    Returns:
+        执行（或待执行）的迁移列表
+    """
+    if engine.dialect.name != 'sqlite':
+        logger.info(f"{engine.dialect.name} 数据库不使用内置迁移，跳过")
+        return []
+
+    if metadata is None:
+        from . import db
+        metadata = db.metadata
+
+    with engine.connect() as conn:
+        current = get_schema_version(conn)
+        pending = [item for item in MIGRATIONS if item.version > current]
+        if dry_run:
+            return pending
+
+        for item in pending:
+            logger.info(f"执行数据库迁移 {item.version}: {item.description}")
+            item.upgrade(conn)
+            conn.exec_driver_sql(f'PRAGMA user_version = {item.version}')
+            conn.commit()
+
+        add_missing_columns(conn, metadata)
+
+    if pending:
+        logger.info(f"数据库结构已从版本 {current} 升级到 {pending[-1].version}")
+    return pending
+
+
+def explain_query_plan(conn: Connection, statement) -> List[str]:
+    """
+    获取查询的 SQLite 执行计划
+
+    Args:
+        conn: 数据库连接
+        statement: SQLAlchemy 查询语句
+
+    Returns:
+        执行计划各步骤的说明，如 'SCAN alerts USING INDEX ix_alerts_active_pair_target'
+    """
+    compiled = statement.compile(dialect=conn.dialect)
+    parameters = compiled.construct_params()
+    # pysqlite 使用位置参数
+    values = tuple(parameters[name] for name in compiled.positiontup) if compiled.positional else parameters
+    rows = conn.exec_driver_sql(f'EXPLAIN QUERY PLAN {compiled.string}', values).fetchall()
+    return [row[-1] for row in rows]
+
+
+def check_query_plans(conn: Connection, checks: Dict[str, tuple]) -> Dict[str, Dict[str, object]]:
+    """
+    检查查询是否使用了预期的索引
+
+    Args:
+        conn: 数据库连接
+        checks: 名称 -> (查询语句, 预期出现在执行计划中的索引名)
+
+    Returns:
+        名称 -> {'plan': 执行计划, 'ok': 是否使用了预期索引}
+    """
+    results = {}
+    for name, (statement, index_name) in checks.items():
+        plan = explain_query_plan(conn, statement)
+        results[name] = {'plan': plan, 'ok': any(index_name in step for step in plan)}
+    return results
@@ -0,0 +1,46 @@
+# src/models/monitor_lease.py
+"""
+监控租约数据模型
+"""
+from datetime import datetime
+from typing import Dict, Any
+from . import db
+
+
+class MonitorLease(db.Model):
+    """监控服务的领导者租约，同一名称同时只有一个持有者"""
+    __tablename__ = 'monitor_leases'
+    
+    # 租约名称，如 'price-monitor'
+    name = db.Column(db.String(50), primary_key=True)
+    
+    # 当前持有者标识（主机名:进程ID）
+    holder = db.Column(db.String(200), nullable=False)
+    
+    # 任期，每次易主时递增
+    term = db.Column(db.Integer, nullable=False, default=1)
+    
+    # 时间戳
+    acquired_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    heartbeat_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False)
+    
+    @property
+    def is_expired(self) -> bool:
+        """租约是否已过期"""
+        return self.expires_at <= datetime.utcnow()
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为字典格式"""
+        return {
+            'name': self.name,
+            'holder': self.holder,
+            'term': self.term,
+            'acquired_at': self.acquired_at.isoformat() if self.acquired_at else None,
+            'heartbeat_at': self.heartbeat_at.isoformat() if self.heartbeat_at else None,
+            'expires_at': self.expires_at.isoformat() if self.expires_at else None,
+            'expired': self.is_expired
+        }
+    
+    def __repr__(self) -> str:
+        return f'<MonitorLease {self.name} holder={self.holder} term={self.term}>'
@@ -0,0 +1,87 @@
+# src/models/notification_outbox.py
+"""
+通知发件箱数据模型
+"""
+import json
+from datetime import datetime, timedelta
+from typing import Dict, Any
+from . import db
+
+
+class NotificationOutbox(db.Model):
+    """通知发件箱，与触发状态在同一事务中写入，发送成功后标记为已投递"""
+    __tablename__ = 'notification_outbox'
+    __table_args__ = (
+        db.Index('ix_notification_outbox_status_next', 'status', 'next_attempt_at'),
+    )
+    
+    STATUS_PENDING = 'pending'
+    STATUS_DELIVERED = 'delivered'
+    STATUS_FAILED = 'failed'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    
+    # 关联的提醒（提醒删除后仍保留通知记录）
+    alert_id = db.Column(db.Integer, nullable=False, index=True)
+    
+    # 幂等键：同一提醒的同一次触发只会产生一条通知
+    # （包含触发时间：SQLite 会复用已删除提醒的ID，而通知记录在提醒删除后仍保留）
+    idempotency_key = db.Column(db.String(64), nullable=False, unique=True)
+    
+    # 发送目标和内容
+    webhook_url = db.Column(db.Text, nullable=False)
+    payload = db.Column(db.Text, nullable=False)  # JSON: message, embed, summary
+    
+    # 投递状态
+    status = db.Column(db.String(20), nullable=False, default=STATUS_PENDING)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    last_error = db.Column(db.String(200), nullable=True)
+    
+    # 时间戳
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    next_attempt_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    delivered_at = db.Column(db.DateTime, nullable=True)
+    
+    @staticmethod
+    def make_key(alert_id: int, trigger_count: int, triggered_at: datetime) -> str:
+        """生成幂等键"""
+        return f"alert:{alert_id}:{trigger_count}:{triggered_at.strftime('%Y%m%d%H%M%S%f')}"
+    
+    @classmethod
+    def prune(cls, max_age_hours: int) -> int:
+        """
+        清理过期的已投递和已放弃的通知（待投递的通知不清理）
+        
+        Args:
+            max_age_hours: 保留时长（小时）
+            
+        Returns:
+            清理的记录数
+        """
+        cutoff = datetime.utcnow() - timedelta(hours=max_age_hours)
+        return cls.query.filter(
+            cls.status.in_([cls.STATUS_DELIVERED, cls.STATUS_FAILED]),
+            cls.created_at < cutoff
+        ).delete(synchronize_session=False)
+    
+    @property
+    def content(self) -> Dict[str, Any]:
+        """解析后的通知内容"""
+        return json.loads(self.payload)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为字典格式"""
+        return {
+            'id': self.id,
+            'alert_id': self.alert_id,
+            'idempotency_key': self.idempotency_key,
+            'status': self.status,
+            'attempts': self.attempts,
+            'last_error': self.last_error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'next_attempt_at': self.next_attempt_at.isoformat() if self.next_attempt_at else None,
+            'delivered_at': self.delivered_at.isoformat() if self.delivered_at else None
+        }
+    
+    def __repr__(self) -> str:
+        return f'<NotificationOutbox {self.idempotency_key} {self.status}>'
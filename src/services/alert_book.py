@@ -0,0 +1,405 @@
+# src/services/alert_book.py
+"""
+内存提醒簿
+"""
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+import numpy as np
+from sqlalchemy import select
+from ..models import db, Alert, AlertChange
+from ..config import get_config
+from .threshold_index import Pair, ThresholdIndex
+from .rule_engine import Feature, RuleIndex, RuleSyntaxError, compute_features
+from ..utils.metrics import CACHE_REQUESTS
+
+logger = logging.getLogger(__name__)
+
+
+class AlertRecord:
+    """紧凑的提醒记录，只保存评估所需的字段"""
+
+    __slots__ = ('id', 'base_currency', 'quote_currency', 'condition_type', 'target_price',
+                 'rule', 'armed_at')
+
+    def __init__(self, id: int, base_currency: str, quote_currency: str,
+                 condition_type: str, target_price: float, rule: Optional[str] = None,
+                 armed_at: Optional[float] = None):
+        self.id = id
+        self.base_currency = base_currency
+        self.quote_currency = quote_currency
+        self.condition_type = condition_type
+        self.target_price = float(target_price)
+        self.rule = rule
+        # 加入提醒簿的时间（Unix 时间戳），此前的价格区间不参与该提醒的穿越判断
+        self.armed_at = time.time() if armed_at is None else armed_at
+
+    def as_tuple(self) -> Tuple:
+        """转换为可以传给构造函数的元组（用于跨进程传递）"""
+        return (self.id, self.base_currency, self.quote_currency, self.condition_type,
+                self.target_price, self.rule, self.armed_at)
+
+    def __repr__(self) -> str:
+        return f'<AlertRecord {self.id} {self.base_currency}/{self.quote_currency} ' \
+               f'{self.condition_type} {self.target_price}>'
+
+
+class PairSnapshot:
+    """
+    一个货币对在一次检查中的价格快照，包含评估该货币对所有提醒需要的全部数据
+
+    Attributes:
+        price: 当前价格
+        low, high: 区间内的最低价和最高价（未启用穿越检测时等于当前价格）
+        since_ms: 区间起点（毫秒时间戳），没有区间时为None
+        times, closes: 规则提醒使用的收盘时间和收盘价序列，没有时为None
+        now: 检查时间（Unix 时间戳）
+        previous: 规则提醒上一次评估的特征值（由协调进程保存），过期或没有时为None
+        features: 评估后填入本次的特征值，由协调进程保存供下一次评估使用
+    """
+
+    __slots__ = ('base_currency', 'quote_currency', 'price', 'low', 'high', 'since_ms',
+                 'times', 'closes', 'now', 'previous', 'features')
+
+    def __init__(self, base_currency: str, quote_currency: str, price: float,
+                 low: Optional[float] = None, high: Optional[float] = None,
+                 since_ms: Optional[int] = None, times: Optional[np.ndarray] = None,
+                 closes: Optional[np.ndarray] = None, now: Optional[float] = None,
+                 previous: Optional[Dict[Feature, float]] = None):
+        self.base_currency = base_currency
+        self.quote_currency = quote_currency
+        self.price = price
+        self.low = price if low is None else low
+        self.high = price if high is None else high
+        self.since_ms = since_ms
+        self.times = times
+        self.closes = closes
+        self.now = time.time() if now is None else now
+        self.previous = previous
+        self.features: Optional[Dict[Feature, float]] = None
+
+    @property
+    def pair(self) -> Pair:
+        return (self.base_currency, self.quote_currency)
+
+    def __getstate__(self):
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def __setstate__(self, state):
+        for name, value in zip(self.__slots__, state):
+            setattr(self, name, value)
+
+
+class AlertBook:
+    """
+    进程内的活跃提醒簿
+
+    启动时从数据库加载一次所有活跃且未触发的提醒，之后只根据提醒变更日志
+    增量更新。没有变更时，同步只是一次按主键的日志探测，不读取任何提醒行。
+    """
+
+    # 加载紧凑记录时读取的列
+    COLUMNS = (Alert.id, Alert.base_currency, Alert.quote_currency,
+               Alert.condition_type, Alert.target_price, Alert.rule)
+
+    def __init__(self, index: Optional[ThresholdIndex] = None,
+                 rules: Optional[RuleIndex] = None):
+        self.config = get_config()
+        self.index = index if index is not None else ThresholdIndex()
+        self.rules = rules if rules is not None else RuleIndex()
+        self._records: Dict[int, AlertRecord] = {}
+        self._changed_pairs: Set[Pair] = set()
+        self._last_change_id = 0
+        self._loaded = False
+        self._listeners: List[Callable[[str, Any], None]] = []
+        self._lock = threading.RLock()
+        # 规则提醒上一次评估的特征值: 货币对 -> (评估时间, 特征值)，供穿越条件使用
+        self._rule_state: Dict[Pair, Tuple[float, Dict[Feature, float]]] = {}
+
+    @property
+    def loaded(self) -> bool:
+        """是否已完成初始加载"""
+        return self._loaded
+
+    @classmethod
+    def active_query(cls):
+        """
+        加载活跃提醒的查询（条件与部分索引 ix_alerts_active_pair_target 一致）
+
+        Returns:
+            查询语句
+        """
+        return select(*cls.COLUMNS).filter_by(is_active=True, is_triggered=False)
+
+    def load(self) -> int:
+        """
+        从数据库完整加载提醒簿
+
+        Returns:
+            加载的提醒数量
+        """
+        with self._lock:
+            # 先记录日志位置，之后发生的变更会在下一次同步时重放
+            last_change_id = AlertChange.latest_id()
+
+            rows = db.session.execute(self.active_query()).all()
+
+            self.replace(AlertRecord(*row) for row in rows)
+            self._last_change_id = last_change_id
+            self._loaded = True
+
+            self._prune_journal()
+
+            logger.info(f"提醒簿已加载，共 {len(self._records)} 个活跃提醒")
+            return len(self._records)
+
+    def sync(self) -> int:
+        """
+        根据变更日志增量同步提醒簿，未加载时执行完整加载
+
+        Returns:
+            应用的变更数量
+        """
+        with self._lock:
+            if not self._loaded:
+                CACHE_REQUESTS.inc(1, ('alert_book', 'miss'))
+                self.load()
+                return 0
+
+            changes = db.session.query(
+                AlertChange.id, AlertChange.alert_id, AlertChange.action
+            ).filter(
+                AlertChange.id > self._last_change_id
+            ).order_by(AlertChange.id).all()
+
+            # 没有变更即命中：本轮无需读取任何提醒行
+            CACHE_REQUESTS.inc(1, ('alert_book', 'miss' if changes else 'hit'))
+            if not changes:
+                return 0
+
+            # 按提醒取最后一次变更：删除和触发直接移除，其余重新读取紧凑记录
+            last_action = {alert_id: action for _, alert_id, action in changes}
+            stale_ids = []
+            for alert_id, action in last_action.items():
+                if action in ('delete', 'trigger'):
+                    self.remove(alert_id)
+                else:
+                    stale_ids.append(alert_id)
+            self.refresh(stale_ids)
+            self._last_change_id = changes[-1][0]
+
+            logger.debug(f"提醒簿已同步 {len(changes)} 条变更")
+            return len(changes)
+
+    def refresh(self, alert_ids: Iterable[int]) -> None:
+        """
+        从数据库重新读取指定提醒的紧凑记录
+
+        Args:
+            alert_ids: 提醒ID集合
+        """
+        alert_ids = list(alert_ids)
+        if not alert_ids:
+            return
+
+        rows = db.session.query(*self.COLUMNS).filter(
+            Alert.id.in_(alert_ids),
+            Alert.is_active.is_(True),
+            Alert.is_triggered.is_(False)
+        ).all()
+
+        with self._lock:
+            for alert_id in alert_ids:
+                self.remove(alert_id)
+            for row in rows:
+                self.add(AlertRecord(*row))
+
+    def replace(self, records: Iterable[AlertRecord]) -> None:
+        """用一组记录替换提醒簿的全部内容（不访问数据库）"""
+        records = list(records)
+        with self._lock:
+            self._records = {}
+            self.index.rebuild(
+                (record.id, record.base_currency, record.quote_currency,
+                 record.condition_type, record.target_price)
+                for record in records if record.condition_type != 'rule'
+            )
+            self.rules.clear()
+            for record in records:
+                if record.condition_type == 'rule' and not self._add_rule(record):
+                    continue
+                self._records[record.id] = record
+            self._changed_pairs = set(self.pairs())
+            self._notify('load', list(self._records.values()))
+
+    def add(self, record: AlertRecord) -> None:
+        """添加或更新一条记录"""
+        with self._lock:
+            if record.condition_type == 'rule':
+                if not self._add_rule(record):
+                    return
+            else:
+                self.index.add(record.id, record.base_currency, record.quote_currency,
+                               record.condition_type, record.target_price)
+            self._records[record.id] = record
+            self._changed_pairs.add(self.index.make_pair(record.base_currency, record.quote_currency))
+            self._notify('add', record)
+
+    def remove(self, alert_id: int) -> Optional[AlertRecord]:
+        """移除一条记录"""
+        with self._lock:
+            self.index.remove(alert_id)
+            self.rules.remove(alert_id)
+            record = self._records.pop(alert_id, None)
+            if record is not None:
+                self._changed_pairs.add(self.index.make_pair(record.base_currency, record.quote_currency))
+                self._notify('remove', record)
+            return record
+
+    def visit(self, visitor: Callable[[List[AlertRecord]], Any]) -> Any:
+        """在持有提醒簿锁的情况下以全部记录调用 visitor，期间提醒簿不会变化"""
+        with self._lock:
+            return visitor(list(self._records.values()))
+
+    def subscribe(self, listener: Callable[[str, Any], None]) -> None:
+        """
+        订阅提醒簿变化
+
+        监听器以 (动作, 数据) 调用：'load' 时为全部记录，'add' 和 'remove' 时为单条记录。
+        订阅时提醒簿已加载则立即收到一次 'load'。
+        """
+        with self._lock:
+            self._listeners.append(listener)
+            if self._loaded:
+                listener('load', list(self._records.values()))
+
+    def unsubscribe(self, listener: Callable[[str, Any], None]) -> None:
+        """取消订阅提醒簿变化"""
+        with self._lock:
+            if listener in self._listeners:
+                self._listeners.remove(listener)
+
+    def _notify(self, action: str, payload: Any) -> None:
+        for listener in self._listeners:
+            try:
+                listener(action, payload)
+            except Exception as e:
+                logger.error(f"提醒簿监听器处理 {action} 时发生错误: {e}")
+
+    def evaluate(self, snapshot: PairSnapshot) -> List[int]:
+        """
+        根据价格快照评估一个货币对的所有提醒（纯内存计算）
+
+        阈值提醒按当前价格或区间判断是否穿越目标，区间起点之后才加入提醒簿的
+        提醒只按当前价格判断，避免被创建前的价格触发；规则提醒一次向量化求值。
+
+        Args:
+            snapshot: 价格快照
+
+        Returns:
+            触发的提醒ID列表
+        """
+        base_currency, quote_currency = snapshot.base_currency, snapshot.quote_currency
+        price, low, high, since_ms = snapshot.price, snapshot.low, snapshot.high, snapshot.since_ms
+
+        fired_ids = self.index.triggered(base_currency, quote_currency, price)
+        if since_ms is not None and not low == high == price:
+            spot = set(fired_ids)
+            fired_ids = []
+            for alert_id in self.index.crossed(base_currency, quote_currency, low, high):
+                record = self._records.get(alert_id)
+                if alert_id in spot or (record and record.armed_at * 1000 <= since_ms):
+                    fired_ids.append(alert_id)
+
+        rule_set = self.rules.get(base_currency, quote_currency)
+        if rule_set:
+            empty = np.empty(0)
+            times = empty if snapshot.times is None else snapshot.times
+            closes = empty if snapshot.closes is None else snapshot.closes
+            features = compute_features(rule_set.features, times, closes, price, snapshot.now)
+            snapshot.features = features
+            fired_ids = fired_ids + rule_set.evaluate(features, snapshot.previous)
+
+        return fired_ids
+    
+    def previous_features(self, pair: Pair, now: float, max_age: float) -> Optional[Dict[Feature, float]]:
+        """
+        获取货币对上一次评估的规则特征值
+        
+        Args:
+            pair: 货币对
+            now: 本次评估时间（Unix 时间戳）
+            max_age: 上一次评估距今超过该秒数时视为没有（穿越条件未知，而不是与很久以前比较）
+            
+        Returns:
+            特征值，没有或已过期时为None
+        """
+        state = self._rule_state.get(pair)
+        if state is None or now - state[0] > max_age:
+            return None
+        return state[1]
+    
+    def remember_features(self, snapshots: Iterable[PairSnapshot]) -> None:
+        """保存本轮评估的规则特征值（本地或分片评估后调用）"""
+        with self._lock:
+            for snapshot in snapshots:
+                if snapshot.features is not None:
+                    self._rule_state[snapshot.pair] = (snapshot.now, snapshot.features)
+            for pair in [pair for pair in self._rule_state if self.rules.get(*pair) is None]:
+                del self._rule_state[pair]
+    
+    def _add_rule(self, record: AlertRecord) -> bool:
+        """编译并加入规则提醒，规则无效时记录警告并跳过"""
+        try:
+            self.rules.add(record.id, record.base_currency, record.quote_currency, record.rule)
+            return True
+        except RuleSyntaxError as e:
+            logger.warning(f"提醒 {record.id} 的规则无效，已跳过: {e}")
+            return False
+    
+    def pairs(self) -> List[Pair]:
+        """获取所有有提醒的货币对（阈值提醒和规则提醒）"""
+        return list(set(self.index.pairs()) | set(self.rules.pairs()))
+    
+    def count(self, base_currency: str, quote_currency: str) -> int:
+        """获取某个货币对下的提醒数量"""
+        return self.index.count(base_currency, quote_currency) + \
+            self.rules.count(base_currency, quote_currency)
+    
+    def pop_changed_pairs(self) -> Set[Pair]:
+        """取出上次调用以来提醒发生变化的货币对"""
+        with self._lock:
+            changed, self._changed_pairs = self._changed_pairs, set()
+            return changed
+
+    def get(self, alert_id: int) -> Optional[AlertRecord]:
+        """获取一条记录"""
+        return self._records.get(alert_id)
+
+    def records(self) -> List[AlertRecord]:
+        """获取所有记录"""
+        with self._lock:
+            return list(self._records.values())
+
+    def _prune_journal(self) -> None:
+        """清理已经应用且过期的变更日志"""
+        try:
+            removed = AlertChange.prune(self.config.ALERT_JOURNAL_RETENTION_HOURS,
+                                        before_id=self._last_change_id)
+            db.session.commit()
+            if removed:
+                logger.debug(f"已清理 {removed} 条过期的提醒变更日志")
+        except Exception as e:
+            logger.warning(f"清理提醒变更日志时发生错误: {e}")
+            db.session.rollback()
+
+    def __contains__(self, alert_id: int) -> bool:
+        return alert_id in self._records
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+
+# 进程内共享的提醒簿实例
+alert_book = AlertBook()
@@ -3,10 +3,26 @@
 提醒服务
 """
 import logging
-from typing import List, Optional, Dict, Any
-from ..models import db, Alert
+import time
+from datetime import datetime
+from typing import Callable, Iterable, Iterator, List, Optional, Dict, Any, Sequence, Tuple
+from sqlalchemy import delete, func, insert, select, tuple_, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from ..models import db, read_db, Alert, AlertChange, NotificationOutbox
 from .notification_service import NotificationService
 from .price_service import PriceService
+from .alert_book import AlertBook, PairSnapshot, alert_book
+from .alert_statistics import ACTIVE, AlertStatistics, alert_statistics
+from .alert_validation import AlertValidator
+from .notification_dispatcher import NotificationDispatcher
+from .outbox_service import OutboxService
+from .check_scheduler import CheckScheduler
+from .rule_engine import RuleSyntaxError, choose_interval, compile_rule
+from .tick_trace import TickRecorder, TickTrace
+from ..config import get_config
+from ..utils.pagination import encode_cursor
+from ..utils.metrics import (MONITOR_ALERTS_CHECKED, MONITOR_ALERTS_TRIGGERED, MONITOR_ERRORS,
+                             MONITOR_TICK_SECONDS)
 
 logger = logging.getLogger(__name__)
 
@@ -14,25 +30,71 @@ logger = logging.getLogger(__name__)
 class AlertService:
     """提醒服务类"""
     
-    def __init__(self):
-        self.notification_service = NotificationService()
-        self.price_service = PriceService()
+    # 批量 IN (...) 语句中每批的ID数量，低于 SQLite 的参数上限
+    BULK_CHUNK_SIZE = 500
+    
+    # 列表接口可以选择的字段，未指定时不返回 Webhook URL
+    LIST_FIELDS = ('id', 'base_currency', 'quote_currency', 'condition_type', 'target_price', 'rule',
+                   'discord_webhook_url', 'is_active', 'is_triggered', 'created_at', 'triggered_at',
+                   'updated_at', 'user_identifier', 'note', 'trigger_count')
+    DEFAULT_LIST_FIELDS = tuple(name for name in LIST_FIELDS if name != 'discord_webhook_url')
+    LIST_STATES = ('all', 'active', 'triggered', 'inactive')
+    
+    # 批量更新可以修改的字段
+    BULK_UPDATE_FIELDS = ('base_currency', 'quote_currency', 'condition_type', 'target_price', 'rule',
+                          'discord_webhook_url', 'user_identifier', 'note', 'is_active')
+    
+    def __init__(self, book: Optional[AlertBook] = None,
+                 dispatcher: Optional[NotificationDispatcher] = None,
+                 scheduler: Optional[CheckScheduler] = None,
+                 price_service: Optional[PriceService] = None,
+                 notification_service: Optional[NotificationService] = None,
+                 statistics: Optional[AlertStatistics] = None):
+        self.config = get_config()
+        self.notification_service = notification_service or NotificationService()
+        self.price_service = price_service or PriceService()
+        self.alert_book = book if book is not None else alert_book
+        self.statistics = statistics if statistics is not None else alert_statistics
+        self.validator = AlertValidator(self.price_service, self.notification_service, self.alert_book)
+        self.dispatcher = dispatcher
+        self.outbox = OutboxService(dispatcher, self.notification_service)
+        
+        if scheduler is None and self.config.ADAPTIVE_SCHEDULING:
+            scheduler = CheckScheduler(self.config.CHECK_INTERVAL_FLOOR,
+                                       self.config.CHECK_INTERVAL_CEILING,
+                                       self.config.CHECK_SCHEDULE_SIGMAS,
+                                       interval=self.config.PRICE_CHECK_INTERVAL,
+                                       near_target=self.config.CHECK_NEAR_TARGET)
+        self.scheduler = scheduler
+        
+        # 每个货币对上一次完成评估的时间（Unix 时间戳），用于确定K线区间的起点
+        self._last_evaluated: Dict[Tuple[str, str], float] = {}
+        
+        # 分片评估进程池，由监控服务在成为领导者时挂载
+        self.shards = None
+        
+        # 最近若干轮检查的分阶段耗时记录
+        self.ticks = TickRecorder(self.config.MONITOR_TICK_HISTORY)
+        
+        # 写入触发状态和投递通知前的检查，返回False表示本进程已不再持有监控租约，由监控服务设置
+        self.fence: Optional[Callable[[], bool]] = None
     
     def create_alert(self, base_currency: str, quote_currency: str,
                     condition_type: str, target_price: float,
                     discord_webhook_url: str, user_identifier: Optional[str] = None,
-                    note: Optional[str] = None) -> Optional[Alert]:
+                    note: Optional[str] = None, rule: Optional[str] = None) -> Optional[Alert]:
         """
         创建新的价格提醒
         
         Args:
             base_currency: 基础货币
             quote_currency: 计价货币
-            condition_type: 条件类型 ('above' 或 'below')
-            target_price: 目标价格
+            condition_type: 条件类型 ('above'、'below' 或 'rule')
+            target_price: 目标价格（规则提醒忽略）
             discord_webhook_url: Discord Webhook URL
             user_identifier: 用户标识符
             note: 备注
+            rule: 规则表达式（仅 'rule' 类型）
             
         Returns:
             创建的提醒对象，失败时返回None
@@ -41,15 +103,22 @@ class AlertService:
             # 验证输入
             if not self._validate_alert_input(base_currency, quote_currency, 
                                             condition_type, target_price, 
-                                            discord_webhook_url):
+                                            discord_webhook_url, rule):
                 return None
             
+            if condition_type == 'rule':
+                target_price = 0.0
+                rule = rule.strip()
+            else:
+                rule = None
+            
             # 创建提醒对象
             alert = Alert(
                 base_currency=base_currency.lower(),
                 quote_currency=quote_currency.lower(),
                 condition_type=condition_type,
                 target_price=target_price,
+                rule=rule,
                 discord_webhook_url=discord_webhook_url,
                 user_identifier=user_identifier,
                 note=note
@@ -57,7 +126,10 @@ class AlertService:
             
             # 保存到数据库
             db.session.add(alert)
+            db.session.flush()
+            AlertChange.record(alert.id, 'create')
             db.session.commit()
+            self.statistics.apply(None, (alert.is_active, alert.is_triggered))
             
             logger.info(f"创建价格提醒成功: {alert}")
             return alert
@@ -80,7 +152,8 @@ class AlertService:
             提醒列表
         """
         try:
-            query = Alert.query
+            # 只读查询走单独的连接池，不等待监控的写事务
+            query = select(Alert)
             
             if user_identifier:
                 query = query.filter_by(user_identifier=user_identifier)
@@ -88,7 +161,7 @@ class AlertService:
             if active_only:
                 query = query.filter_by(is_active=True, is_triggered=False)
             
-            alerts = query.order_by(Alert.created_at.desc()).all()
+            alerts = read_db.session.scalars(query.order_by(Alert.created_at.desc())).all()
             
             logger.debug(f"获取到 {len(alerts)} 个提醒")
             return alerts
@@ -97,6 +170,91 @@ class AlertService:
             logger.error(f"获取提醒列表时发生错误: {e}")
             return []
     
+    def list_alerts(self, fields: Sequence[str], limit: int,
+                    after: Optional[Tuple[datetime, int]] = None,
+                    base_currency: Optional[str] = None, quote_currency: Optional[str] = None,
+                    state: str = 'all', user_identifier: Optional[str] = None
+                    ) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        按创建时间倒序分页获取提醒，只查询请求的列
+        
+        Args:
+            fields: 返回的字段（LIST_FIELDS 的子集）
+            limit: 每页数量
+            after: 上一页最后一行的 (created_at, id)，为None时从第一页开始
+            base_currency: 只返回该基础货币的提醒
+            quote_currency: 只返回该计价货币的提醒
+            state: 'all'、'active'、'triggered' 或 'inactive'
+            user_identifier: 只返回该用户的提醒
+            
+        Returns:
+            (提醒字典列表, 下一页游标)，没有下一页时游标为None
+        """
+        query = self._list_query(fields, base_currency, quote_currency, state, user_identifier)
+        if after is not None:
+            query = query.where(tuple_(Alert.created_at, Alert.id) < after)
+        
+        # 多取一行判断是否还有下一页
+        rows = read_db.session.execute(query.limit(limit + 1)).all()
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id)
+        
+        return [self._list_row(row, fields) for row in rows], next_cursor
+    
+    def iter_alerts(self, fields: Sequence[str], batch_size: int = 1000,
+                    **filters) -> Iterator[Dict[str, Any]]:
+        """
+        逐批读取全部符合条件的提醒（用于导出），参数同 list_alerts
+        
+        Yields:
+            提醒字典
+        """
+        after = None
+        while True:
+            query = self._list_query(fields, **filters)
+            if after is not None:
+                query = query.where(tuple_(Alert.created_at, Alert.id) < after)
+            rows = read_db.session.execute(query.limit(batch_size)).all()
+            for row in rows:
+                yield self._list_row(row, fields)
+            if len(rows) < batch_size:
+                return
+            after = (rows[-1].created_at, rows[-1].id)
+    
+    def _list_query(self, fields: Sequence[str], base_currency: Optional[str] = None,
+                    quote_currency: Optional[str] = None, state: str = 'all',
+                    user_identifier: Optional[str] = None):
+        # 游标需要 created_at 和 id，即使没有请求这两个字段
+        names = dict.fromkeys(['id', 'created_at', *fields])
+        query = select(*(getattr(Alert, name) for name in names))
+        
+        if base_currency:
+            query = query.where(Alert.base_currency == base_currency.lower())
+        if quote_currency:
+            query = query.where(Alert.quote_currency == quote_currency.lower())
+        if user_identifier:
+            query = query.where(Alert.user_identifier == user_identifier)
+        
+        if state == 'active':
+            query = query.filter_by(is_active=True, is_triggered=False)
+        elif state == 'triggered':
+            query = query.filter_by(is_triggered=True)
+        elif state == 'inactive':
+            query = query.filter_by(is_active=False)
+        
+        return query.order_by(Alert.created_at.desc(), Alert.id.desc())
+    
+    @staticmethod
+    def _list_row(row, fields: Sequence[str]) -> Dict[str, Any]:
+        mapping = row._mapping
+        result = {'id': mapping['id']}
+        for name in fields:
+            value = mapping[name]
+            result[name] = value.isoformat() if isinstance(value, datetime) else value
+        return result
+    
     def get_alert_by_id(self, alert_id: int) -> Optional[Alert]:
         """
         根据ID获取提醒
@@ -129,8 +287,11 @@ class AlertService:
                 logger.warning(f"提醒 {alert_id} 不存在")
                 return False
             
+            state = (alert.is_active, alert.is_triggered)
             db.session.delete(alert)
+            AlertChange.record(alert_id, 'delete')
             db.session.commit()
+            self.statistics.apply(state, None)
             
             logger.info(f"删除提醒成功: {alert}")
             return True
@@ -156,6 +317,7 @@ class AlertService:
                 logger.warning(f"提醒 {alert_id} 不存在")
                 return None
             
+            before = (alert.is_active, alert.is_triggered)
             if alert.is_active:
                 alert.deactivate()
             else:
@@ -164,7 +326,9 @@ class AlertService:
                 if alert.is_triggered:
                     alert.reset()
             
+            AlertChange.record(alert.id, 'update')
             db.session.commit()
+            self.statistics.apply(before, (alert.is_active, alert.is_triggered))
             
             logger.info(f"切换提醒状态成功: {alert}")
             return alert
@@ -174,6 +338,243 @@ class AlertService:
             db.session.rollback()
             return None
     
+    def create_alerts_bulk(self, items: List[Any]) -> List[Dict[str, Any]]:
+        """
+        批量创建提醒
+        
+        先在本地检查每个提醒的字段，再对不同的货币对和 Webhook 各验证一次，
+        通过验证的提醒在同一个事务中批量插入（连同变更日志）。
+        
+        Args:
+            items: 请求中的提醒对象列表
+            
+        Returns:
+            与 items 一一对应的结果，成功时包含 id，失败时包含 error
+        """
+        results: List[Optional[Dict[str, Any]]] = [None] * len(items)
+        rows: Dict[int, Dict[str, Any]] = {}
+        for index, item in enumerate(items):
+            try:
+                rows[index] = self.validator.normalize(item)
+            except ValueError as e:
+                results[index] = _bulk_failure(index, str(e))
+        
+        rows = self._verify_bulk_rows(rows, results)
+        if not rows:
+            return results
+        
+        now = datetime.utcnow()
+        values = [dict(row, is_active=True, is_triggered=False, trigger_count=0,
+                       created_at=now, updated_at=now) for row in rows.values()]
+        
+        try:
+            if db.engine.dialect.insert_executemany_returning_sort_by_parameter_order:
+                ids = db.session.scalars(
+                    insert(Alert).returning(Alert.id, sort_by_parameter_order=True), values
+                ).all()
+            else:
+                alerts = [Alert(**value) for value in values]
+                db.session.add_all(alerts)
+                db.session.flush()
+                ids = [alert.id for alert in alerts]
+            
+            db.session.execute(
+                insert(AlertChange),
+                [{'alert_id': alert_id, 'action': 'create', 'created_at': now} for alert_id in ids]
+            )
+            db.session.commit()
+            
+        except Exception as e:
+            logger.error(f"批量创建提醒时发生错误: {e}")
+            db.session.rollback()
+            for index in rows:
+                results[index] = _bulk_failure(index, '写入数据库失败')
+            return results
+        
+        self.statistics.apply(None, ACTIVE, len(ids))
+        for index, alert_id in zip(rows, ids):
+            results[index] = {'index': index, 'success': True, 'id': alert_id}
+        
+        logger.info(f"批量创建提醒: {len(ids)}/{len(items)} 个成功")
+        return results
+    
+    def update_alerts_bulk(self, items: List[Any]) -> List[Dict[str, Any]]:
+        """
+        批量更新提醒，每个对象包含 id 和要修改的字段（BULK_UPDATE_FIELDS）
+        
+        修改后的提醒按创建时的规则验证，只有改变了的货币对和 Webhook 才会重新验证。
+        所有修改在同一个事务中提交。
+        
+        Args:
+            items: 请求中的更新对象列表
+            
+        Returns:
+            与 items 一一对应的结果，成功时包含 id，失败时包含 error
+        """
+        results: List[Optional[Dict[str, Any]]] = [None] * len(items)
+        requested: Dict[int, int] = {}
+        for index, item in enumerate(items):
+            alert_id = item.get('id') if isinstance(item, dict) else None
+            unknown = set(item) - set(self.BULK_UPDATE_FIELDS) - {'id'} if isinstance(item, dict) else set()
+            if not isinstance(alert_id, int) or isinstance(alert_id, bool):
+                results[index] = _bulk_failure(index, '缺少有效的提醒ID')
+            elif unknown:
+                results[index] = _bulk_failure(index, f"不支持修改的字段: {', '.join(sorted(unknown))}")
+            elif alert_id in requested.values():
+                results[index] = _bulk_failure(index, f'重复的提醒ID: {alert_id}')
+            else:
+                requested[index] = alert_id
+        
+        try:
+            existing = self._load_alerts(requested.values())
+            
+            rows: Dict[int, Dict[str, Any]] = {}
+            for index, alert_id in requested.items():
+                alert = existing.get(alert_id)
+                if alert is None:
+                    results[index] = _bulk_failure(index, f'提醒 {alert_id} 不存在')
+                    continue
+                merged = {field: getattr(alert, field) for field in self.BULK_UPDATE_FIELDS}
+                merged.update(items[index])
+                try:
+                    rows[index] = self.validator.normalize(merged)
+                except ValueError as e:
+                    results[index] = _bulk_failure(index, str(e))
+            
+            # 只重新验证改变了的货币对和 Webhook
+            unchanged = {index for index, row in rows.items()
+                         if (row['base_currency'], row['quote_currency'], row['discord_webhook_url']) ==
+                         (existing[requested[index]].base_currency, existing[requested[index]].quote_currency,
+                          existing[requested[index]].discord_webhook_url)}
+            verified = self._verify_bulk_rows({index: row for index, row in rows.items() if index not in unchanged},
+                                              results)
+            rows = {index: row for index, row in rows.items() if index in unchanged or index in verified}
+            
+            now = datetime.utcnow()
+            transitions = []
+            for index, row in rows.items():
+                alert = existing[requested[index]]
+                before = (alert.is_active, alert.is_triggered)
+                for field, value in row.items():
+                    setattr(alert, field, value)
+                if 'is_active' in items[index]:
+                    if items[index]['is_active']:
+                        alert.activate()
+                        # 与切换状态一致，重新激活时重置触发状态
+                        if alert.is_triggered:
+                            alert.reset()
+                    else:
+                        alert.deactivate()
+                alert.updated_at = now
+                transitions.append((before, (alert.is_active, alert.is_triggered)))
+            
+            if rows:
+                db.session.execute(
+                    insert(AlertChange),
+                    [{'alert_id': requested[index], 'action': 'update', 'created_at': now} for index in rows]
+                )
+            db.session.commit()
+            
+        except Exception as e:
+            logger.error(f"批量更新提醒时发生错误: {e}")
+            db.session.rollback()
+            for index in requested:
+                if results[index] is None:
+                    results[index] = _bulk_failure(index, '写入数据库失败')
+            return results
+        
+        for before, after in transitions:
+            self.statistics.apply(before, after)
+        for index in rows:
+            results[index] = {'index': index, 'success': True, 'id': requested[index]}
+        
+        logger.info(f"批量更新提醒: {len(rows)}/{len(items)} 个成功")
+        return results
+    
+    def delete_alerts_bulk(self, alert_ids: List[Any]) -> List[Dict[str, Any]]:
+        """
+        批量删除提醒，在同一个事务中删除并记录变更日志
+        
+        Args:
+            alert_ids: 提醒ID列表
+            
+        Returns:
+            与 alert_ids 一一对应的结果，失败时包含 error
+        """
+        results: List[Optional[Dict[str, Any]]] = [None] * len(alert_ids)
+        requested: Dict[int, int] = {}
+        for index, alert_id in enumerate(alert_ids):
+            if not isinstance(alert_id, int) or isinstance(alert_id, bool):
+                results[index] = _bulk_failure(index, f'无效的提醒ID: {alert_id}')
+            elif alert_id in requested.values():
+                results[index] = _bulk_failure(index, f'重复的提醒ID: {alert_id}')
+            else:
+                requested[index] = alert_id
+        
+        try:
+            states = {}
+            ids = list(requested.values())
+            for start in range(0, len(ids), self.BULK_CHUNK_SIZE):
+                chunk = ids[start:start + self.BULK_CHUNK_SIZE]
+                rows = db.session.execute(
+                    select(Alert.id, Alert.is_active, Alert.is_triggered).where(Alert.id.in_(chunk))
+                ).all()
+                states.update((row.id, (row.is_active, row.is_triggered)) for row in rows)
+                db.session.execute(delete(Alert).where(Alert.id.in_(chunk)),
+                                   execution_options={'synchronize_session': False})
+            
+            now = datetime.utcnow()
+            if states:
+                db.session.execute(
+                    insert(AlertChange),
+                    [{'alert_id': alert_id, 'action': 'delete', 'created_at': now} for alert_id in states]
+                )
+            db.session.commit()
+            
+        except Exception as e:
+            logger.error(f"批量删除提醒时发生错误: {e}")
+            db.session.rollback()
+            for index in requested:
+                results[index] = _bulk_failure(index, '写入数据库失败')
+            return results
+        
+        for state in states.values():
+            self.statistics.apply(state, None)
+        for index, alert_id in requested.items():
+            if alert_id in states:
+                results[index] = {'index': index, 'success': True, 'id': alert_id}
+            else:
+                results[index] = _bulk_failure(index, f'提醒 {alert_id} 不存在')
+        
+        logger.info(f"批量删除提醒: {len(states)}/{len(alert_ids)} 个成功")
+        return results
+    
+    def _verify_bulk_rows(self, rows: Dict[int, Dict[str, Any]],
+                          results: List[Optional[Dict[str, Any]]]) -> Dict[int, Dict[str, Any]]:
+        # 每个不同的货币对和 Webhook 只验证一次，未通过的提醒写入失败结果
+        pairs = self.validator.validate_pairs((row['base_currency'], row['quote_currency'])
+                                              for row in rows.values())
+        webhooks = self.validator.validate_webhooks(row['discord_webhook_url'] for row in rows.values()
+                                                    if pairs[(row['base_currency'], row['quote_currency'])])
+        
+        verified = {}
+        for index, row in rows.items():
+            if not pairs[(row['base_currency'], row['quote_currency'])]:
+                results[index] = _bulk_failure(index, f"无效的货币对: {row['base_currency']}/{row['quote_currency']}")
+            elif not webhooks[row['discord_webhook_url']]:
+                results[index] = _bulk_failure(index, 'Discord Webhook 验证失败')
+            else:
+                verified[index] = row
+        return verified
+    
+    def _load_alerts(self, alert_ids: Iterable[int]) -> Dict[int, Alert]:
+        ids = list(alert_ids)
+        alerts = {}
+        for start in range(0, len(ids), self.BULK_CHUNK_SIZE):
+            chunk = ids[start:start + self.BULK_CHUNK_SIZE]
+            alerts.update((alert.id, alert) for alert in Alert.query.filter(Alert.id.in_(chunk)))
+        return alerts
+    
     def check_alert_condition(self, alert: Alert, current_price: float) -> bool:
         """
         检查提醒条件是否满足
@@ -204,78 +605,262 @@ class AlertService:
         Returns:
             是否触发成功
         """
-        try:
-            # 发送通知
-            success = self.notification_service.send_price_alert(
-                webhook_url=alert.discord_webhook_url,
-                base_currency=alert.base_currency,
-                quote_currency=alert.quote_currency,
-                condition_type=alert.condition_type,
-                target_price=alert.target_price,
-                current_price=current_price,
-                note=alert.note
-            )
+        results, outbox_rows = self.persist_triggered([(alert, current_price)])
+        if not results.get(alert.id, False):
+            return False
+        
+        self.outbox.deliver(outbox_rows)
+        return True
+    
+    def persist_triggered(self, fired: List[Tuple[Alert, float]]) -> Tuple[Dict[int, bool], List[NotificationOutbox]]:
+        """
+        在单个事务中批量写入触发状态和待发送的通知
+        
+        所有提醒通过 UPDATE ... WHERE id IN (...) 一次性更新 is_triggered、
+        triggered_at 和 trigger_count，并在同一事务中批量写入变更日志和通知
+        发件箱。只有仍处于活跃且未触发状态的提醒会被更新，通知的幂等键由
+        提醒ID、触发次数和触发时间组成，同一次触发只会产生一条通知；
+        幂等键冲突的通知会被跳过，不会回滚整批触发。
+        
+        Args:
+            fired: (提醒对象, 当前价格) 列表
             
-            if success:
-                # 标记为已触发
-                alert.mark_as_triggered()
-                db.session.commit()
+        Returns:
+            (每个提醒是否更新成功, 已提交的发件箱记录)
+        """
+        alerts = {alert.id: (alert, current_price) for alert, current_price in fired}
+        results = {alert_id: False for alert_id in alerts}
+        if not alerts:
+            return results, []
+        
+        now = datetime.utcnow()
+        ids = list(results)
+        
+        try:
+            updated = []
+            for start in range(0, len(ids), self.BULK_CHUNK_SIZE):
+                chunk = ids[start:start + self.BULK_CHUNK_SIZE]
+                conditions = (
+                    Alert.id.in_(chunk),
+                    Alert.is_active.is_(True),
+                    Alert.is_triggered.is_(False)
+                )
+                stmt = update(Alert).where(*conditions).values(
+                    is_triggered=True,
+                    triggered_at=now,
+                    trigger_count=func.coalesce(Alert.trigger_count, 0) + 1,
+                    updated_at=now
+                )
                 
-                logger.info(f"提醒触发成功: {alert}")
-                return True
-            else:
-                logger.error(f"发送通知失败: {alert}")
-                return False
+                if db.engine.dialect.update_returning:
+                    rows = db.session.execute(
+                        stmt.returning(Alert.id),
+                        execution_options={'synchronize_session': False}
+                    )
+                    updated.extend(row[0] for row in rows)
+                else:
+                    matched = db.session.query(Alert.id).filter(*conditions).all()
+                    db.session.execute(stmt, execution_options={'synchronize_session': False})
+                    updated.extend(row[0] for row in matched)
+            
+            keys = []
+            if updated:
+                db.session.execute(
+                    insert(AlertChange),
+                    [{'alert_id': alert_id, 'action': 'trigger', 'created_at': now}
+                     for alert_id in updated]
+                )
                 
+                outbox_rows = [self._build_outbox_row(*alerts[alert_id], now) for alert_id in updated]
+                keys = [row['idempotency_key'] for row in outbox_rows]
+                db.session.execute(self._outbox_insert(), outbox_rows)
+            
+            db.session.commit()
+            self.statistics.apply(ACTIVE, (True, True), len(updated))
+            
+            for alert_id in updated:
+                results[alert_id] = True
+            
+            logger.info(f"批量写入触发状态: {len(updated)}/{len(ids)} 个提醒")
+            
         except Exception as e:
-            logger.error(f"触发提醒时发生错误: {e}")
+            logger.error(f"批量写入触发状态时发生错误: {e}")
             db.session.rollback()
-            return False
+            return results, []
+        
+        # 事务已提交，读取发件箱记录交给分发器；读取失败时由重放补发
+        try:
+            outbox_rows = self._load_outbox(keys, now)
+            if len(outbox_rows) < len(keys):
+                logger.warning(f"{len(keys) - len(outbox_rows)} 条通知的幂等键已存在，已跳过")
+            return results, outbox_rows
+        except Exception as e:
+            logger.error(f"读取通知发件箱时发生错误: {e}")
+            self.outbox.schedule_replay()
+            return results, []
     
-    def check_all_alerts(self) -> Dict[str, int]:
+    def check_all_alerts(self, force: bool = False) -> Dict[str, int]:
         """
         检查所有活跃的提醒
         
+        评估基于内存提醒簿：每个货币对只获取一次价格，并通过阈值索引的
+        二分查找定位触发的提醒，只有触发的提醒才会从数据库加载完整记录。
+        
+        启用穿越检测时，用上一次评估以来的1分钟K线高低点判断是否穿越目标，
+        两次检查之间的瞬时波动也能触发提醒（计入 crossed）。
+        
+        启用自适应调度时，只检查到期的货币对，其余货币对的提醒计入 deferred；
+        检查后根据价格到最近目标的距离和波动率安排该货币对的下一次检查。
+        
+        价格和K线在本进程获取并生成快照，评估可以按货币对分发到分片进程并行执行。
+        
+        触发状态和通知在一个事务中写入发件箱，提交后才交给分发器发送，
+        发送结果在之后通过发件箱服务批量写入。
+        
+        Args:
+            force: 忽略调度，检查所有货币对
+            
         Returns:
             检查结果统计
         """
+        with self.ticks.record(forced=force) as trace:
+            stats = self._run_check(force, trace)
+            trace.finish(stats)
+            return stats
+    
+    def _run_check(self, force: bool, trace: TickTrace) -> Dict[str, int]:
+        """执行一轮检查，各阶段耗时记入 trace"""
+        started = time.perf_counter()
         stats = {
             'checked': 0,
+            'deferred': 0,
             'triggered': 0,
+            'crossed': 0,
+            'queued': 0,
             'errors': 0
         }
         
         try:
-            # 获取所有活跃且未触发的提醒
-            alerts = Alert.get_active_alerts()
-            stats['checked'] = len(alerts)
+            # 先写入上一轮已完成发送的结果，并重放到期的通知
+            with trace.phase('outbox'):
+                self.outbox.apply_results()
+                stats['queued'] += self.outbox.replay()
+                self.outbox.prune()
             
-            logger.debug(f"开始检查 {len(alerts)} 个活跃提醒")
+            with trace.phase('sync'):
+                self.alert_book.sync()
+            book = self.alert_book
+            index = book.index
             
-            for alert in alerts:
-                try:
-                    # 获取当前价格
-                    current_price = self.price_service.get_current_price(
-                        alert.base_currency, alert.quote_currency
-                    )
-                    
-                    if current_price is None:
-                        logger.warning(f"无法获取价格，跳过提醒: {alert}")
+            pairs = book.pairs()
+            scheduler = self.scheduler
+            if scheduler:
+                with trace.phase('schedule'):
+                    scheduler.invalidate(self.alert_book.pop_changed_pairs())
+                    scheduler.retain(pairs)
+                    if not force:
+                        due = [pair for pair in pairs if scheduler.is_due(pair)]
+                        stats['deferred'] = sum(book.count(*pair) for pair in pairs if pair not in due)
+                        pairs = due
+            
+            trace.pairs = len(pairs)
+            fired: List[Tuple[Alert, float]] = []
+            logger.debug(f"开始检查 {len(pairs)} 个货币对，{stats['deferred']} 个提醒未到检查时间")
+            
+            tick_started = time.time()
+            with trace.phase('klines'):
+                windows, klines = self._fetch_klines(pairs, tick_started)
+                rule_series = self._fetch_rule_klines(pairs, tick_started)
+            
+            # 先获取所有货币对的价格快照，再统一评估（可分发到分片进程）
+            snapshots: List[PairSnapshot] = []
+            with trace.phase('prices'):
+                for base_currency, quote_currency in pairs:
+                    try:
+                        pair = (base_currency, quote_currency)
+                        count = book.count(base_currency, quote_currency)
+                        stats['checked'] += count
+                        
+                        # 每个货币对只获取一次价格
+                        current_price = self.price_service.get_current_price(
+                            base_currency, quote_currency
+                        )
+                        
+                        if current_price is None:
+                            logger.warning(f"无法获取价格，跳过 {base_currency}/{quote_currency} 的 {count} 个提醒")
+                            stats['errors'] += count
+                            if scheduler:
+                                scheduler.retry(pair)
+                            continue
+                        
+                        snapshots.append(self._build_snapshot(
+                            base_currency, quote_currency, current_price, windows.get(pair),
+                            klines, rule_series.get(pair), tick_started
+                        ))
+                        self._last_evaluated[pair] = tick_started
+                        
+                        if scheduler:
+                            scheduler.observe(pair, current_price)
+                            scheduler.schedule(pair, current_price,
+                                               *index.nearest(base_currency, quote_currency, current_price),
+                                               max_delay=self.config.PRICE_CHECK_INTERVAL
+                                               if book.rules.get(base_currency, quote_currency) else None)
+                        
+                    except Exception as e:
+                        logger.error(f"检查货币对 {base_currency}/{quote_currency} 时发生错误: {e}")
                         stats['errors'] += 1
+            
+            with trace.phase('evaluate'):
+                evaluated = self._evaluate_snapshots(snapshots)
+                book.remember_features(snapshots)
+            
+            with trace.phase('load_fired'):
+                for snapshot in snapshots:
+                    fired_ids = evaluated.get(snapshot.pair)
+                    if not fired_ids:
                         continue
                     
-                    # 检查条件
-                    if self.check_alert_condition(alert, current_price):
-                        # 触发提醒
-                        if self.trigger_alert(alert, current_price):
-                            stats['triggered'] += 1
-                        else:
-                            stats['errors'] += 1
-                    
-                except Exception as e:
-                    logger.error(f"检查提醒时发生错误: {alert}, 错误: {e}")
+                    try:
+                        alerts = self._load_fired_alerts(fired_ids)
+                        for alert in alerts:
+                            if alert.condition_type == 'rule':
+                                fired.append((alert, snapshot.price))
+                                continue
+                            
+                            # 区间内穿越目标的提醒以穿越一侧的极值作为触发价格
+                            trigger_price = snapshot.high if alert.condition_type == 'above' else snapshot.low
+                            if self.check_alert_condition(alert, trigger_price):
+                                fired.append((alert, trigger_price))
+                                if not self.check_alert_condition(alert, snapshot.price):
+                                    stats['crossed'] += 1
+                            else:
+                                stats['errors'] += 1
+                        
+                    except Exception as e:
+                        logger.error(f"加载货币对 {snapshot.base_currency}/{snapshot.quote_currency} "
+                                     f"触发的提醒时发生错误: {e}")
+                        stats['errors'] += 1
+            
+            # 本次检查的所有触发状态和通知在一个事务中写入
+            # 检查期间租约过期时放弃写入，由新的领导者重新评估
+            if fired and self._fenced('写入触发状态'):
+                stats['errors'] += len(fired)
+                return stats
+            with trace.phase('persist'):
+                results, outbox_rows = self.persist_triggered(fired)
+            for alert_id, persisted in results.items():
+                if persisted:
+                    stats['triggered'] += 1
+                    self.alert_book.remove(alert_id)
+                else:
                     stats['errors'] += 1
             
+            # 通知已提交到发件箱，失去租约时不再投递，由新的领导者重放
+            if outbox_rows and self._fenced('投递通知'):
+                return stats
+            with trace.phase('deliver'):
+                stats['queued'] += self.outbox.deliver(outbox_rows)
+            
             logger.info(f"提醒检查完成: {stats}")
             return stats
             
@@ -283,10 +868,249 @@ class AlertService:
             logger.error(f"检查提醒时发生严重错误: {e}")
             stats['errors'] += stats['checked']
             return stats
+        
+        finally:
+            MONITOR_TICK_SECONDS.observe(time.perf_counter() - started)
+            MONITOR_ALERTS_CHECKED.inc(stats['checked'])
+            MONITOR_ALERTS_TRIGGERED.inc(stats['triggered'])
+            MONITOR_ERRORS.inc(stats['errors'])
+    
+    def _fenced(self, stage: str) -> bool:
+        """本进程是否已失去监控租约，失去时跳过 stage 并输出警告"""
+        if self.fence is None or self.fence():
+            return False
+        logger.warning(f"本轮检查期间已失去监控租约，跳过{stage}")
+        return True
+    
+    def _fetch_klines(self, pairs: List[Tuple[str, str]],
+                      now: float) -> Tuple[Dict[Tuple[str, str], int], Dict[str, Any]]:
+        """
+        为需要检查的货币对批量获取1分钟K线，每个符号只请求一次
+        
+        只有评估过的货币对才有区间起点；起点不早于 CROSSING_LOOKBACK_LIMIT 之前。
+        
+        Args:
+            pairs: 本轮检查的货币对
+            now: 本轮开始时间（Unix 时间戳）
+            
+        Returns:
+            (每个货币对的区间起点（毫秒）, 按符号索引的K线)
+        """
+        active = set(self.alert_book.pairs())
+        for pair in [pair for pair in self._last_evaluated if pair not in active]:
+            del self._last_evaluated[pair]
+        
+        if not self.config.CROSSING_DETECTION:
+            return {}, {}
+        
+        windows: Dict[Tuple[str, str], int] = {}
+        starts: Dict[str, int] = {}
+        earliest = now - self.config.CROSSING_LOOKBACK_LIMIT
+        
+        for pair in pairs:
+            last = self._last_evaluated.get(pair)
+            if last is None:
+                continue
+            
+            symbols = [self.price_service.kline_symbol(currency) for currency in pair]
+            if symbols[0] is None:
+                continue
+            
+            since_ms = int(max(last, earliest) * 1000)
+            windows[pair] = since_ms
+            for symbol in symbols:
+                if symbol:
+                    starts[symbol] = min(starts.get(symbol, since_ms), since_ms)
+        
+        klines = {symbol: self.price_service.get_minute_klines(symbol, start_ms)
+                  for symbol, start_ms in starts.items()}
+        return windows, klines
+    
+    def _fetch_rule_klines(self, pairs: List[Tuple[str, str]],
+                           now: float) -> Dict[Tuple[str, str], Tuple[Dict[str, Any], int]]:
+        """
+        为有规则提醒的货币对批量获取K线，每个 (符号, 周期) 只请求一次
+        
+        K线周期按货币对上规则的最长时间窗口选择。
+        
+        Args:
+            pairs: 本轮检查的货币对
+            now: 本轮开始时间（Unix 时间戳）
+            
+        Returns:
+            每个货币对的 (按符号索引的K线, K线周期秒数)
+        """
+        plans: Dict[Tuple[str, str], Tuple[List[str], str, int]] = {}
+        starts: Dict[Tuple[str, str], int] = {}
+        
+        for pair in pairs:
+            rule_set = self.alert_book.rules.get(*pair)
+            if not rule_set or rule_set.max_window == 0:
+                continue
+            
+            symbols = [self.price_service.kline_symbol(currency) for currency in pair]
+            if symbols[0] is None:
+                continue
+            
+            interval, seconds = choose_interval(rule_set.max_window)
+            start_ms = int((now - rule_set.max_window - 2 * seconds) * 1000)
+            symbols = [symbol for symbol in symbols if symbol]
+            plans[pair] = (symbols, interval, seconds)
+            for symbol in symbols:
+                key = (symbol, interval)
+                starts[key] = min(starts.get(key, start_ms), start_ms)
+        
+        fetched = {key: self.price_service.get_klines(key[0], key[1], start_ms)
+                   for key, start_ms in starts.items()}
+        
+        return {
+            pair: ({symbol: fetched[(symbol, interval)] for symbol in symbols}, seconds)
+            for pair, (symbols, interval, seconds) in plans.items()
+        }
+    
+    def _build_snapshot(self, base_currency: str, quote_currency: str, current_price: float,
+                        since_ms: Optional[int], klines: Dict[str, Any],
+                        series: Optional[Tuple[Dict[str, Any], int]], now: float) -> PairSnapshot:
+        """
+        根据本轮获取的价格和K线生成货币对的价格快照
+        
+        Args:
+            base_currency: 基础货币
+            quote_currency: 计价货币
+            current_price: 当前价格
+            since_ms: 穿越检测的区间起点，没有区间时为None
+            klines: 按符号索引的1分钟K线
+            series: 规则提醒使用的 (按符号索引的K线, K线周期秒数)
+            now: 本轮开始时间（Unix 时间戳）
+            
+        Returns:
+            价格快照
+        """
+        low = high = current_price
+        if since_ms is not None:
+            low, high = self.price_service.get_price_range(
+                base_currency, quote_currency, since_ms, current_price, klines
+            )
+        
+        times = closes = previous = None
+        if series is not None:
+            series_klines, interval_seconds = series
+            times, closes = self.price_service.get_close_series(
+                base_currency, quote_currency, current_price, series_klines, interval_seconds
+            )
+            # 穿越条件只与一个周期内的上一次评估比较，更早的特征值视为未知
+            previous = self.alert_book.previous_features(
+                (base_currency, quote_currency), now,
+                max(self.config.PRICE_CHECK_INTERVAL, interval_seconds)
+            )
+        
+        return PairSnapshot(base_currency, quote_currency, current_price, low, high,
+                            since_ms, times, closes, now, previous)
+    
+    def _evaluate_snapshots(self, snapshots: List[PairSnapshot]) -> Dict[Tuple[str, str], List[int]]:
+        """
+        评估所有价格快照
+        
+        配置了分片进程池时按货币对分发到各分片并行评估，分片不可用的货币对
+        回退到本进程评估。
+        
+        Returns:
+            每个货币对触发的提醒ID列表
+        """
+        results: Dict[Tuple[str, str], List[int]] = {}
+        pending = snapshots
+        
+        if self.shards is not None:
+            results, pending = self.shards.evaluate(snapshots)
+        
+        for snapshot in pending:
+            try:
+                results[snapshot.pair] = self.alert_book.evaluate(snapshot)
+            except Exception as e:
+                logger.error(f"评估货币对 {snapshot.base_currency}/{snapshot.quote_currency} 时发生错误: {e}")
+        
+        return results
+    
+    def _build_outbox_row(self, alert: Alert, current_price: float, now: datetime) -> Dict[str, Any]:
+        """
+        构建提醒触发通知的发件箱记录
+        
+        Args:
+            alert: 提醒对象（触发前的状态）
+            current_price: 当前价格
+            now: 触发时间
+            
+        Returns:
+            发件箱记录字典
+        """
+        if alert.condition_type == 'rule':
+            message, embed = self.notification_service.build_rule_alert(
+                alert.base_currency, alert.quote_currency, alert.rule,
+                current_price, alert.note
+            )
+            summary = self.notification_service.format_rule_line(
+                alert.base_currency, alert.quote_currency, alert.rule, current_price
+            )
+        else:
+            message, embed = self.notification_service.build_price_alert(
+                alert.base_currency, alert.quote_currency, alert.condition_type,
+                alert.target_price, current_price, alert.note
+            )
+            summary = self.notification_service.format_alert_line(
+                alert.base_currency, alert.quote_currency, alert.condition_type,
+                alert.target_price, current_price
+            )
+        
+        key = NotificationOutbox.make_key(alert.id, (alert.trigger_count or 0) + 1, now)
+        return OutboxService.build_row(alert.id, key, alert.discord_webhook_url,
+                                       message, embed, summary, now)
+    
+    @staticmethod
+    def _outbox_insert():
+        """发件箱的批量插入语句，SQLite 上幂等键冲突的行被跳过而不是让整个事务失败"""
+        if db.engine.dialect.name == 'sqlite':
+            return sqlite_insert(NotificationOutbox).on_conflict_do_nothing(
+                index_elements=[NotificationOutbox.idempotency_key]
+            )
+        return insert(NotificationOutbox)
+    
+    def _load_outbox(self, keys: List[str], created_at: datetime) -> List[NotificationOutbox]:
+        """按幂等键读取本次提交的发件箱记录（因冲突被跳过的旧记录不会重复投递）"""
+        rows = []
+        for start in range(0, len(keys), self.BULK_CHUNK_SIZE):
+            chunk = keys[start:start + self.BULK_CHUNK_SIZE]
+            rows.extend(NotificationOutbox.query.filter(
+                NotificationOutbox.idempotency_key.in_(chunk),
+                NotificationOutbox.created_at == created_at
+            ).order_by(NotificationOutbox.id).all())
+        return rows
+    
+    def _load_fired_alerts(self, alert_ids: List[int]) -> List[Alert]:
+        """
+        加载触发的提醒，并移除提醒簿中已失效的条目
+        
+        Args:
+            alert_ids: 提醒ID列表
+            
+        Returns:
+            仍处于活跃状态的提醒列表
+        """
+        alerts = Alert.query.filter(
+            Alert.id.in_(alert_ids),
+            Alert.is_active.is_(True),
+            Alert.is_triggered.is_(False)
+        ).all()
+        
+        found = {alert.id for alert in alerts}
+        for alert_id in alert_ids:
+            if alert_id not in found:
+                self.alert_book.remove(alert_id)
+        
+        return alerts
     
     def _validate_alert_input(self, base_currency: str, quote_currency: str,
                             condition_type: str, target_price: float,
-                            discord_webhook_url: str) -> bool:
+                            discord_webhook_url: str, rule: Optional[str] = None) -> bool:
         """
         验证提醒输入参数
         
@@ -296,6 +1120,7 @@ class AlertService:
             condition_type: 条件类型
             target_price: 目标价格
             discord_webhook_url: Discord Webhook URL
+            rule: 规则表达式
             
         Returns:
             是否有效
@@ -306,12 +1131,19 @@ class AlertService:
             return False
         
         # 验证条件类型
-        if condition_type not in ['above', 'below']:
+        if condition_type not in ['above', 'below', 'rule']:
             logger.warning(f"无效的条件类型: {condition_type}")
             return False
         
-        # 验证目标价格
-        if target_price <= 0:
+        if condition_type == 'rule':
+            # 验证规则（编译一次即可发现语法错误）
+            try:
+                compile_rule(rule)
+            except RuleSyntaxError as e:
+                logger.warning(f"无效的规则: {e}")
+                return False
+        elif target_price <= 0:
+            # 验证目标价格
             logger.warning(f"无效的目标价格: {target_price}")
             return False
         
@@ -324,23 +1156,13 @@ class AlertService:
     
     def get_alert_statistics(self) -> Dict[str, Any]:
         """
-        获取提醒统计信息
+        获取提醒统计信息（来自进程内计数器，定期与数据库校正）
         
         Returns:
             统计信息字典
         """
         try:
-            total_alerts = Alert.query.count()
-            active_alerts = Alert.query.filter_by(is_active=True, is_triggered=False).count()
-            triggered_alerts = Alert.query.filter_by(is_triggered=True).count()
-            inactive_alerts = Alert.query.filter_by(is_active=False).count()
-            
-            return {
-                'total': total_alerts,
-                'active': active_alerts,
-                'triggered': triggered_alerts,
-                'inactive': inactive_alerts
-            }
+            return self.statistics.get()
             
         except Exception as e:
             logger.error(f"获取统计信息时发生错误: {e}")
@@ -350,3 +1172,8 @@ class AlertService:
                 'triggered': 0,
                 'inactive': 0
             }
+
+
+def _bulk_failure(index: int, error: str) -> Dict[str, Any]:
+    """批量操作中单个条目的失败结果"""
+    return {'index': index, 'success': False, 'error': error}
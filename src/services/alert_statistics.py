@@ -0,0 +1,114 @@
+# src/services/alert_statistics.py
+"""
+提醒统计计数器
+
+按 (is_active, is_triggered) 分组保存提醒数量。首次读取时用一条 GROUP BY 查询加载，
+之后由 AlertService 在创建、切换、删除和触发提交后增量更新，读取统计不访问数据库。
+
+其他进程（独立监控进程、其他 Web worker）的修改不会更新本进程的计数器，
+因此每隔 ALERT_STATISTICS_RECONCILE_INTERVAL 秒重新查询一次数据库校正计数，
+统计最多滞后这么长时间。
+"""
+import logging
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import func, select
+
+from ..config import get_config
+from ..models import Alert, read_db
+
+logger = logging.getLogger(__name__)
+
+# 提醒状态: (is_active, is_triggered)，None 表示不存在（创建前或删除后）
+State = Optional[Tuple[bool, bool]]
+
+ACTIVE = (True, False)
+
+
+class AlertStatistics:
+    """进程内的提醒数量计数器，定期与数据库校正"""
+
+    def __init__(self, reconcile_interval: Optional[float] = None):
+        config = get_config()
+        self.reconcile_interval = (reconcile_interval if reconcile_interval is not None
+                                   else config.ALERT_STATISTICS_RECONCILE_INTERVAL)
+        self._lock = threading.Lock()
+        self._counts: Dict[Tuple[bool, bool], int] = {}
+        self._reconciled_at: Optional[float] = None
+
+    def apply(self, before: State, after: State, count: int = 1) -> None:
+        """
+        记录已提交的状态变化
+
+        Args:
+            before: 变化前的状态，新建时为None
+            after: 变化后的状态，删除时为None
+            count: 发生该变化的提醒数量
+        """
+        if before == after or count <= 0:
+            return
+
+        with self._lock:
+            # 尚未加载时不记录，首次读取会直接从数据库得到包含这次变化的结果
+            if self._reconciled_at is None:
+                return
+            if before is not None:
+                self._counts[before] = self._counts.get(before, 0) - count
+            if after is not None:
+                self._counts[after] = self._counts.get(after, 0) + count
+
+    def reconcile(self) -> Dict[Tuple[bool, bool], int]:
+        """
+        用一条分组查询重新统计
+
+        Returns:
+            各状态的提醒数量
+        """
+        rows = read_db.session.execute(
+            select(Alert.is_active, Alert.is_triggered, func.count(Alert.id))
+            .group_by(Alert.is_active, Alert.is_triggered)
+        ).all()
+
+        counts: Dict[Tuple[bool, bool], int] = {}
+        for is_active, is_triggered, count in rows:
+            # 旧数据中可能为NULL，与模型默认值一致
+            key = (True if is_active is None else bool(is_active), bool(is_triggered))
+            counts[key] = counts.get(key, 0) + count
+
+        with self._lock:
+            if self._reconciled_at is not None:
+                drift = sum(abs(counts.get(key, 0) - self._counts.get(key, 0))
+                            for key in set(counts) | set(self._counts))
+                if drift:
+                    logger.debug(f"提醒统计与数据库相差 {drift} 个，已校正")
+            self._counts = counts
+            self._reconciled_at = time.monotonic()
+            return dict(counts)
+
+    def get(self) -> Dict[str, int]:
+        """
+        获取统计信息，超过校正间隔时先查询数据库
+
+        Returns:
+            {'total', 'active', 'triggered', 'inactive'}
+        """
+        with self._lock:
+            stale = (self._reconciled_at is None or
+                     time.monotonic() - self._reconciled_at >= self.reconcile_interval)
+            counts = dict(self._counts)
+
+        if stale:
+            counts = self.reconcile()
+
+        return {
+            'total': sum(counts.values()),
+            'active': counts.get(ACTIVE, 0),
+            'triggered': sum(count for (_, is_triggered), count in counts.items() if is_triggered),
+            'inactive': sum(count for (is_active, _), count in counts.items() if not is_active)
+        }
+
+
+# 全局计数器
+alert_statistics = AlertStatistics()
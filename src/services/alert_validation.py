@@ -0,0 +1,168 @@
+# src/services/alert_validation.py
+"""
+批量提醒的输入验证
+
+逐个创建提醒时，每个提醒都要请求一次实时价格验证货币对，并向 Webhook 发送一条测试消息。
+批量接口先在本地完成格式检查，然后对每个不同的货币对和 Webhook 只验证一次：
+提醒簿中已有提醒的货币对视为有效，验证通过的结果在进程内缓存 ALERT_VALIDATION_CACHE_TTL 秒，
+同一个 Webhook 在缓存有效期内不会重复收到测试消息。验证失败可能是上游暂时不可用，不缓存。
+"""
+import logging
+import threading
+import time
+from typing import Any, Dict, Iterable, Optional, Set, Tuple
+
+from ..config import get_config
+from ..utils.validators import validate_currency, validate_webhook_url
+from .alert_book import AlertBook
+from .notification_service import NotificationService
+from .price_service import PriceService
+from .rule_engine import RuleSyntaxError, compile_rule
+
+logger = logging.getLogger(__name__)
+
+CONDITION_TYPES = ('above', 'below', 'rule')
+
+
+class ValidationCache:
+    """带过期时间的验证通过记录"""
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._expires: Dict[Any, float] = {}
+
+    def __contains__(self, key) -> bool:
+        with self._lock:
+            expires = self._expires.get(key)
+            if expires is None:
+                return False
+            if expires <= time.monotonic():
+                del self._expires[key]
+                return False
+            return True
+
+    def add(self, key) -> None:
+        with self._lock:
+            self._expires[key] = time.monotonic() + self.ttl
+
+
+class AlertValidator:
+    """批量提醒的验证器，货币对和 Webhook 的验证结果在进程内缓存"""
+
+    def __init__(self, price_service: PriceService, notification_service: NotificationService,
+                 book: Optional[AlertBook] = None):
+        self.config = get_config()
+        self.price_service = price_service
+        self.notification_service = notification_service
+        self.book = book
+        self.supported = set(self.config.SUPPORTED_CURRENCIES)
+        self.pairs = ValidationCache(self.config.ALERT_VALIDATION_CACHE_TTL)
+        self.webhooks = ValidationCache(self.config.ALERT_VALIDATION_CACHE_TTL)
+
+    def normalize(self, item: Any) -> Dict[str, Any]:
+        """
+        检查单个提醒的字段格式（不访问网络），返回规范化后的字段
+
+        Args:
+            item: 请求中的提醒对象（更新时为合并了原有字段的对象）
+
+        Returns:
+            规范化后的字段
+
+        Raises:
+            ValueError: 字段缺失或格式错误
+        """
+        if not isinstance(item, dict):
+            raise ValueError('提醒必须是 JSON 对象')
+
+        condition_type = item.get('condition_type')
+        price_field = 'rule' if condition_type == 'rule' else 'target_price'
+        for field in ('base_currency', 'quote_currency', 'condition_type', price_field,
+                      'discord_webhook_url'):
+            if item.get(field) is None:
+                raise ValueError(f'缺少必需字段: {field}')
+
+        for field in ('base_currency', 'quote_currency'):
+            if not validate_currency(item[field]):
+                raise ValueError(f'无效的货币: {item[field]}')
+        base_currency = item['base_currency'].lower()
+        if base_currency not in self.supported:
+            raise ValueError(f'不支持的基础货币: {base_currency}')
+
+        if condition_type not in CONDITION_TYPES:
+            raise ValueError(f'无效的条件类型: {condition_type}')
+
+        rule = None
+        target_price = 0.0
+        if condition_type == 'rule':
+            try:
+                compile_rule(item['rule'])
+            except RuleSyntaxError as e:
+                raise ValueError(f'无效的规则: {e}')
+            rule = item['rule'].strip()
+        else:
+            try:
+                target_price = float(item['target_price'])
+            except (TypeError, ValueError):
+                raise ValueError(f"无效的目标价格: {item['target_price']}")
+            if target_price <= 0:
+                raise ValueError(f'无效的目标价格: {target_price}')
+
+        if not validate_webhook_url(item['discord_webhook_url']):
+            raise ValueError('无效的Discord Webhook URL')
+
+        return {
+            'base_currency': base_currency,
+            'quote_currency': item['quote_currency'].lower(),
+            'condition_type': condition_type,
+            'target_price': target_price,
+            'rule': rule,
+            'discord_webhook_url': item['discord_webhook_url'],
+            'user_identifier': item.get('user_identifier'),
+            'note': item.get('note')
+        }
+
+    def validate_pairs(self, pairs: Iterable[Tuple[str, str]]) -> Dict[Tuple[str, str], bool]:
+        """
+        验证货币对，每个不同的货币对最多请求一次价格
+
+        Args:
+            pairs: (基础货币, 计价货币) 列表，可以重复
+
+        Returns:
+            货币对 -> 是否有效
+        """
+        known: Set[Tuple[str, str]] = set()
+        if self.book is not None and self.book.loaded:
+            known = set(self.book.pairs())
+
+        results = {}
+        for pair in set(pairs):
+            valid = pair in known or pair in self.pairs
+            if not valid:
+                valid = self.price_service.validate_currency_pair(*pair)
+                if valid:
+                    self.pairs.add(pair)
+            results[pair] = valid
+        return results
+
+    def validate_webhooks(self, urls: Iterable[str]) -> Dict[str, bool]:
+        """
+        验证 Webhook，每个不同的 URL 最多发送一次测试消息
+
+        Args:
+            urls: Webhook URL 列表，可以重复
+
+        Returns:
+            URL -> 是否有效
+        """
+        results = {}
+        for url in set(urls):
+            valid = url in self.webhooks
+            if not valid:
+                valid = self.notification_service.validate_webhook_url(url)
+                if valid:
+                    self.webhooks.add(url)
+            results[url] = valid
+        return results
@@ -0,0 +1,343 @@
+# src/services/backtest_service.py
+"""
+提醒回测服务
+"""
+import logging
+import os
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from ..config import get_config
+from ..utils.metrics import CACHE_REQUESTS
+from .price_service import PriceService
+from .rule_engine import (KLINE_INTERVALS, RuleSet, RuleSyntaxError, compile_rule,
+                          compute_feature_series)
+from .threshold_index import ThresholdIndex
+
+logger = logging.getLogger(__name__)
+
+# 币安单次K线请求返回的最大条数
+KLINE_PAGE_SIZE = 1000
+
+_INTERVAL_SECONDS = dict(KLINE_INTERVALS)
+
+
+class CandleStore:
+    """
+    本地K线存储
+
+    每个 (符号, 周期) 保存为一个 .npy 文件，内容与 PriceService.get_klines 相同：
+    按开盘时间升序的 (开盘时间, 最高价, 最低价, 收盘价)。
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def _path(self, symbol: str, interval: str) -> str:
+        return os.path.join(self.directory, f"{symbol.upper()}_{interval}.npy")
+
+    def load(self, symbol: str, interval: str, start_ms: int, end_ms: int) -> Optional[np.ndarray]:
+        """
+        读取时间范围内的K线
+
+        Returns:
+            完整覆盖 [start_ms, end_ms) 时返回K线数组，否则返回None
+        """
+        path = self._path(symbol, interval)
+        if not os.path.exists(path):
+            return None
+
+        candles = np.load(path)
+        step = _INTERVAL_SECONDS[interval] * 1000
+        if len(candles) == 0 or candles[0, 0] > start_ms or candles[-1, 0] + step < end_ms:
+            return None
+
+        times = candles[:, 0]
+        return candles[np.searchsorted(times, start_ms):np.searchsorted(times, end_ms)]
+
+    def save(self, symbol: str, interval: str, candles: np.ndarray) -> None:
+        """与已有K线合并后保存（相同开盘时间以新数据为准）"""
+        if candles is None or len(candles) == 0:
+            return
+
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(symbol, interval)
+        if os.path.exists(path):
+            candles = np.concatenate([candles, np.load(path)])
+
+        _, first = np.unique(candles[:, 0], return_index=True)
+        np.save(path, candles[first])
+
+
+class BacktestService:
+    """
+    在历史K线上回放提醒，计算每个提醒第一次触发的时间，不发送任何通知
+
+    价格提醒使用向量化的首次穿越查找：高于类提醒在最高价的累计最大值上、
+    低于类提醒在最低价的累计最小值（取负后单调不减）上用 np.searchsorted
+    一次求出同一货币对所有目标价格的触发位置。规则提醒在每根K线收盘时
+    计算特征序列，由 RuleSet 分块求值。
+    """
+
+    def __init__(self, price_service: Optional[PriceService] = None,
+                 store: Optional[CandleStore] = None):
+        self.config = get_config()
+        self.price_service = price_service or PriceService()
+        self.store = store or CandleStore(self.config.BACKTEST_CANDLE_DIR)
+
+    def fetch_candles(self, symbol: str, interval: str, start_ms: int,
+                      end_ms: int) -> Optional[np.ndarray]:
+        """
+        获取时间范围内的K线，优先读取本地存储，否则分页请求并写入本地存储
+
+        Args:
+            symbol: 币安符号（如 'BTC'），对 USDT 报价
+            interval: K线周期
+            start_ms: 起始时间（毫秒时间戳）
+            end_ms: 结束时间（毫秒时间戳，不含）
+
+        Returns:
+            K线数组，请求失败时返回None
+        """
+        candles = self.store.load(symbol, interval, start_ms, end_ms)
+        CACHE_REQUESTS.inc(1, ('candles', 'miss' if candles is None else 'hit'))
+        if candles is not None:
+            return candles
+
+        step = _INTERVAL_SECONDS[interval] * 1000
+        pages = []
+        cursor = start_ms
+        while cursor < end_ms:
+            page = self.price_service.get_klines(symbol, interval, cursor)
+            if page is None:
+                logger.error(f"获取 {symbol} {interval} K线失败（{cursor}）")
+                return None
+
+            pages.append(page[page[:, 0] < end_ms])
+            if len(page) < KLINE_PAGE_SIZE:
+                break
+            cursor = int(page[-1, 0]) + step
+
+        candles = np.concatenate(pages) if pages else np.empty((0, 4))
+        try:
+            self.store.save(symbol, interval, candles)
+        except OSError as e:
+            logger.warning(f"保存 {symbol} {interval} K线到本地时出错: {e}")
+        return candles
+
+    def get_pair_candles(self, base_currency: str, quote_currency: str, interval: str,
+                         start_ms: int, end_ms: int,
+                         fiat_rates: Dict[str, float]) -> Optional[np.ndarray]:
+        """
+        生成货币对的K线
+
+        K线对 USDT 报价，按 1 USDT = 1 USD 处理；其他法币按当前汇率换算。
+        计价货币为加密货币时按开盘时间对齐，用收盘价之比近似高低价。
+
+        Args:
+            fiat_rates: 法币汇率缓存（回测期间同一法币只查询一次）
+
+        Returns:
+            (开盘时间, 最高价, 最低价, 收盘价) 数组，无法获取时返回None
+        """
+        base_symbol = self.price_service.kline_symbol(base_currency)
+        if base_symbol is None:
+            return None
+        base = self.fetch_candles(base_symbol, interval, start_ms, end_ms)
+        if base is None:
+            return None
+
+        quote_symbol = self.price_service.kline_symbol(quote_currency)
+        if quote_symbol is not None:
+            quote = self.fetch_candles(quote_symbol, interval, start_ms, end_ms)
+            if quote is None:
+                return None
+            times, bi, qi = np.intersect1d(base[:, 0], quote[:, 0], return_indices=True)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                closes = base[bi, 3] / quote[qi, 3]
+            return np.column_stack([times, closes, closes, closes])
+
+        quote = quote_currency.lower()
+        if quote not in ('usd', 'usdt'):
+            if quote not in fiat_rates:
+                fiat_rates[quote] = self._fiat_rate(base_currency, quote)
+            rate = fiat_rates[quote]
+            if rate is None:
+                return None
+            base = base.copy()
+            base[:, 1:] *= rate
+        return base
+
+    def _fiat_rate(self, base_currency: str, quote_currency: str) -> Optional[float]:
+        """用同一货币的两种报价推算 USD 到法币的当前汇率"""
+        in_quote = self.price_service.get_current_price(base_currency, quote_currency)
+        in_usd = self.price_service.get_current_price(base_currency, 'usd')
+        if not in_quote or not in_usd:
+            logger.error(f"无法获取 USD/{quote_currency.upper()} 汇率")
+            return None
+        return in_quote / in_usd
+
+    def run(self, alerts: Iterable[Any], start: datetime, end: datetime,
+            interval: str = '1m') -> Dict[str, Any]:
+        """
+        回测一组提醒
+
+        Args:
+            alerts: 提醒定义（Alert 实例或包含相同字段的字典）
+            start: 回测开始时间（UTC）
+            end: 回测结束时间（UTC）
+            interval: K线周期
+
+        Returns:
+            回测结果，包含汇总、按货币对和按天的触发次数以及每个提醒的触发时间
+        """
+        if interval not in _INTERVAL_SECONDS:
+            raise ValueError(f"不支持的K线周期: {interval}")
+        start_ms, end_ms = _to_ms(start), _to_ms(end)
+        if start_ms >= end_ms:
+            raise ValueError("回测开始时间必须早于结束时间")
+
+        definitions = [_definition(alert) for alert in alerts]
+        results: List[Dict[str, Any]] = [
+            dict(definition, triggered=False, triggered_at=None, trigger_price=None)
+            for definition in definitions
+        ]
+
+        groups: Dict[Tuple[str, str], List[int]] = defaultdict(list)
+        for position, definition in enumerate(definitions):
+            if definition['condition_type'] not in ('above', 'below', 'rule'):
+                results[position]['error'] = f"无效的条件类型: {definition['condition_type']}"
+                continue
+            pair = ThresholdIndex.make_pair(definition['base_currency'], definition['quote_currency'])
+            groups[pair].append(position)
+
+        fetch_seconds = evaluate_seconds = 0.0
+        pair_stats: Dict[str, Dict[str, int]] = {}
+        fiat_rates: Dict[str, float] = {}
+
+        for (base, quote), positions in groups.items():
+            rules = self._compile_rules(definitions, positions, results)
+            warmup_ms = rules.max_window * 1000 if rules else 0
+
+            fetch_started = time.perf_counter()
+            candles = self.get_pair_candles(base, quote, interval, start_ms - warmup_ms,
+                                            end_ms, fiat_rates)
+            fetch_seconds += time.perf_counter() - fetch_started
+
+            if candles is None or len(candles) == 0:
+                for position in positions:
+                    results[position].setdefault('error', '没有可用的K线数据')
+                pair_stats[f"{base}/{quote}"] = {'alerts': len(positions), 'triggered': 0, 'candles': 0}
+                continue
+
+            evaluate_started = time.perf_counter()
+            begin = int(np.searchsorted(candles[:, 0], start_ms))
+            self._replay_thresholds(definitions, positions, candles[begin:], results)
+            if rules:
+                self._replay_rules(rules, candles, begin, interval, results)
+            evaluate_seconds += time.perf_counter() - evaluate_started
+
+            pair_stats[f"{base}/{quote}"] = {
+                'alerts': len(positions),
+                'triggered': sum(1 for position in positions if results[position]['triggered']),
+                'candles': len(candles) - begin
+            }
+
+        triggered = [result for result in results if result['triggered']]
+        by_day: Dict[str, int] = defaultdict(int)
+        for result in triggered:
+            by_day[result['triggered_at'][:10]] += 1
+
+        return {
+            'start': _iso(start_ms),
+            'end': _iso(end_ms),
+            'interval': interval,
+            'total_alerts': len(results),
+            'triggered': len(triggered),
+            'not_triggered': sum(1 for result in results if not result['triggered'] and 'error' not in result),
+            'errors': sum(1 for result in results if 'error' in result),
+            'by_pair': pair_stats,
+            'by_day': dict(sorted(by_day.items())),
+            'fetch_seconds': round(fetch_seconds, 3),
+            'evaluate_seconds': round(evaluate_seconds, 3),
+            'results': results
+        }
+
+    @staticmethod
+    def _compile_rules(definitions: List[Dict[str, Any]], positions: List[int],
+                       results: List[Dict[str, Any]]) -> Optional[RuleSet]:
+        """编译货币对上的规则提醒，规则以在 definitions 中的位置为ID"""
+        rules = RuleSet()
+        for position in positions:
+            if definitions[position]['condition_type'] != 'rule':
+                continue
+            try:
+                rules.add(position, compile_rule(definitions[position]['rule']))
+            except RuleSyntaxError as e:
+                results[position]['error'] = f"无效的规则: {e}"
+        return rules if len(rules) else None
+
+    @staticmethod
+    def _replay_thresholds(definitions: List[Dict[str, Any]], positions: List[int],
+                           candles: np.ndarray, results: List[Dict[str, Any]]) -> None:
+        """向量化查找价格提醒第一次穿越目标价格的K线"""
+        if len(candles) == 0:
+            return
+
+        times, highs, lows = candles[:, 0], candles[:, 1], candles[:, 2]
+        for condition, extremes, sign in (('above', highs, 1.0), ('below', lows, -1.0)):
+            members = [p for p in positions if definitions[p]['condition_type'] == condition]
+            if not members:
+                continue
+
+            # 高于: 最高价的累计最大值单调不减；低于: 最低价的累计最小值取负后单调不减
+            running = np.maximum.accumulate(sign * extremes)
+            targets = sign * np.array([definitions[p]['target_price'] for p in members], dtype=float)
+            indexes = np.searchsorted(running, targets, side='left')
+
+            for position, index in zip(members, indexes.tolist()):
+                if index < len(times):
+                    _mark(results[position], times[index], extremes[index])
+
+    @staticmethod
+    def _replay_rules(rules: RuleSet, candles: np.ndarray, begin: int, interval: str,
+                      results: List[Dict[str, Any]]) -> None:
+        """在每根K线收盘时对规则提醒求值，预热区间只用于计算特征"""
+        close_times = candles[:, 0] / 1000 + _INTERVAL_SECONDS[interval]
+        closes = candles[:, 3]
+        series = compute_feature_series(rules.features, close_times, closes)
+
+        first = rules.first_true({feature: values[begin:] for feature, values in series.items()})
+        for position, offset in first.items():
+            _mark(results[position], candles[begin + offset, 0], closes[begin + offset])
+
+
+def _definition(alert: Any) -> Dict[str, Any]:
+    """把 Alert 实例或字典统一为回测使用的提醒定义"""
+    get = alert.get if isinstance(alert, dict) else lambda key, default=None: getattr(alert, key, default)
+    return {
+        'id': get('id'),
+        'base_currency': get('base_currency'),
+        'quote_currency': get('quote_currency'),
+        'condition_type': get('condition_type'),
+        'target_price': float(get('target_price') or 0),
+        'rule': get('rule')
+    }
+
+
+def _mark(result: Dict[str, Any], open_ms: float, price: float) -> None:
+    result['triggered'] = True
+    result['triggered_at'] = _iso(open_ms)
+    result['trigger_price'] = float(price)
+
+
+def _to_ms(moment: datetime) -> int:
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return int(moment.timestamp() * 1000)
+
+
+def _iso(ms: float) -> str:
+    return datetime.fromtimestamp(ms / 1000, tz=timezone.utc).strftime('%Y-%m-%dT%H:%M:%S')
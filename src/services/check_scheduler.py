@@ -0,0 +1,167 @@
+# src/services/check_scheduler.py
+"""
+自适应检查调度
+"""
+import math
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+from .threshold_index import Pair
+
+
+class CheckScheduler:
+    """
+    按货币对计算下一次检查时间
+
+    每个货币对根据观察到的价格维护一个波动率估计（对数收益方差率的指数移动
+    平均），并根据当前价格到最近目标价格的对数距离 d 计算下一次检查时间：
+
+        t = (d / (z * σ))²
+
+    即价格以 z 倍标准差的速度移动到最近目标所需的时间，再限制在
+    [floor, ceiling] 范围内。距离目标很远的货币对很少检查，接近目标的
+    货币对频繁检查；较远的提醒不会先于最近的提醒触发，因此按货币对调度即可。
+
+    波动率估计为0（价格源缓存导致连续观察到相同价格）时无法推算时间，按固定间隔
+    interval 检查；距最近目标不超过 near_target（相对距离）的货币对最长间隔也是
+    interval，不会比固定间隔检查得更少。
+    """
+
+    def __init__(self, floor: float, ceiling: float, z: float = 3.0, alpha: float = 0.2,
+                 interval: Optional[float] = None, near_target: float = 0.0):
+        self.floor = floor
+        self.ceiling = ceiling
+        self.z = z
+        self.alpha = alpha
+        self.interval = min(ceiling, max(floor, interval if interval is not None else floor))
+        self.near_distance = math.log1p(near_target)
+
+        self._next_due: Dict[Pair, float] = {}
+        self._last: Dict[Pair, Tuple[float, float]] = {}
+        self._variance: Dict[Pair, float] = {}
+        self._lock = threading.Lock()
+
+    def is_due(self, pair: Pair, now: Optional[float] = None) -> bool:
+        """货币对是否需要检查（从未调度过的货币对立即检查）"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            return self._next_due.get(pair, 0.0) <= now
+
+    def observe(self, pair: Pair, price: float, now: Optional[float] = None) -> None:
+        """
+        记录一次价格观察，更新波动率估计
+
+        Args:
+            pair: 货币对
+            price: 价格
+            now: 观察时间（单调时钟）
+        """
+        if price <= 0:
+            return
+
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            last = self._last.get(pair)
+            self._last[pair] = (price, now)
+            if last is None or now <= last[1]:
+                return
+
+            last_price, last_time = last
+            rate = math.log(price / last_price) ** 2 / (now - last_time)
+            previous = self._variance.get(pair)
+            self._variance[pair] = rate if previous is None else \
+                previous + self.alpha * (rate - previous)
+
+    def schedule(self, pair: Pair, price: float, upper: Optional[float], lower: Optional[float],
+                 now: Optional[float] = None, max_delay: Optional[float] = None) -> float:
+        """
+        根据最近的目标价格计算并记录下一次检查时间
+
+        Args:
+            pair: 货币对
+            price: 当前价格
+            upper: 高于当前价格的最近目标
+            lower: 低于当前价格的最近目标
+            now: 当前时间（单调时钟）
+            max_delay: 最长间隔（如货币对上还有不按距离调度的规则提醒）
+
+        Returns:
+            距下一次检查的秒数
+        """
+        now = time.monotonic() if now is None else now
+        delay = self.delay(pair, price, upper, lower)
+        if max_delay is not None:
+            delay = max(self.floor, min(delay, max_delay))
+        with self._lock:
+            self._next_due[pair] = now + delay
+        return delay
+
+    def delay(self, pair: Pair, price: float, upper: Optional[float],
+              lower: Optional[float]) -> float:
+        """计算距下一次检查的秒数"""
+        distances = [abs(math.log(target / price)) for target in (upper, lower)
+                     if target is not None and target > 0 and price > 0]
+        if not distances:
+            return self.ceiling
+
+        with self._lock:
+            variance = self._variance.get(pair)
+
+        # 还没有波动率估计时按最短间隔检查
+        if variance is None:
+            return self.floor
+        # 价格没有变化不代表不会变化，按固定间隔检查
+        if variance <= 0:
+            return self.interval
+
+        nearest = min(distances)
+        ceiling = self.interval if nearest <= self.near_distance else self.ceiling
+        seconds = (nearest / (self.z * math.sqrt(variance))) ** 2
+        return min(ceiling, max(self.floor, seconds))
+
+    def retry(self, pair: Pair, now: Optional[float] = None) -> None:
+        """获取价格失败时按最短间隔重试"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            self._next_due[pair] = now + self.floor
+
+    def invalidate(self, pairs: Iterable[Pair]) -> None:
+        """提醒发生变化的货币对在下一轮立即检查"""
+        with self._lock:
+            for pair in pairs:
+                self._next_due.pop(pair, None)
+
+    def reset(self) -> None:
+        """清空所有调度（保留波动率估计）"""
+        with self._lock:
+            self._next_due.clear()
+
+    def retain(self, pairs: Iterable[Pair]) -> None:
+        """丢弃已经没有提醒的货币对的状态"""
+        keep = set(pairs)
+        with self._lock:
+            for state in (self._next_due, self._last, self._variance):
+                for pair in [pair for pair in state if pair not in keep]:
+                    del state[pair]
+
+    def next_due_in(self, now: Optional[float] = None) -> Optional[float]:
+        """距最早一次检查的秒数，没有调度时返回None"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            if not self._next_due:
+                return None
+            return max(0.0, min(self._next_due.values()) - now)
+
+    def get_stats(self, now: Optional[float] = None) -> Dict[str, object]:
+        """获取调度统计"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            waits: List[float] = sorted(due - now for due in self._next_due.values())
+            return {
+                'scheduled_pairs': len(waits),
+                'due_pairs': sum(1 for wait in waits if wait <= 0),
+                'next_due_in': round(max(0.0, waits[0]), 1) if waits else None,
+                'floor': self.floor,
+                'ceiling': self.ceiling,
+                'interval': self.interval
+            }
@@ -0,0 +1,164 @@
+# src/services/discord_rate_limiter.py
+"""
+Discord Webhook 限流跟踪
+"""
+import logging
+import random
+import threading
+import time
+from typing import Any, Dict, Mapping, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class _Bucket:
+    """单个 Webhook 的限流状态"""
+
+    __slots__ = ('limit', 'remaining', 'reset_at', 'blocked_until', 'bucket_id')
+
+    def __init__(self):
+        self.limit: Optional[int] = None
+        self.remaining: Optional[int] = None
+        self.reset_at = 0.0
+        self.blocked_until = 0.0
+        self.bucket_id: Optional[str] = None
+
+
+class DiscordRateLimiter:
+    """
+    按 Webhook 跟踪 Discord 限流状态
+
+    根据响应中的 X-RateLimit-* 头维护每个 Webhook 的剩余额度和重置时间，
+    遇到 429 时按 retry_after 暂停该 Webhook（全局限流时暂停所有 Webhook）。
+    发送前调用 acquire 预占额度：返回 0 表示可以立即发送，否则返回需要等待的秒数。
+    """
+
+    def __init__(self, jitter: float = 0.25, max_backoff: float = 60):
+        self.jitter = jitter
+        self.max_backoff = max_backoff
+        self._buckets: Dict[str, _Bucket] = {}
+        self._global_blocked_until = 0.0
+        self._lock = threading.Lock()
+
+        # 统计信息
+        self.rate_limited = 0
+        self.global_rate_limited = 0
+
+    def acquire(self, webhook_url: str) -> float:
+        """
+        尝试为一次发送预占额度
+
+        Args:
+            webhook_url: Discord Webhook URL
+
+        Returns:
+            0 表示已预占可以发送，否则为建议等待的秒数（已加入抖动）
+        """
+        now = time.monotonic()
+
+        with self._lock:
+            bucket = self._buckets.setdefault(webhook_url, _Bucket())
+
+            wait_until = max(self._global_blocked_until, bucket.blocked_until)
+            if bucket.remaining is not None and bucket.remaining <= 0 and bucket.reset_at > now:
+                wait_until = max(wait_until, bucket.reset_at)
+
+            if wait_until > now:
+                return wait_until - now + random.uniform(0, self.jitter)
+
+            # 重置时间已过，额度恢复
+            if bucket.reset_at and bucket.reset_at <= now and bucket.limit is not None:
+                bucket.remaining = bucket.limit
+
+            if bucket.remaining is not None:
+                bucket.remaining -= 1
+            return 0.0
+
+    def update(self, webhook_url: str, status_code: int, headers: Mapping[str, str],
+               body: Optional[Dict[str, Any]] = None) -> Optional[float]:
+        """
+        根据响应更新限流状态
+
+        Args:
+            webhook_url: Discord Webhook URL
+            status_code: HTTP 状态码
+            headers: 响应头
+            body: 429 响应的 JSON 内容
+
+        Returns:
+            429 时返回需要等待的秒数，否则返回None
+        """
+        now = time.monotonic()
+
+        with self._lock:
+            bucket = self._buckets.setdefault(webhook_url, _Bucket())
+
+            limit = headers.get('X-RateLimit-Limit')
+            remaining = headers.get('X-RateLimit-Remaining')
+            reset_after = headers.get('X-RateLimit-Reset-After')
+            bucket.bucket_id = headers.get('X-RateLimit-Bucket', bucket.bucket_id)
+
+            try:
+                if limit is not None:
+                    bucket.limit = int(limit)
+                if remaining is not None:
+                    bucket.remaining = int(remaining)
+                if reset_after is not None:
+                    bucket.reset_at = now + float(reset_after)
+            except ValueError:
+                logger.debug(f"无法解析限流响应头: {dict(headers)}")
+
+            if status_code != 429:
+                return None
+
+            retry_after = self._parse_retry_after(headers, body)
+            is_global = bool((body or {}).get('global')) or \
+                headers.get('X-RateLimit-Global', '').lower() == 'true'
+
+            self.rate_limited += 1
+            if is_global:
+                self.global_rate_limited += 1
+                self._global_blocked_until = max(self._global_blocked_until, now + retry_after)
+            else:
+                bucket.blocked_until = max(bucket.blocked_until, now + retry_after)
+                bucket.remaining = 0
+
+            logger.warning(f"Discord 限流{'（全局）' if is_global else ''}，{retry_after:.2f} 秒后重试")
+            return retry_after + random.uniform(0, self.jitter)
+
+    def backoff(self, attempt: int, base: float = 1.0) -> float:
+        """
+        计算非限流错误的指数退避时间（带抖动）
+
+        Args:
+            attempt: 已尝试次数（从1开始）
+            base: 基础等待时间（秒）
+
+        Returns:
+            等待的秒数
+        """
+        delay = min(self.max_backoff, base * (2 ** max(0, attempt - 1)))
+        return random.uniform(delay / 2, delay)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取限流统计"""
+        now = time.monotonic()
+        with self._lock:
+            return {
+                'tracked_webhooks': len(self._buckets),
+                'blocked_webhooks': sum(1 for b in self._buckets.values() if b.blocked_until > now),
+                'global_blocked': self._global_blocked_until > now,
+                'rate_limited': self.rate_limited,
+                'global_rate_limited': self.global_rate_limited
+            }
+
+    @staticmethod
+    def _parse_retry_after(headers: Mapping[str, str], body: Optional[Dict[str, Any]]) -> float:
+        """从 429 响应中解析 retry_after（秒）"""
+        value = (body or {}).get('retry_after')
+        if value is None:
+            value = headers.get('Retry-After') or headers.get('X-RateLimit-Reset-After')
+        try:
+            return max(0.0, float(value))
+        except (TypeError, ValueError):
+            return 1.0
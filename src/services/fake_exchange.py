@@ -0,0 +1,389 @@
+# src/services/fake_exchange.py
+"""
+本地模拟交易所
+
+以 /<上游>/<原始路径> 的形式提供上游接口，例如:
+    /binance/api/v3/ticker/price、/binance/api/v3/klines、/binance/api/v3/exchangeInfo
+    /coingecko/api/v3/simple/price
+    /exchangerate/v4/latest/USD
+
+响应来自录制的 cassette 文件（录制模式下转发到真实上游并保存响应），
+可以注入固定延迟、随机错误和 429 限流，用于离线、可复现的性能测试。
+将 UPSTREAM_BASE_URL 设置为服务地址即可让两套价格接口都指向它。
+"""
+import json
+import logging
+import os
+import random
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlsplit
+import requests
+from .load_generator import FIAT_RATES, HISTORY_CANDLES, ScriptedPriceService
+from .rule_engine import parse_duration
+
+logger = logging.getLogger(__name__)
+
+# 录制模式下转发的真实上游
+REAL_HOSTS = {
+    'binance': 'https://api.binance.com',
+    'coingecko': 'https://api.coingecko.com',
+    'exchangerate': 'https://api.exchangerate-api.com'
+}
+
+# 匹配录制响应时忽略的查询参数（K线在回放时按当前时间重新截取）
+VOLATILE_PARAMS = frozenset(('startTime', 'endTime', 'limit'))
+
+# 模拟服务自身的接口前缀
+CONTROL_PREFIX = '_fake'
+
+Key = Tuple[str, str, Tuple[Tuple[str, str], ...]]
+Response = Tuple[int, Dict[str, str], Any]
+
+
+class Cassette:
+    """录制的上游响应集合，以 (上游, 路径, 查询参数) 为键"""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self._interactions: Dict[Key, Dict[str, Any]] = {}
+        self._dirty = False
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(upstream: str, path: str, query: Dict[str, str]) -> Key:
+        params = tuple(sorted((name, value) for name, value in query.items()
+                              if name not in VOLATILE_PARAMS))
+        return (upstream, path.strip('/'), params)
+
+    @classmethod
+    def load(cls, path: str) -> 'Cassette':
+        """
+        从文件加载，文件不存在时返回空集合
+
+        Args:
+            path: cassette 文件路径
+
+        Returns:
+            Cassette 实例
+        """
+        cassette = cls(path)
+        if not os.path.exists(path):
+            return cassette
+
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        for item in data.get('interactions', []):
+            cassette._interactions[cls.key(item['upstream'], item['path'], item.get('query', {}))] = item
+        return cassette
+
+    def save(self, path: Optional[str] = None) -> None:
+        """写入文件（先写临时文件再替换，避免中途退出留下损坏的文件）"""
+        path = path or self.path
+        if path is None:
+            raise ValueError("未指定 cassette 文件路径")
+
+        with self._lock:
+            interactions = list(self._interactions.values())
+            self._dirty = False
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        temporary = f'{path}.tmp'
+        with open(temporary, 'w', encoding='utf-8') as f:
+            json.dump({'recorded_at': datetime.utcnow().isoformat(), 'interactions': interactions},
+                      f, ensure_ascii=False)
+        os.replace(temporary, path)
+
+    @property
+    def dirty(self) -> bool:
+        """是否有尚未保存的录制"""
+        return self._dirty
+
+    def find(self, upstream: str, path: str, query: Dict[str, str]) -> Optional[Dict[str, Any]]:
+        return self._interactions.get(self.key(upstream, path, query))
+
+    def record(self, upstream: str, path: str, query: Dict[str, str], status: int, body: Any) -> None:
+        item = {
+            'upstream': upstream,
+            'path': path.strip('/'),
+            'query': {name: value for name, value in query.items() if name not in VOLATILE_PARAMS},
+            'status': status,
+            'body': body
+        }
+        with self._lock:
+            self._interactions[self.key(upstream, path, query)] = item
+            self._dirty = True
+
+    def __len__(self) -> int:
+        return len(self._interactions)
+
+
+class FaultInjector:
+    """按配置注入延迟、服务端错误和 429 限流，随机数可指定种子以便复现"""
+
+    def __init__(self, latency_ms: float = 0, jitter_ms: float = 0, error_rate: float = 0,
+                 rate_limit_rate: float = 0, retry_after: int = 1, seed: Optional[int] = None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after = retry_after
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def decide(self) -> Tuple[float, Optional[int]]:
+        """
+        决定一个请求的延迟和是否注入错误
+
+        Returns:
+            (延迟秒数, 注入的状态码，不注入时为None)
+        """
+        with self._lock:
+            jitter = self._random.uniform(0, self.jitter_ms) if self.jitter_ms else 0.0
+            roll = self._random.random()
+
+        status = None
+        if roll < self.rate_limit_rate:
+            status = 429
+        elif roll < self.rate_limit_rate + self.error_rate:
+            status = 503
+        return (self.latency_ms + jitter) / 1000, status
+
+
+class FakeExchange:
+    """
+    模拟交易所的请求处理（与 HTTP 服务分开，可以直接调用）
+
+    回放模式只返回 cassette 中的响应，未录制的请求返回 404；录制模式转发到
+    真实上游并保存成功的响应。K线在回放时按当前时间平移，使最后一根K线
+    落在当前周期，再按 startTime / endTime / limit 截取。
+    """
+
+    MODES = ('replay', 'record')
+
+    def __init__(self, cassette: Cassette, faults: Optional[FaultInjector] = None,
+                 mode: str = 'replay', rebase_time: bool = True, timeout: float = 30):
+        if mode not in self.MODES:
+            raise ValueError(f"未知的模式: {mode}")
+        self.cassette = cassette
+        self.faults = faults or FaultInjector()
+        self.mode = mode
+        self.rebase_time = rebase_time
+        self.timeout = timeout
+        self.session = requests.Session() if mode == 'record' else None
+        self._stats: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def handle(self, path: str, query: Dict[str, str]) -> Response:
+        """
+        处理一个 GET 请求
+
+        Args:
+            path: 请求路径（如 '/binance/api/v3/klines'）
+            query: 查询参数
+
+        Returns:
+            (状态码, 响应头, JSON 响应体)
+        """
+        upstream, _, rest = path.strip('/').partition('/')
+        if upstream == CONTROL_PREFIX:
+            return 200, {}, self.get_stats()
+        if upstream not in REAL_HOSTS:
+            return self._count('unknown', 404, {}, {'error': f'unknown upstream: {upstream}'})
+
+        delay, injected = self.faults.decide()
+        if delay > 0:
+            time.sleep(delay)
+        if injected == 429:
+            return self._count('injected', 429, {'Retry-After': str(self.faults.retry_after)},
+                               {'code': -1003, 'msg': 'Too many requests (injected).'})
+        if injected is not None:
+            return self._count('injected', injected, {}, {'error': 'injected failure'})
+
+        if self.mode == 'record':
+            return self._record(upstream, rest, query)
+
+        item = self.cassette.find(upstream, rest, query)
+        if item is None:
+            return self._count('miss', 404, {}, {'error': 'no recorded response',
+                                                 'upstream': upstream, 'path': rest, 'query': query})
+
+        body = item['body']
+        if rest.endswith('klines') and item['status'] == 200:
+            body = self._slice_klines(body, query)
+        return self._count('hit', item['status'], {}, body)
+
+    def _record(self, upstream: str, rest: str, query: Dict[str, str]) -> Response:
+        url = f"{REAL_HOSTS[upstream]}/{rest}"
+        try:
+            response = self.session.get(url, params=query, timeout=self.timeout)
+            body = response.json()
+        except (requests.RequestException, ValueError) as e:
+            logger.error(f"录制 {url} 时出错: {e}")
+            return self._count('error', 502, {}, {'error': str(e)})
+
+        if response.status_code == 200:
+            self.cassette.record(upstream, rest, query, response.status_code, body)
+        if rest.endswith('klines') and response.status_code == 200:
+            body = self._slice_klines(body, query)
+        return self._count('recorded', response.status_code, {}, body)
+
+    def _slice_klines(self, candles: List[list], query: Dict[str, str]) -> List[list]:
+        if not candles:
+            return candles
+
+        if self.rebase_time:
+            try:
+                interval_ms = parse_duration(query.get('interval', '1m')) * 1000
+            except ValueError:
+                interval_ms = None
+            if interval_ms:
+                now_ms = int(time.time() * 1000)
+                shift = now_ms // interval_ms * interval_ms - int(candles[-1][0])
+                candles = [[candle[0] + shift] + candle[1:6] + [candle[6] + shift] + candle[7:]
+                           for candle in candles]
+
+        if 'startTime' in query:
+            start = int(query['startTime'])
+            candles = [candle for candle in candles if candle[0] >= start]
+        if 'endTime' in query:
+            end = int(query['endTime'])
+            candles = [candle for candle in candles if candle[0] <= end]
+
+        limit = int(query.get('limit', 500))
+        return candles[:limit] if 'startTime' in query else candles[-limit:]
+
+    def _count(self, outcome: str, status: int, headers: Dict[str, str], body: Any) -> Response:
+        with self._lock:
+            self._stats[outcome] = self._stats.get(outcome, 0) + 1
+            self._stats['requests'] = self._stats.get('requests', 0) + 1
+        return status, headers, body
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取请求统计"""
+        with self._lock:
+            stats = dict(self._stats)
+        stats.update(mode=self.mode, interactions=len(self.cassette))
+        return stats
+
+
+class FakeExchangeServer:
+    """在后台线程中运行的模拟交易所 HTTP 服务"""
+
+    def __init__(self, exchange: FakeExchange, host: str = '127.0.0.1', port: int = 0):
+        self.exchange = exchange
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def do_GET(self):
+                parts = urlsplit(self.path)
+                status, headers, body = exchange.handle(parts.path, dict(parse_qsl(parts.query)))
+                payload = json.dumps(body).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        """服务地址（用作 UPSTREAM_BASE_URL）"""
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self) -> str:
+        """
+        启动服务
+
+        Returns:
+            服务地址
+        """
+        self._thread = threading.Thread(target=self._server.serve_forever,
+                                        name='FakeExchange', daemon=True)
+        self._thread.start()
+        return self.url
+
+    def stop(self) -> None:
+        """停止服务，录制模式下保存 cassette"""
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        if self.exchange.mode == 'record' and self.exchange.cassette.path:
+            self.exchange.cassette.save()
+
+
+def synthesize_cassette(prices: ScriptedPriceService, path: Optional[str] = None,
+                        intervals: Iterable[str] = ('1m', '5m', '15m', '1h', '4h', '1d'),
+                        quotes: Iterable[str] = ('usd', 'eur', 'cny'), candles: int = 500) -> Cassette:
+    """
+    用脚本价格路径生成 cassette（无法访问网络、没有录制文件时使用）
+
+    Args:
+        prices: 脚本价格源，使用其当前位置的价格和之前的历史
+        path: cassette 文件路径
+        intervals: 生成的K线周期
+        quotes: CoinGecko 报价生成的计价货币
+        candles: 每个周期的K线数量
+
+    Returns:
+        Cassette 实例
+    """
+    cassette = Cassette(path)
+    symbols = sorted(set(prices.config.CURRENCY_SYMBOLS.values()))
+    now_ms = int(time.time() * 1000)
+
+    tickers = []
+    for symbol in symbols:
+        price = f"{prices.price(symbol):.10g}"
+        tickers.append({'symbol': f'{symbol}USDT', 'price': price})
+        cassette.record('binance', 'api/v3/ticker/price', {'symbol': f'{symbol}USDT'}, 200,
+                        {'symbol': f'{symbol}USDT', 'price': price})
+
+        rows = prices.get_klines(symbol, '1m', now_ms - min(candles, HISTORY_CANDLES) * 60000)
+        for interval in intervals:
+            interval_ms = parse_duration(interval) * 1000
+            cassette.record('binance', 'api/v3/klines', {'symbol': f'{symbol}USDT', 'interval': interval},
+                            200, [_binance_candle(row, index, interval_ms) for index, row in
+                                  enumerate(rows[:, 1:], start=-len(rows))])
+
+    cassette.record('binance', 'api/v3/ticker/price', {}, 200, tickers)
+    cassette.record('binance', 'api/v3/exchangeInfo', {}, 200, {
+        'timezone': 'UTC',
+        'serverTime': now_ms,
+        'symbols': [{'symbol': f'{symbol}USDT', 'status': 'TRADING', 'baseAsset': symbol,
+                     'quoteAsset': 'USDT'} for symbol in symbols]
+    })
+
+    rates = {currency.upper(): rate for currency, rate in FIAT_RATES.items() if currency != 'usdt'}
+    cassette.record('exchangerate', 'v4/latest/USD', {}, 200, {'base': 'USD', 'rates': rates})
+
+    for currency in prices.config.SUPPORTED_CURRENCIES:
+        for quote in quotes:
+            price = prices.get_current_price(currency, quote)
+            if price is not None:
+                cassette.record('coingecko', 'api/v3/simple/price',
+                                {'ids': currency, 'vs_currencies': quote}, 200, {currency: {quote: price}})
+    return cassette
+
+
+def _binance_candle(row, index: int, interval_ms: int) -> list:
+    """按币安K线格式生成一行（时间在回放时平移，这里以0为最后一根）"""
+    high, low, close = (float(value) for value in row)
+    open_time = index * interval_ms + interval_ms
+    return [open_time, f'{close:.10g}', f'{high:.10g}', f'{low:.10g}', f'{close:.10g}', '0',
+            open_time + interval_ms - 1, '0', 0, '0', '0', '0']
@@ -0,0 +1,279 @@
+# src/services/leader_election.py
+"""
+监控服务选主
+"""
+import logging
+import os
+import socket
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+from sqlalchemy import case, or_, update
+from sqlalchemy.exc import IntegrityError
+from ..models import db, MonitorLease
+
+try:
+    import fcntl
+except ImportError:  # Windows 不支持 fcntl，只能使用数据库租约
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+
+def default_identity() -> str:
+    """当前进程的标识（主机名:进程ID）"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class LeaderElection:
+    """
+    选主基类
+
+    监控服务每隔一段时间调用 acquire 竞选或续约，只有领导者执行提醒评估。
+    未覆盖的实现即"不选主"：每个进程都认为自己是领导者，适用于单进程部署。
+    """
+
+    backend = 'none'
+
+    def __init__(self, identity: Optional[str] = None):
+        self.identity = identity or default_identity()
+        self._leading = False
+
+    @property
+    def is_leader(self) -> bool:
+        """当前进程是否为领导者"""
+        return self._leading
+
+    def acquire(self) -> bool:
+        """
+        竞选或续约
+
+        Returns:
+            调用后是否为领导者
+        """
+        self._leading = True
+        return True
+
+    def release(self) -> None:
+        """主动放弃领导者身份"""
+        self._leading = False
+
+    def current_leader(self) -> Optional[Dict[str, Any]]:
+        """获取当前领导者信息"""
+        return {'holder': self.identity} if self._leading else None
+
+    def get_status(self) -> Dict[str, Any]:
+        """
+        获取选主状态
+
+        Returns:
+            状态信息字典
+        """
+        try:
+            leader = self.current_leader()
+        except Exception as e:
+            logger.warning(f"读取当前领导者时发生错误: {e}")
+            leader = None
+
+        return {
+            'backend': self.backend,
+            'identity': self.identity,
+            'is_leader': self.is_leader,
+            'leader': leader
+        }
+
+
+class DatabaseLeaderElection(LeaderElection):
+    """
+    基于数据库租约行的选主，适用于多主机部署
+
+    领导者每隔心跳间隔续约一次；租约过期后其他进程通过一条条件 UPDATE
+    原子地接管，并递增任期。本地判断额外以单调时钟计算有效期，数据库不可达
+    时领导者会在租约到期前自行退位，避免出现两个领导者。
+
+    租约到期时间使用各主机的时钟，租约有效期应明显大于主机间的时钟偏差。
+    """
+
+    backend = 'database'
+
+    def __init__(self, name: str, ttl: float, identity: Optional[str] = None):
+        super().__init__(identity)
+        self.name = name
+        self.ttl = ttl
+        self._valid_until = 0.0
+
+    @property
+    def is_leader(self) -> bool:
+        return self._leading and time.monotonic() < self._valid_until
+
+    def acquire(self) -> bool:
+        started = time.monotonic()
+        now = datetime.utcnow()
+        expires_at = now + timedelta(seconds=self.ttl)
+        is_holder = MonitorLease.holder == self.identity
+
+        try:
+            # 续约自己的租约，或接管已过期的租约
+            result = db.session.execute(
+                update(MonitorLease).where(
+                    MonitorLease.name == self.name,
+                    or_(is_holder, MonitorLease.expires_at <= now)
+                ).values(
+                    holder=self.identity,
+                    term=case((is_holder, MonitorLease.term), else_=MonitorLease.term + 1),
+                    acquired_at=case((is_holder, MonitorLease.acquired_at), else_=now),
+                    heartbeat_at=now,
+                    expires_at=expires_at
+                ),
+                execution_options={'synchronize_session': False}
+            )
+            acquired = result.rowcount == 1
+
+            if not acquired and db.session.get(MonitorLease, self.name) is None:
+                db.session.add(MonitorLease(
+                    name=self.name, holder=self.identity, term=1,
+                    acquired_at=now, heartbeat_at=now, expires_at=expires_at
+                ))
+                db.session.flush()
+                acquired = True
+
+            db.session.commit()
+
+        except IntegrityError:
+            # 其他进程同时创建了租约
+            db.session.rollback()
+            acquired = False
+        except Exception as e:
+            logger.error(f"竞选监控租约时发生错误: {e}")
+            db.session.rollback()
+            # 保持原状态，由本地有效期决定何时退位
+            return self.is_leader
+
+        self._leading = acquired
+        self._valid_until = started + self.ttl if acquired else 0.0
+        return acquired
+
+    def release(self) -> None:
+        was_leading = self._leading
+        self._leading = False
+        self._valid_until = 0.0
+        if not was_leading:
+            return
+
+        try:
+            db.session.execute(
+                update(MonitorLease).where(
+                    MonitorLease.name == self.name,
+                    MonitorLease.holder == self.identity
+                ).values(expires_at=datetime.utcnow()),
+                execution_options={'synchronize_session': False}
+            )
+            db.session.commit()
+        except Exception as e:
+            logger.error(f"释放监控租约时发生错误: {e}")
+            db.session.rollback()
+
+    def current_leader(self) -> Optional[Dict[str, Any]]:
+        lease = db.session.get(MonitorLease, self.name, populate_existing=True)
+        if lease is None or lease.is_expired:
+            return None
+        return lease.to_dict()
+
+
+class FileLeaderElection(LeaderElection):
+    """
+    基于 flock 文件锁的选主，适用于单机多进程部署
+
+    持有锁的进程即领导者，进程退出时操作系统自动释放锁，其他进程在下一次
+    竞选时即可接管。锁文件中记录持有者标识，供其他进程查询。
+    """
+
+    backend = 'file'
+
+    def __init__(self, path: str, identity: Optional[str] = None):
+        super().__init__(identity)
+        if fcntl is None:
+            raise RuntimeError("当前平台不支持文件锁选主，请使用数据库租约")
+        self.path = path
+        self._file = None
+        self._acquired_at: Optional[datetime] = None
+
+    def acquire(self) -> bool:
+        if self._file is not None:
+            return True
+
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+
+            lock_file = open(self.path, 'a+')
+            try:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                lock_file.close()
+                return False
+
+            self._acquired_at = datetime.utcnow()
+            lock_file.seek(0)
+            lock_file.truncate()
+            lock_file.write(f"{self.identity}\n{self._acquired_at.isoformat()}\n")
+            lock_file.flush()
+
+            self._file = lock_file
+            self._leading = True
+            return True
+
+        except Exception as e:
+            logger.error(f"获取监控文件锁时发生错误: {e}")
+            return False
+
+    def release(self) -> None:
+        self._leading = False
+        if self._file is None:
+            return
+
+        try:
+            self._file.seek(0)
+            self._file.truncate()
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+        except Exception as e:
+            logger.error(f"释放监控文件锁时发生错误: {e}")
+        finally:
+            self._file.close()
+            self._file = None
+
+    def current_leader(self) -> Optional[Dict[str, Any]]:
+        if self._file is not None:
+            return {'holder': self.identity, 'acquired_at': self._acquired_at.isoformat()}
+
+        try:
+            with open(self.path) as f:
+                lines = f.read().splitlines()
+        except FileNotFoundError:
+            return None
+
+        if not lines or not lines[0]:
+            return None
+        return {'holder': lines[0], 'acquired_at': lines[1] if len(lines) > 1 else None}
+
+
+def create_leader_election(config) -> LeaderElection:
+    """
+    根据配置创建选主实现
+
+    Args:
+        config: 配置对象
+
+    Returns:
+        选主实例
+    """
+    backend = (config.MONITOR_LEADER_BACKEND or 'none').lower()
+
+    if backend == 'database':
+        return DatabaseLeaderElection(config.MONITOR_LEASE_NAME, config.MONITOR_LEASE_TTL)
+    if backend == 'file':
+        return FileLeaderElection(config.MONITOR_LOCK_FILE)
+    if backend != 'none':
+        logger.warning(f"未知的选主方式: {backend}，不进行选主")
+    return LeaderElection()
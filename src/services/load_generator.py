@@ -0,0 +1,231 @@
+# src/services/load_generator.py
+"""
+合成提醒负载生成器
+
+用于基准测试：按接近真实的货币对分布生成大量提醒写入临时数据库，并提供
+按脚本价格路径报价的本地价格源和不发送任何请求的通知服务。
+"""
+import logging
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional
+import numpy as np
+from sqlalchemy import insert
+from ..models import db, Alert
+from ..config import get_config
+from .notification_service import NotificationService
+from .price_service import PriceService
+from .rule_engine import parse_duration
+
+logger = logging.getLogger(__name__)
+
+# 计价货币分布（法币对 USD 的汇率；加密货币计价按路径之比换算）
+QUOTE_WEIGHTS = {'usd': 0.6, 'usdt': 0.15, 'eur': 0.1, 'bitcoin': 0.08, 'ethereum': 0.04, 'cny': 0.03}
+FIAT_RATES = {'usd': 1.0, 'usdt': 1.0, 'eur': 0.92, 'cny': 7.2}
+
+# 常见货币的起始价格（USD），其余货币在 0.05 ~ 500 之间按对数均匀分布
+ANCHOR_PRICES = {'BTC': 60000.0, 'ETH': 3000.0, 'BNB': 550.0, 'SOL': 150.0, 'XRP': 0.55,
+                 'ADA': 0.45, 'DOGE': 0.12, 'DOT': 7.0, 'LTC': 80.0, 'LINK': 15.0}
+
+# 规则提醒模板
+RULE_TEMPLATES = (
+    'change(1h) >= 3',
+    'change(24h) <= -5',
+    'price > sma(4h)',
+    'price crosses_above sma(30m)',
+    'price crosses_below sma(1h) and change(1h) < -1',
+)
+
+# 路径之前预先生成的历史K线数量（规则提醒的回看窗口）
+HISTORY_CANDLES = 1000
+
+
+class ScriptedPriceService(PriceService):
+    """
+    按脚本价格路径报价的本地价格源
+
+    每个币种的价格是预先生成的几何随机游走，step 决定当前所处的位置；
+    K线由路径之前的历史和已经走过的路径组成，不访问任何网络接口。
+    """
+
+    def __init__(self, steps: int, volatility: float = 0.002, seed: int = 0):
+        super().__init__()
+        self.step = 0
+        self.steps = steps
+        self.volatility = volatility
+        self.calls = 0
+
+        rng = np.random.default_rng(seed)
+        self._series: Dict[str, np.ndarray] = {}
+        for symbol in sorted(set(self.config.CURRENCY_SYMBOLS.values())):
+            start = ANCHOR_PRICES.get(symbol) or float(np.exp(rng.uniform(np.log(0.05), np.log(500))))
+            returns = rng.normal(0.0, volatility, HISTORY_CANDLES + steps)
+            # 历史在起点之前结束，路径从起点开始
+            log_prices = np.concatenate((np.cumsum(-returns[:HISTORY_CANDLES][::-1])[::-1],
+                                         [0.0], np.cumsum(returns[HISTORY_CANDLES:])))
+            self._series[symbol] = start * np.exp(log_prices)
+
+    def advance(self) -> None:
+        """前进一步，之后的报价和K线使用路径上的下一个价格"""
+        self.step = min(self.step + 1, self.steps)
+
+    def price(self, currency: str) -> Optional[float]:
+        """某个币种当前的 USD 价格，未知货币返回None"""
+        symbol = self.kline_symbol(currency)
+        if symbol is None:
+            return None
+        return float(self._series[symbol][HISTORY_CANDLES + self.step])
+
+    def get_current_price(self, base_currency: str, quote_currency: str) -> Optional[float]:
+        self.calls += 1
+        base = self.price(base_currency)
+        if base is None:
+            return None
+
+        quote = quote_currency.lower()
+        if quote in FIAT_RATES:
+            return base * FIAT_RATES[quote]
+        quote_price = self.price(quote)
+        return base / quote_price if quote_price else None
+
+    def get_klines(self, symbol: str, interval: str, start_ms: int) -> Optional[np.ndarray]:
+        self.calls += 1
+        series = self._series.get(symbol)
+        if series is None:
+            return None
+
+        interval_ms = parse_duration(interval) * 1000
+        last_open = int(time.time() * 1000) // interval_ms * interval_ms
+        count = max(1, min(1000, (last_open - int(start_ms)) // interval_ms + 1))
+
+        # 路径上的每一步对应一根K线
+        closes = series[max(0, HISTORY_CANDLES + self.step + 1 - count):HISTORY_CANDLES + self.step + 1]
+        wick = self.volatility / 2
+        candles = np.empty((len(closes), 4))
+        candles[:, 0] = last_open - interval_ms * np.arange(len(closes))[::-1]
+        candles[:, 1] = closes * (1 + wick)
+        candles[:, 2] = closes * (1 - wick)
+        candles[:, 3] = closes
+        return candles
+
+    def validate_currency_pair(self, base_currency: str, quote_currency: str) -> bool:
+        return self.get_current_price(base_currency, quote_currency) is not None
+
+
+class NullNotificationService(NotificationService):
+    """只计数、不发送任何请求的通知服务"""
+
+    def __init__(self):
+        super().__init__()
+        self.sent = 0
+
+    def send_discord_payload(self, webhook_url: str, payload: Dict[str, Any]) -> bool:
+        self.sent += 1
+        return True
+
+    def validate_webhook_url(self, webhook_url: str) -> bool:
+        return True
+
+
+class LoadGenerator:
+    """
+    合成提醒生成器
+
+    基础货币按 Zipf 分布（少数热门货币占大部分提醒），计价货币按
+    QUOTE_WEIGHTS 分布；阈值提醒的目标价格以起始价格为中心按对数正态
+    分布，条件方向保证创建时不会立即触发。
+    """
+
+    def __init__(self, prices: ScriptedPriceService, bases: int = 40,
+                 rule_ratio: float = 0.02, spread: float = 0.03, users: int = 2000,
+                 seed: int = 0):
+        self.config = get_config()
+        self.prices = prices
+        self.rule_ratio = rule_ratio
+        self.spread = spread
+        self.users = max(1, users)
+        self.rng = np.random.default_rng(seed)
+
+        self.bases = list(self.config.SUPPORTED_CURRENCIES[:max(1, bases)])
+        weights = 1.0 / np.arange(1, len(self.bases) + 1) ** 1.1
+        self.base_weights = weights / weights.sum()
+
+        self.quotes = list(QUOTE_WEIGHTS)
+        quote_weights = np.array([QUOTE_WEIGHTS[quote] for quote in self.quotes])
+        self.quote_weights = quote_weights / quote_weights.sum()
+
+    def generate(self, count: int, chunk: int = 5000) -> Iterator[List[Dict[str, Any]]]:
+        """
+        分批生成提醒行
+
+        Args:
+            count: 提醒总数
+            chunk: 每批的行数
+
+        Yields:
+            可直接插入 alerts 表的行字典列表
+        """
+        now = datetime.utcnow()
+        generated = 0
+        while generated < count:
+            size = min(chunk, count - generated)
+            bases = self.rng.choice(len(self.bases), size, p=self.base_weights)
+            quotes = self.rng.choice(len(self.quotes), size, p=self.quote_weights)
+            offsets = self.rng.normal(0.0, self.spread, size)
+            is_rule = self.rng.random(size) < self.rule_ratio
+            templates = self.rng.integers(0, len(RULE_TEMPLATES), size)
+            users = self.rng.integers(0, self.users, size)
+
+            rows = []
+            for i in range(size):
+                base = self.bases[bases[i]]
+                quote = self.quotes[quotes[i]]
+                if quote == base:
+                    quote = 'usd'
+                row = {
+                    'base_currency': base,
+                    'quote_currency': quote,
+                    'discord_webhook_url': f'https://discord.com/api/webhooks/{users[i]}/benchmark',
+                    'user_identifier': f'bench-{users[i]}',
+                    'is_active': True,
+                    'is_triggered': False,
+                    'created_at': now,
+                    'updated_at': now,
+                    'trigger_count': 0
+                }
+                if is_rule[i]:
+                    row.update(condition_type='rule', target_price=0.0,
+                               rule=RULE_TEMPLATES[templates[i]])
+                else:
+                    price = self.prices.get_current_price(base, quote)
+                    row.update(condition_type='above' if offsets[i] > 0 else 'below',
+                               target_price=float(price * np.exp(offsets[i])), rule=None)
+                rows.append(row)
+
+            generated += size
+            yield rows
+
+    def populate(self, count: int, chunk: int = 5000) -> int:
+        """
+        生成提醒并分批写入当前应用的数据库
+
+        Args:
+            count: 提醒总数
+            chunk: 每个事务写入的行数
+
+        Returns:
+            写入的提醒数
+        """
+        written = 0
+        try:
+            for rows in self.generate(count, chunk):
+                db.session.execute(insert(Alert), rows)
+                db.session.commit()
+                written += len(rows)
+        except Exception as e:
+            logger.error(f"写入合成提醒时发生错误: {e}")
+            db.session.rollback()
+            raise
+
+        logger.info(f"已写入 {written} 个合成提醒")
+        return written
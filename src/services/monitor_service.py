@@ -5,24 +5,64 @@
 import threading
 import time
 import logging
-from typing import Optional
+from contextlib import nullcontext
+from typing import List, Optional
 from .alert_service import AlertService
+from .notification_dispatcher import NotificationDispatcher
+from .leader_election import LeaderElection, create_leader_election
+from .shard_pool import ShardPool
 from ..config import get_config
+from ..models import db, CheckRequest
+from ..utils.metrics import ACTIVE_ALERTS
 
 logger = logging.getLogger(__name__)
 
 
 class MonitorService:
-    """价格监控服务类"""
+    """
+    价格监控服务类
     
-    def __init__(self):
+    每个进程都可以启动监控服务，但同一时间只有选主产生的领导者执行提醒评估，
+    其他进程每隔心跳间隔竞选一次，领导者退出或失联后接管。
+    
+    领导者的租约由独立的心跳线程续约，单轮检查中长时间阻塞的上游请求不会让租约过期；
+    写入触发状态和投递通知前都会再次确认仍持有租约。
+    
+    API 请求的强制检查写入 check_requests 表，任何进程都可以请求，由领导者的监控线程
+    领取并在下一轮执行，结果写回表中。
+    """
+    
+    def __init__(self, app=None, leader: Optional[LeaderElection] = None,
+                 dispatcher: Optional[NotificationDispatcher] = None):
+        self.app = app
         self.config = get_config()
-        self.alert_service = AlertService()
+        self.dispatcher = dispatcher or NotificationDispatcher()
+        self.alert_service = AlertService(dispatcher=self.dispatcher)
+        self.leader = leader or create_leader_election(self.config)
         self.check_interval = self.config.PRICE_CHECK_INTERVAL
+        self.shard_count = self.config.MONITOR_SHARDS
+        
+        self.shards: Optional[ShardPool] = None
         
+        # 抓取指标时按货币对统计提醒簿中的活跃提醒（只有领导者的提醒簿已加载）
+        book = self.alert_service.alert_book
+        ACTIVE_ALERTS.set_function(lambda: {pair: book.count(*pair) for pair in book.pairs()})
+        
+        self._leading = False
+        self._last_heartbeat = 0.0
         self._running = False
         self._thread: Optional[threading.Thread] = None
         self._stop_event = threading.Event()
+        
+        # 续约由监控线程和心跳线程共同完成，同一时间只有一个线程竞选
+        self._lease_lock = threading.Lock()
+        self._heartbeat_thread: Optional[threading.Thread] = None
+        self._heartbeat_stop = threading.Event()
+        self.alert_service.fence = self._holds_lease
+        
+        # 本进程收到强制检查请求时直接唤醒监控线程，其他进程的请求按轮询间隔发现
+        self._check_requested = threading.Event()
+        self._last_request_poll = 0.0
     
     def start(self) -> bool:
         """
@@ -38,6 +78,8 @@ class MonitorService:
         try:
             self._running = True
             self._stop_event.clear()
+            self.dispatcher.start()
+            self._start_heartbeat()
             
             # 创建并启动监控线程
             self._thread = threading.Thread(
@@ -80,6 +122,17 @@ class MonitorService:
                 if self._thread.is_alive():
                     logger.warning("监控线程未能在10秒内停止")
                     return False
+            self._stop_heartbeat()
+            
+            # 发送完剩余通知并写入结果
+            self.dispatcher.stop()
+            self._flush_notifications()
+            self._stop_shards()
+            
+            # 主动释放租约，其他进程无需等待租约过期即可接管
+            with self._app_context():
+                self.leader.release()
+            self._leading = False
             
             logger.info("价格监控服务已停止")
             return True
@@ -108,7 +161,13 @@ class MonitorService:
             'running': self.is_running(),
             'check_interval': self.check_interval,
             'thread_alive': self._thread.is_alive() if self._thread else False,
-            'alert_statistics': self.alert_service.get_alert_statistics()
+            'role': 'leader' if self._leading else 'follower',
+            'leader': self.leader.get_status(),
+            'alert_statistics': self.alert_service.get_alert_statistics(),
+            'notifications': self.dispatcher.get_stats(),
+            'outbox': self.alert_service.outbox.get_stats(),
+            'schedule': self.alert_service.scheduler.get_stats() if self.alert_service.scheduler else None,
+            'shards': self.shards.get_stats() if self.shards else None
         }
     
     def _monitor_loop(self):
@@ -117,18 +176,37 @@ class MonitorService:
         
         while self._running and not self._stop_event.is_set():
             try:
-                # 检查所有提醒
-                stats = self.alert_service.check_all_alerts()
+                # 非领导者不执行评估，每隔心跳间隔竞选一次
+                if not self._ensure_leadership():
+                    if self._stop_event.wait(timeout=self.config.MONITOR_LEASE_HEARTBEAT):
+                        break
+                    continue
+                
+                # 检查所有提醒（有 API 请求的强制检查时忽略调度）
+                request_ids = self._claim_check_requests()
+                stats = None
+                error = None
+                try:
+                    with self._app_context():
+                        stats = self.alert_service.check_all_alerts(force=bool(request_ids))
+                except Exception as e:
+                    error = str(e)
+                    raise
+                finally:
+                    self._complete_check_requests(request_ids, stats, error)
+                self._check_overrun()
                 
                 if stats['checked'] > 0:
                     logger.debug(
                         f"检查完成 - 总数: {stats['checked']}, "
+                        f"延后: {stats['deferred']}, "
                         f"触发: {stats['triggered']}, "
+                        f"入队: {stats['queued']}, "
                         f"错误: {stats['errors']}"
                     )
                 
                 # 等待下一次检查
-                if self._stop_event.wait(timeout=self.check_interval):
+                if self._wait_next_check():
                     # 收到停止信号
                     break
                     
@@ -141,6 +219,305 @@ class MonitorService:
         
         logger.info("价格监控循环已结束")
     
+    def _ensure_leadership(self) -> bool:
+        """
+        竞选或续约领导者身份
+        
+        成为领导者时完整加载提醒簿，并重放尚未投递的通知（包括前任领导者
+        留下的）；失去领导者身份时停止评估，重新当选后再次完整加载。
+        
+        Returns:
+            是否为领导者
+        """
+        was_leading = self._leading
+        
+        with self._app_context():
+            with self._lease_lock:
+                leading = self.leader.acquire()
+                self._last_heartbeat = time.monotonic()
+            
+            if leading and not was_leading:
+                logger.info(f"成为监控领导者: {self.leader.identity}")
+                self._start_shards()
+                self.alert_service.alert_book.load()
+                # 前任领导者可能仍在投递最近到期的通知，租约有效期之后再重放这些通知
+                self.alert_service.outbox.replay(force=True, grace=self.config.MONITOR_LEASE_TTL)
+                self._requeue_check_requests()
+        
+        if was_leading and not leading:
+            logger.warning(f"失去监控领导者身份: {self.leader.identity}")
+        
+        self._leading = leading
+        return leading
+    
+    def _holds_lease(self) -> bool:
+        """本进程当前是否仍持有监控租约（按本地单调时钟判断，不访问数据库）"""
+        return self._leading and self.leader.is_leader
+    
+    def _start_heartbeat(self) -> None:
+        """启动续约心跳线程"""
+        if self._heartbeat_thread and self._heartbeat_thread.is_alive():
+            return
+        
+        self._heartbeat_stop.clear()
+        self._heartbeat_thread = threading.Thread(
+            target=self._heartbeat_loop,
+            name="MonitorLeaseHeartbeat",
+            daemon=True
+        )
+        self._heartbeat_thread.start()
+    
+    def _stop_heartbeat(self) -> None:
+        """停止续约心跳线程"""
+        self._heartbeat_stop.set()
+        if self._heartbeat_thread:
+            self._heartbeat_thread.join(timeout=self.config.MONITOR_LEASE_HEARTBEAT + 1)
+            self._heartbeat_thread = None
+    
+    def _heartbeat_loop(self):
+        """
+        领导者每隔心跳间隔续约一次，与监控线程是否在执行检查无关
+        
+        续约失败时只标记为非领导者，正在执行的检查在写入和投递前会发现并放弃；
+        重新当选由监控线程完成（完整加载提醒簿并重放通知）。
+        """
+        while not self._heartbeat_stop.wait(timeout=1):
+            if not self._leading or \
+                    time.monotonic() - self._last_heartbeat < self.config.MONITOR_LEASE_HEARTBEAT:
+                continue
+            
+            try:
+                with self._app_context():
+                    with self._lease_lock:
+                        leading = self.leader.acquire()
+                        self._last_heartbeat = time.monotonic()
+            except Exception as e:
+                logger.error(f"续约监控租约时发生错误: {e}")
+                continue
+            
+            if not leading and self._leading:
+                logger.warning(f"失去监控领导者身份: {self.leader.identity}")
+                self._leading = False
+    
+    def request_check(self, timeout: Optional[float] = None) -> CheckRequest:
+        """
+        请求领导者执行一次强制检查并等待结果（供 API 使用，需要应用上下文）
+        
+        任何进程都可以调用：请求写入数据库，由领导者（可能是其他进程或独立监控进程）
+        的监控线程在下一轮执行，不会与定时检查并发。
+        
+        Args:
+            timeout: 最长等待时间（秒），默认 MONITOR_FORCE_CHECK_TIMEOUT
+            
+        Returns:
+            请求记录，超时仍未完成时状态为 pending 或 running，可稍后按ID查询
+        """
+        timeout = self.config.MONITOR_FORCE_CHECK_TIMEOUT if timeout is None else timeout
+        
+        check_request = CheckRequest()
+        db.session.add(check_request)
+        db.session.commit()
+        
+        # 本进程是领导者时立即开始，不必等待轮询
+        self._check_requested.set()
+        
+        deadline = time.monotonic() + timeout
+        while not check_request.finished:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            time.sleep(min(remaining, self.config.MONITOR_CHECK_REQUEST_POLL))
+            db.session.refresh(check_request)
+        return check_request
+    
+    def _has_check_request(self) -> bool:
+        """是否有待执行的强制检查请求（查询数据库的间隔不短于 MONITOR_CHECK_REQUEST_POLL）"""
+        if self._check_requested.is_set():
+            return True
+        
+        now = time.monotonic()
+        if now - self._last_request_poll < self.config.MONITOR_CHECK_REQUEST_POLL:
+            return False
+        self._last_request_poll = now
+        
+        try:
+            with self._app_context():
+                return db.session.query(CheckRequest.id).filter(
+                    CheckRequest.status == CheckRequest.STATUS_PENDING
+                ).first() is not None
+        except Exception as e:
+            logger.error(f"查询强制检查请求时发生错误: {e}")
+            return False
+    
+    def _claim_check_requests(self) -> List[int]:
+        """领取待执行的强制检查请求"""
+        self._check_requested.clear()
+        with self._app_context():
+            try:
+                request_ids = CheckRequest.claim_pending(self.leader.identity)
+                db.session.commit()
+            except Exception as e:
+                logger.error(f"领取强制检查请求时发生错误: {e}")
+                db.session.rollback()
+                return []
+        
+        if request_ids:
+            logger.info(f"执行强制检查，共 {len(request_ids)} 个请求")
+        return request_ids
+    
+    def _complete_check_requests(self, request_ids: List[int], stats: Optional[dict],
+                                 error: Optional[str]) -> None:
+        """写入强制检查的结果，并清理过期的请求"""
+        if not request_ids:
+            return
+        
+        with self._app_context():
+            try:
+                CheckRequest.complete(request_ids, stats, error)
+                CheckRequest.prune(self.config.MONITOR_CHECK_REQUEST_RETENTION_HOURS)
+                db.session.commit()
+            except Exception as e:
+                logger.error(f"写入强制检查结果时发生错误: {e}")
+                db.session.rollback()
+    
+    def _requeue_check_requests(self) -> None:
+        """接管时重新执行前任领导者领取但没有完成的强制检查请求"""
+        try:
+            requeued = CheckRequest.requeue_running()
+            db.session.commit()
+            if requeued:
+                logger.info(f"重新执行前任领导者未完成的 {requeued} 个强制检查请求")
+        except Exception as e:
+            logger.error(f"重置强制检查请求时发生错误: {e}")
+            db.session.rollback()
+    
+    def _check_overrun(self) -> None:
+        """本轮检查耗时超过检查间隔时输出警告，并附上各阶段耗时"""
+        trace = self.alert_service.ticks.last()
+        if trace is None or trace.duration is None:
+            return
+        
+        trace.interval = self.check_interval
+        if trace.duration <= self.check_interval:
+            return
+        
+        trace.overrun = True
+        phases = ', '.join(f"{name}={seconds:.2f}s" for name, seconds in
+                           sorted(trace.phases.items(), key=lambda item: -item[1]))
+        logger.warning(
+            f"第 {trace.sequence} 轮检查耗时 {trace.duration:.2f} 秒，超过检查间隔 "
+            f"{self.check_interval} 秒 - 阶段: {phases}; 上游请求: {trace.upstream_calls}, "
+            f"评估: {trace.stats.get('checked', 0)}, 触发: {trace.stats.get('triggered', 0)}"
+        )
+    
+    def _start_shards(self) -> None:
+        """按配置启动分片评估进程池（在加载提醒簿之前，以便分片收到完整加载）"""
+        if self.shards is not None or self.shard_count <= 0:
+            return
+        
+        try:
+            shards = ShardPool(self.shard_count,
+                               start_method=self.config.MONITOR_SHARD_START_METHOD,
+                               timeout=self.config.MONITOR_SHARD_TIMEOUT)
+            shards.start(self.alert_service.alert_book)
+        except Exception as e:
+            logger.error(f"启动分片评估进程池失败，改为在监控线程内评估: {e}")
+            return
+        
+        self.shards = shards
+        self.alert_service.shards = shards
+    
+    def _stop_shards(self) -> None:
+        """停止分片评估进程池"""
+        if self.shards is None:
+            return
+        
+        self.alert_service.shards = None
+        self.shards.stop()
+        self.shards = None
+    
+    def _wait_next_check(self) -> bool:
+        """
+        等待下一次检查，期间定期批量写入通知发送结果并续约
+        
+        Returns:
+            是否收到停止信号
+        """
+        deadline = time.monotonic() + self._next_check_delay()
+        
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            
+            if self._stop_event.wait(timeout=min(remaining, self.config.NOTIFICATION_FLUSH_INTERVAL)):
+                return True
+            
+            self._flush_notifications()
+            
+            # API 请求的强制检查立即开始
+            if self._has_check_request():
+                return False
+            
+            if time.monotonic() - self._last_heartbeat >= self.config.MONITOR_LEASE_HEARTBEAT:
+                if not self._ensure_leadership():
+                    return False
+    
+    def _next_check_delay(self) -> float:
+        """
+        距下一轮检查的秒数
+        
+        启用自适应调度时在最早到期的货币对到期时醒来，但不短于最短检查间隔，
+        也不长于 check_interval，以便及时同步新建的提醒。
+        
+        Returns:
+            等待的秒数
+        """
+        scheduler = self.alert_service.scheduler
+        if scheduler is None:
+            return self.check_interval
+        
+        next_due = scheduler.next_due_in()
+        if next_due is None:
+            return self.check_interval
+        return max(scheduler.floor, min(self.check_interval, next_due))
+    
+    def _flush_notifications(self) -> None:
+        """写入已完成的通知发送结果"""
+        if not self.dispatcher.has_results():
+            return
+        
+        try:
+            with self._app_context():
+                stats = self.alert_service.outbox.apply_results()
+            logger.debug(f"通知结果已写入 - 投递: {stats['delivered']}, 失败: {stats['failed']}")
+        except Exception as e:
+            logger.error(f"写入通知结果时发生错误: {e}")
+    
+    def run_once(self) -> Optional[dict]:
+        """
+        竞选后执行一轮检查，并等待本轮通知发送完成（用于单次运行）
+        
+        Returns:
+            检查结果统计，未当选领导者时返回None
+        """
+        if not self._ensure_leadership():
+            logger.info("其他进程正在执行监控，跳过本次检查")
+            return None
+        
+        self.dispatcher.start()
+        self._start_heartbeat()
+        try:
+            return self.force_check()
+        finally:
+            self._stop_heartbeat()
+            self.dispatcher.stop()
+            self._flush_notifications()
+            self._stop_shards()
+            with self._app_context():
+                self.leader.release()
+            self._leading = False
+    
     def force_check(self) -> dict:
         """
         强制执行一次检查
@@ -149,7 +526,12 @@ class MonitorService:
             检查结果统计
         """
         logger.info("执行强制检查")
-        return self.alert_service.check_all_alerts()
+        with self._app_context():
+            return self.alert_service.check_all_alerts(force=True)
+    
+    def _app_context(self):
+        """获取应用上下文（未绑定应用时使用空上下文）"""
+        return self.app.app_context() if self.app else nullcontext()
     
     def restart(self) -> bool:
         """
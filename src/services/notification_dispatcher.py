@@ -0,0 +1,474 @@
+# src/services/notification_dispatcher.py
+"""
+异步通知分发服务
+"""
+import heapq
+import logging
+import queue
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
+from ..config import get_config
+from .notification_service import NotificationService
+from .discord_rate_limiter import DiscordRateLimiter
+
+logger = logging.getLogger(__name__)
+
+# Discord 单条消息最多 10 个嵌入，所有嵌入合计最多 6000 个字符
+DISCORD_MAX_EMBEDS = 10
+DISCORD_MAX_EMBED_CHARS = 6000
+# 嵌入描述最多 4096 个字符，留出余量
+DIGEST_MAX_DESCRIPTION = 4000
+
+
+class NotificationJob:
+    """待发送的单个提醒通知"""
+
+    __slots__ = ('job_id', 'webhook_url', 'message', 'embed', 'summary', 'enqueued_at')
+
+    def __init__(self, job_id: int, webhook_url: str, message: str,
+                 embed: Optional[Dict[str, Any]] = None, summary: Optional[str] = None):
+        self.job_id = job_id
+        self.webhook_url = webhook_url
+        self.message = message
+        self.embed = embed
+        self.summary = summary or message
+        self.enqueued_at = time.monotonic()
+
+
+class NotificationMessage:
+    """一次 Webhook 请求：合并了同一 Webhook 的一个或多个提醒"""
+
+    __slots__ = ('webhook_url', 'payload', 'jobs', 'digest', 'attempts')
+
+    def __init__(self, webhook_url: str, payload: Dict[str, Any], jobs: List[NotificationJob],
+                 digest: bool = False):
+        self.webhook_url = webhook_url
+        self.payload = payload
+        self.jobs = jobs
+        self.digest = digest
+        self.attempts = 0
+
+
+def _embed_size(embed: Optional[Dict[str, Any]]) -> int:
+    """按 Discord 的计数规则估算嵌入的字符数"""
+    if not embed:
+        return 0
+    size = len(embed.get('title', '')) + len(embed.get('description', ''))
+    size += len(embed.get('footer', {}).get('text', ''))
+    for field in embed.get('fields', []):
+        size += len(field.get('name', '')) + len(field.get('value', ''))
+    return size
+
+
+class NotificationDispatcher:
+    """
+    通知分发器
+
+    触发的提醒按 Webhook 暂存，在合并窗口内到达同一 Webhook 的通知被打包成
+    尽量少的消息：不超过 10 个时每个提醒一个嵌入，超过时改用紧凑的汇总嵌入。
+    打包后的消息进入队列，由一组发送线程通过共享连接池的 HTTP 会话发送。
+
+    发送按 Webhook 的限流桶调度：根据 Discord 返回的 X-RateLimit-* 头和 429 的
+    retry_after 决定下一次可以发送的时间，等待中的消息进入延迟堆而不占用发送线程。
+
+    调用方只负责提交，不等待 Discord 的响应；每条消息的结果会记录到其中
+    每个通知上，由调用方批量取回并写入数据库。
+    """
+
+    # 保留用于统计的最近发送耗时数量
+    LATENCY_WINDOW = 200
+
+    def __init__(self, notification_service: Optional[NotificationService] = None,
+                 workers: Optional[int] = None, max_queue_size: Optional[int] = None,
+                 batch_window: Optional[float] = None):
+        self.config = get_config()
+        self.workers = workers or self.config.NOTIFICATION_WORKERS
+        self.notification_service = notification_service or NotificationService(pool_size=self.workers)
+        self.max_queue_size = max_queue_size or self.config.NOTIFICATION_QUEUE_SIZE
+        self.batch_window = self.config.NOTIFICATION_BATCH_WINDOW if batch_window is None else batch_window
+        self.max_attempts = self.config.NOTIFICATION_MAX_ATTEMPTS
+        self.rate_limiter = DiscordRateLimiter()
+
+        # 按 Webhook 暂存的通知及其第一条到达的时间
+        self._pending: Dict[str, List[NotificationJob]] = {}
+        self._pending_since: Dict[str, float] = {}
+        self._queue: 'queue.Queue[NotificationMessage]' = queue.Queue()
+        # 等待限流或退避的消息：(可发送时间, 序号, 消息)
+        self._delayed: List[Tuple[float, int, NotificationMessage]] = []
+        self._delay_seq = 0
+        self._results: List[Tuple[int, bool]] = []
+        self._threads: List[threading.Thread] = []
+        self._stop_event = threading.Event()
+        self._lock = threading.Lock()
+        self._pending_changed = threading.Condition(self._lock)
+
+        # 统计信息
+        self._outstanding = 0  # 已提交但尚未得到结果的通知数
+        self._sent = 0
+        self._failed = 0
+        self._dropped = 0
+        self._messages = 0
+        self._digests = 0
+        self._retries = 0
+        self._in_flight = 0
+        self._latencies = deque(maxlen=self.LATENCY_WINDOW)
+        self._queue_waits = deque(maxlen=self.LATENCY_WINDOW)
+
+    def start(self) -> bool:
+        """
+        启动合并线程和发送线程
+
+        Returns:
+            是否启动成功
+        """
+        if self.is_running():
+            return False
+
+        self._stop_event.clear()
+        self._threads = [
+            threading.Thread(target=self._worker_loop, name=f"NotificationSender-{i}", daemon=True)
+            for i in range(self.workers)
+        ]
+        self._threads.append(
+            threading.Thread(target=self._batch_loop, name="NotificationBatcher", daemon=True)
+        )
+        for thread in self._threads:
+            thread.start()
+
+        logger.info(f"通知分发器已启动，发送线程数: {self.workers}，合并窗口: {self.batch_window} 秒")
+        return True
+
+    def stop(self, timeout: float = 10) -> bool:
+        """
+        停止分发器，暂存的通知会立即打包并尽量发送完
+
+        Args:
+            timeout: 最长等待时间（秒）
+
+        Returns:
+            是否所有线程都已停止
+        """
+        with self._pending_changed:
+            self._stop_event.set()
+            self._pending_changed.notify_all()
+
+        deadline = time.monotonic() + timeout
+        for thread in self._threads:
+            thread.join(timeout=max(0, deadline - time.monotonic()))
+
+        alive = [thread for thread in self._threads if thread.is_alive()]
+        if alive:
+            logger.warning(f"{len(alive)} 个通知分发线程未能在 {timeout} 秒内停止")
+            return False
+
+        self._threads = []
+        logger.info("通知分发器已停止")
+        return True
+
+    def is_running(self) -> bool:
+        """检查分发线程是否在运行"""
+        return any(thread.is_alive() for thread in self._threads)
+
+    def submit(self, job_id: int, webhook_url: str, message: str,
+               embed: Optional[Dict[str, Any]] = None, summary: Optional[str] = None) -> bool:
+        """
+        提交通知（不阻塞）
+
+        Args:
+            job_id: 任务ID（由调用方定义，结果按该ID返回）
+            webhook_url: Discord Webhook URL
+            message: 消息内容
+            embed: 嵌入内容
+            summary: 汇总消息中使用的单行描述
+
+        Returns:
+            是否成功提交，待发送的通知已达上限时返回False
+        """
+        with self._pending_changed:
+            if self._outstanding >= self.max_queue_size:
+                self._dropped += 1
+                logger.warning(f"通知队列已满，任务 {job_id} 稍后重试")
+                return False
+
+            self._outstanding += 1
+            self._pending.setdefault(webhook_url, []).append(
+                NotificationJob(job_id, webhook_url, message, embed, summary)
+            )
+            self._pending_since.setdefault(webhook_url, time.monotonic())
+            self._pending_changed.notify()
+            return True
+
+    def has_results(self) -> bool:
+        """是否有待取回的发送结果"""
+        return bool(self._results)
+
+    def drain_results(self) -> List[Tuple[int, bool]]:
+        """
+        取回并清空已完成的发送结果
+
+        Returns:
+            (任务ID, 是否发送成功) 列表
+        """
+        with self._lock:
+            results, self._results = self._results, []
+        return results
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取分发统计
+
+        Returns:
+            统计信息字典
+        """
+        with self._lock:
+            latencies = list(self._latencies)
+            queue_waits = list(self._queue_waits)
+            return {
+                'workers': self.workers,
+                'running': self.is_running(),
+                'batch_window': self.batch_window,
+                'queue_depth': self._outstanding,
+                'queue_capacity': self.max_queue_size,
+                'pending_webhooks': len(self._pending),
+                'queued_messages': self._queue.qsize(),
+                'delayed_messages': len(self._delayed),
+                'in_flight': self._in_flight,
+                'sent': self._sent,
+                'failed': self._failed,
+                'dropped': self._dropped,
+                'messages': self._messages,
+                'digests': self._digests,
+                'retries': self._retries,
+                'rate_limit': self.rate_limiter.get_stats(),
+                'pending_results': len(self._results),
+                'send_latency_avg': sum(latencies) / len(latencies) if latencies else 0,
+                'send_latency_max': max(latencies) if latencies else 0,
+                'queue_wait_avg': sum(queue_waits) / len(queue_waits) if queue_waits else 0
+            }
+
+    def pack(self, webhook_url: str, jobs: List[NotificationJob]) -> List[NotificationMessage]:
+        """
+        将同一 Webhook 的通知打包为 Discord 消息
+
+        不超过 10 个通知时，每个通知一个嵌入，按 Discord 的嵌入数量和字符数
+        限制分组；超过 10 个时使用汇总嵌入，每条消息一个汇总嵌入。
+
+        Args:
+            webhook_url: Discord Webhook URL
+            jobs: 通知列表
+
+        Returns:
+            消息列表
+        """
+        if len(jobs) == 1:
+            job = jobs[0]
+            payload = {'content': job.message}
+            if job.embed:
+                payload['embeds'] = [job.embed]
+            return [NotificationMessage(webhook_url, payload, jobs)]
+
+        if len(jobs) <= DISCORD_MAX_EMBEDS:
+            return self._pack_embeds(webhook_url, jobs)
+
+        return self._pack_digest(webhook_url, jobs)
+
+    def _pack_embeds(self, webhook_url: str, jobs: List[NotificationJob]) -> List[NotificationMessage]:
+        """每个通知一个嵌入，按数量和字符数限制分组"""
+        groups: List[List[NotificationJob]] = []
+        current: List[NotificationJob] = []
+        current_size = 0
+
+        for job in jobs:
+            size = _embed_size(job.embed)
+            if current and (len(current) >= DISCORD_MAX_EMBEDS or
+                            current_size + size > DISCORD_MAX_EMBED_CHARS):
+                groups.append(current)
+                current, current_size = [], 0
+            current.append(job)
+            current_size += size
+        if current:
+            groups.append(current)
+
+        messages = []
+        for group in groups:
+            payload = {
+                'content': f"💰 **价格提醒** 💰 {len(group)} 个提醒触发",
+                'embeds': [job.embed for job in group if job.embed]
+            }
+            messages.append(NotificationMessage(webhook_url, payload, group))
+        return messages
+
+    def _pack_digest(self, webhook_url: str, jobs: List[NotificationJob]) -> List[NotificationMessage]:
+        """使用汇总嵌入，按描述长度分页"""
+        pages: List[List[NotificationJob]] = []
+        current: List[NotificationJob] = []
+        current_size = 0
+
+        for job in jobs:
+            size = len(job.summary) + 1
+            if current and current_size + size > DIGEST_MAX_DESCRIPTION:
+                pages.append(current)
+                current, current_size = [], 0
+            current.append(job)
+            current_size += size
+        if current:
+            pages.append(current)
+
+        messages = []
+        for page, group in enumerate(pages, start=1):
+            embed = self.notification_service.create_digest_embed(
+                [job.summary for job in group], len(jobs), page, len(pages)
+            )
+            payload = {
+                'content': f"💰 **价格提醒汇总** 💰 {len(jobs)} 个提醒触发",
+                'embeds': [embed]
+            }
+            messages.append(NotificationMessage(webhook_url, payload, group, digest=True))
+        return messages
+
+    def _batch_loop(self):
+        """合并线程：把合并窗口已结束的通知打包入队，并把到期的延迟重试放回队列"""
+        while True:
+            with self._pending_changed:
+                stopping = self._stop_event.is_set()
+                now = time.monotonic()
+
+                due = [url for url, since in self._pending_since.items()
+                       if stopping or now - since >= self.batch_window]
+                batches = [(url, self._pending.pop(url)) for url in due]
+                for url in due:
+                    self._pending_since.pop(url, None)
+
+                ready = []
+                while self._delayed and (stopping or self._delayed[0][0] <= now):
+                    ready.append(heapq.heappop(self._delayed)[2])
+
+                if not batches and not ready:
+                    if stopping:
+                        break
+                    # 等待新通知、最早的合并窗口结束或最早的延迟重试到期
+                    deadlines = [since + self.batch_window for since in self._pending_since.values()]
+                    if self._delayed:
+                        deadlines.append(self._delayed[0][0])
+                    timeout = max(0.0, min(deadlines) - now) if deadlines else 0.5
+                    self._pending_changed.wait(timeout=timeout)
+                    continue
+
+            for url, jobs in batches:
+                for message in self.pack(url, jobs):
+                    self._queue.put(message)
+
+            for message in ready:
+                if stopping:
+                    # 停止时不再等待限流，记为失败，由发件箱在下次运行时重放
+                    self._finish(message, False)
+                else:
+                    self._queue.put(message)
+
+    def _worker_loop(self):
+        """发送线程循环：停止后继续发送完队列中剩余的消息"""
+        while True:
+            try:
+                message = self._queue.get(timeout=0.5)
+            except queue.Empty:
+                if self._stop_event.is_set() and not self._batcher_alive():
+                    break
+                continue
+
+            try:
+                self._send(message)
+            finally:
+                self._queue.task_done()
+
+    def _batcher_alive(self) -> bool:
+        """合并线程是否仍在运行"""
+        return any(thread.name == "NotificationBatcher" and thread.is_alive()
+                   for thread in self._threads)
+
+    def _schedule(self, message: NotificationMessage, delay: float) -> None:
+        """延迟 delay 秒后重新发送消息"""
+        with self._pending_changed:
+            # 停止后合并线程可能已经退出，不再读取延迟堆，直接记为失败，由发件箱在下次运行时重放
+            stopping = self._stop_event.is_set()
+            if not stopping:
+                self._delay_seq += 1
+                heapq.heappush(self._delayed, (time.monotonic() + delay, self._delay_seq, message))
+                self._pending_changed.notify()
+
+        if stopping:
+            self._finish(message, False)
+
+    def _send(self, message: NotificationMessage) -> None:
+        """
+        发送一条消息
+
+        发送前向限流器预占该 Webhook 的额度，额度不足时延迟到重置时间；
+        429 按 retry_after 重试，5xx 和网络错误按带抖动的指数退避重试，
+        超过最大尝试次数或其他错误时把失败结果记录到其中的每个通知。
+        """
+        wait = self.rate_limiter.acquire(message.webhook_url)
+        if wait > 0:
+            self._schedule(message, wait)
+            return
+
+        now = time.monotonic()
+        with self._lock:
+            self._in_flight += 1
+            if message.attempts == 0:
+                for job in message.jobs:
+                    self._queue_waits.append(now - job.enqueued_at)
+
+        message.attempts += 1
+        start = time.perf_counter()
+        response = self.notification_service.post_discord_payload(
+            message.webhook_url, message.payload
+        )
+        elapsed = time.perf_counter() - start
+
+        with self._lock:
+            self._in_flight -= 1
+            self._latencies.append(elapsed)
+
+        status_code = response.status_code if response is not None else None
+        retry_after = None
+        if response is not None:
+            body = None
+            if status_code == 429:
+                try:
+                    body = response.json()
+                except ValueError:
+                    body = None
+            retry_after = self.rate_limiter.update(
+                message.webhook_url, status_code, response.headers, body
+            )
+
+        if response is not None and response.ok:
+            self._finish(message, True)
+            return
+
+        retryable = status_code is None or status_code == 429 or status_code >= 500
+        if retryable and message.attempts < self.max_attempts:
+            delay = retry_after if retry_after is not None else self.rate_limiter.backoff(message.attempts)
+            logger.warning(f"Webhook 发送失败（状态: {status_code}），{delay:.2f} 秒后第 {message.attempts + 1} 次尝试")
+            with self._lock:
+                self._retries += 1
+            self._schedule(message, delay)
+            return
+
+        logger.error(f"发送 {len(message.jobs)} 个提醒的通知失败（状态: {status_code}，尝试 {message.attempts} 次）")
+        self._finish(message, False)
+
+    def _finish(self, message: NotificationMessage, success: bool) -> None:
+        """把消息的最终结果记录到其中的每个通知"""
+        with self._lock:
+            self._outstanding -= len(message.jobs)
+            self._messages += 1
+            if message.digest:
+                self._digests += 1
+            if success:
+                self._sent += len(message.jobs)
+            else:
+                self._failed += len(message.jobs)
+            self._results.extend((job.job_id, success) for job in message.jobs)
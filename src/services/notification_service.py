@@ -4,9 +4,13 @@
 """
 import requests
 import logging
-from typing import Optional, Dict, Any
+import time
+from typing import Optional, Dict, Any, List, Tuple
 from datetime import datetime
+from requests.adapters import HTTPAdapter
 from ..config import get_config
+from ..utils.metrics import NOTIFICATION_SEND_SECONDS
+from .tick_trace import count_upstream_call
 
 logger = logging.getLogger(__name__)
 
@@ -14,13 +18,19 @@ logger = logging.getLogger(__name__)
 class NotificationService:
     """通知服务类"""
     
-    def __init__(self):
+    def __init__(self, pool_size: int = 10):
         self.config = get_config()
+        self.timeout = self.config.NOTIFICATION_TIMEOUT
         self.session = requests.Session()
         self.session.headers.update({
             'User-Agent': 'CryptoChart/1.0',
             'Content-Type': 'application/json'
         })
+        
+        # 连接池大小与并发发送的线程数一致，避免连接被反复创建
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
     
     def send_discord_notification(self, webhook_url: str, message: str, 
                                 embed: Optional[Dict[str, Any]] = None) -> bool:
@@ -35,28 +45,66 @@ class NotificationService:
         Returns:
             是否发送成功
         """
-        try:
-            payload = {'content': message}
+        payload = {'content': message}
+        
+        if embed:
+            payload['embeds'] = [embed]
+        
+        return self.send_discord_payload(webhook_url, payload)
+    
+    def send_discord_payload(self, webhook_url: str, payload: Dict[str, Any]) -> bool:
+        """
+        发送完整的Discord消息载荷
+        
+        Args:
+            webhook_url: Discord Webhook URL
+            payload: 消息载荷（content、embeds 等）
             
-            if embed:
-                payload['embeds'] = [embed]
+        Returns:
+            是否发送成功
+        """
+        response = self.post_discord_payload(webhook_url, payload)
+        if response is None:
+            return False
+        
+        if response.ok:
+            logger.info(f"Discord通知发送成功: {payload.get('content', '')[:50]}...")
+            return True
+        
+        logger.error(f"Discord通知发送失败: {response.status_code} - {response.text[:200]}")
+        return False
+    
+    def post_discord_payload(self, webhook_url: str,
+                             payload: Dict[str, Any]) -> Optional[requests.Response]:
+        """
+        发送Discord消息载荷并返回原始响应，由调用方处理状态码和限流响应头
+        
+        Args:
+            webhook_url: Discord Webhook URL
+            payload: 消息载荷
             
+        Returns:
+            HTTP响应，网络错误时返回None
+        """
+        started = time.perf_counter()
+        status = 'error'
+        count_upstream_call()
+        try:
             response = self.session.post(
                 webhook_url,
                 json=payload,
-                timeout=self.config.API_REQUEST_TIMEOUT
+                timeout=self.timeout
             )
-            response.raise_for_status()
-            
-            logger.info(f"Discord通知发送成功: {message[:50]}...")
-            return True
-            
+            status = str(response.status_code)
+            return response
         except requests.RequestException as e:
             logger.error(f"发送Discord通知时网络错误: {e}")
-            return False
+            return None
         except Exception as e:
             logger.error(f"发送Discord通知时发生未知错误: {e}")
-            return False
+            return None
+        finally:
+            NOTIFICATION_SEND_SECONDS.observe(time.perf_counter() - started, (status,))
     
     def create_price_alert_embed(self, base_currency: str, quote_currency: str,
                                condition_type: str, target_price: float,
@@ -138,6 +186,159 @@ class NotificationService:
         
         return embed
     
+    def build_price_alert(self, base_currency: str, quote_currency: str,
+                          condition_type: str, target_price: float, current_price: float,
+                          note: Optional[str] = None) -> Tuple[str, Dict[str, Any]]:
+        """
+        构建价格提醒的消息内容和嵌入
+        
+        Args:
+            base_currency: 基础货币
+            quote_currency: 计价货币
+            condition_type: 条件类型
+            target_price: 目标价格
+            current_price: 当前价格
+            note: 备注
+            
+        Returns:
+            (消息内容, 嵌入字典)
+        """
+        condition_text = "高于" if condition_type == "above" else "低于"
+        message = f"💰 **价格提醒** 💰\\n{base_currency.upper()}/{quote_currency.upper()} 价格{condition_text}目标价格 {target_price:.6f}！\\n当前价格: {current_price:.6f}"
+        
+        embed = self.create_price_alert_embed(
+            base_currency, quote_currency, condition_type,
+            target_price, current_price, note
+        )
+        
+        return message, embed
+    
+    def format_alert_line(self, base_currency: str, quote_currency: str,
+                          condition_type: str, target_price: float,
+                          current_price: float) -> str:
+        """
+        生成用于汇总消息的单行提醒描述
+        
+        Args:
+            base_currency: 基础货币
+            quote_currency: 计价货币
+            condition_type: 条件类型
+            target_price: 目标价格
+            current_price: 当前价格
+            
+        Returns:
+            单行描述
+        """
+        condition_text = "高于" if condition_type == "above" else "低于"
+        return (f"**{base_currency.upper()}/{quote_currency.upper()}** {condition_text} "
+                f"`{target_price:.6f}` · 当前 `{current_price:.6f}`")
+    
+    def build_rule_alert(self, base_currency: str, quote_currency: str, rule: str,
+                         current_price: float, note: Optional[str] = None) -> Tuple[str, Dict[str, Any]]:
+        """
+        构建规则提醒的消息内容和嵌入
+        
+        Args:
+            base_currency: 基础货币
+            quote_currency: 计价货币
+            rule: 规则表达式
+            current_price: 当前价格
+            note: 备注
+            
+        Returns:
+            (消息内容, 嵌入字典)
+        """
+        pair = f"{base_currency.upper()}/{quote_currency.upper()}"
+        message = f"💰 **规则提醒** 💰\\n{pair} 满足规则 {rule}\\n当前价格: {current_price:.6f}"
+        
+        embed = {
+            "title": "🚨 规则提醒触发",
+            "description": f"**{pair}** 满足提醒规则！",
+            "color": 0x3498db,
+            "fields": [
+                {
+                    "name": "📐 规则",
+                    "value": f"`{rule}`",
+                    "inline": False
+                },
+                {
+                    "name": "💰 当前价格",
+                    "value": f"`{current_price:.6f} {quote_currency.upper()}`",
+                    "inline": True
+                },
+                {
+                    "name": "💱 货币对",
+                    "value": f"`{pair}`",
+                    "inline": True
+                },
+                {
+                    "name": "⏰ 触发时间",
+                    "value": f"`{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}`",
+                    "inline": True
+                }
+            ],
+            "footer": {
+                "text": "CryptoChart Pro - 数字资产汇率监控",
+                "icon_url": "https://cdn.jsdelivr.net/gh/twitter/twemoji@14.0.2/assets/72x72/1f4b9.png"
+            },
+            "timestamp": datetime.now().isoformat()
+        }
+        
+        if note:
+            embed["fields"].append({
+                "name": "📝 备注",
+                "value": f"`{note}`",
+                "inline": False
+            })
+        
+        return message, embed
+    
+    def format_rule_line(self, base_currency: str, quote_currency: str, rule: str,
+                         current_price: float) -> str:
+        """
+        生成用于汇总消息的单行规则提醒描述
+        
+        Args:
+            base_currency: 基础货币
+            quote_currency: 计价货币
+            rule: 规则表达式
+            current_price: 当前价格
+            
+        Returns:
+            单行描述
+        """
+        return (f"**{base_currency.upper()}/{quote_currency.upper()}** 规则 "
+                f"`{rule}` · 当前 `{current_price:.6f}`")
+    
+    def create_digest_embed(self, lines: List[str], total: int,
+                            page: int = 1, pages: int = 1) -> Dict[str, Any]:
+        """
+        创建多个提醒的汇总嵌入消息
+        
+        Args:
+            lines: 每个提醒的单行描述
+            total: 本次汇总的提醒总数
+            page: 当前页码
+            pages: 总页数
+            
+        Returns:
+            Discord嵌入字典
+        """
+        title = f"🚨 {total} 个价格提醒触发"
+        if pages > 1:
+            title += f" ({page}/{pages})"
+        
+        return {
+            "title": title,
+            "description": "\n".join(lines),
+            "color": 0xffa500,
+            "footer": {
+                "text": "CryptoChart Pro - 数字资产汇率监控",
+                "icon_url": "https://cdn.jsdelivr.net/gh/twitter/twemoji@14.0.2/assets/72x72/1f4b9.png"
+            },
+            "timestamp": datetime.now().isoformat()
+        }
+    
     def send_price_alert(self, webhook_url: str, base_currency: str, quote_currency: str,
                         condition_type: str, target_price: float, current_price: float,
                         note: Optional[str] = None) -> bool:
@@ -156,10 +357,7 @@ class NotificationService:
         Returns:
             是否发送成功
         """
-        condition_text = "高于" if condition_type == "above" else "低于"
-        message = f"💰 **价格提醒** 💰\\n{base_currency.upper()}/{quote_currency.upper()} 价格{condition_text}目标价格 {target_price:.6f}！\\n当前价格: {current_price:.6f}"
-        
-        embed = self.create_price_alert_embed(
+        message, embed = self.build_price_alert(
             base_currency, quote_currency, condition_type,
             target_price, current_price, note
         )
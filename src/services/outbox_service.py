@@ -0,0 +1,296 @@
+# src/services/outbox_service.py
+"""
+通知发件箱服务
+"""
+import json
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Set
+from sqlalchemy import func, update
+from ..models import db, NotificationOutbox
+from ..config import get_config
+from .notification_service import NotificationService
+from .notification_dispatcher import NotificationDispatcher
+
+logger = logging.getLogger(__name__)
+
+
+class OutboxService:
+    """
+    通知发件箱服务
+
+    触发提醒时，通知先与触发状态在同一事务中写入发件箱，提交后再交给分发器
+    发送，因此投递永远不会阻塞评估事务。发送成功的通知被批量标记为已投递，
+    失败的按指数退避重新调度；进程重启后，未投递的通知会按幂等键重放。
+
+    投递语义是"至少一次"：发送成功后、标记投递前进程退出时，该通知会被重发一次。
+
+    已投递和已放弃的通知保留 OUTBOX_RETENTION_HOURS 小时后定期清理。状态统计使用
+    本进程的计数器，健康检查和状态接口不查询发件箱。
+    """
+
+    # 批量 IN (...) 语句中每批的ID数量
+    BULK_CHUNK_SIZE = 500
+
+    def __init__(self, dispatcher: Optional[NotificationDispatcher] = None,
+                 notification_service: Optional[NotificationService] = None):
+        self.config = get_config()
+        self.dispatcher = dispatcher
+        self.notification_service = notification_service or NotificationService()
+
+        # 已交给分发器、尚未得到结果的发件箱ID
+        self._in_flight: Set[int] = set()
+        # 最早的一次重试时间，没有待重试的通知时为None，避免空闲时查询发件箱
+        self._next_retry_at: Optional[datetime] = None
+        # 上一次清理的时间（time.monotonic），None 表示本进程尚未清理
+        self._pruned_at: Optional[float] = None
+        # 本进程启动以来的投递统计
+        self._counts = {'queued': 0, 'delivered': 0, 'failed': 0, 'abandoned': 0, 'pruned': 0}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def build_row(alert_id: int, idempotency_key: str, webhook_url: str,
+                  message: str, embed: Optional[Dict[str, Any]], summary: str,
+                  now: datetime) -> Dict[str, Any]:
+        """
+        构建一条待插入的发件箱记录
+
+        Returns:
+            可直接用于批量插入的字典
+        """
+        return {
+            'alert_id': alert_id,
+            'idempotency_key': idempotency_key,
+            'webhook_url': webhook_url,
+            'payload': json.dumps({'message': message, 'embed': embed, 'summary': summary},
+                                  ensure_ascii=False),
+            'status': NotificationOutbox.STATUS_PENDING,
+            'attempts': 0,
+            'created_at': now,
+            'next_attempt_at': now
+        }
+
+    def deliver(self, rows: List[NotificationOutbox]) -> int:
+        """
+        投递发件箱中的通知（已提交的记录）
+
+        配置了分发器时只入队，不等待结果；否则同步发送并立即写入结果。
+
+        Args:
+            rows: 发件箱记录
+
+        Returns:
+            入队或发送的通知数
+        """
+        if not rows:
+            return 0
+
+        if self.dispatcher is None:
+            delivered, failed = [], []
+            for row in rows:
+                content = row.content
+                payload = {'content': content['message']}
+                if content.get('embed'):
+                    payload['embeds'] = [content['embed']]
+                ok = self.notification_service.send_discord_payload(row.webhook_url, payload)
+                (delivered if ok else failed).append(row.id)
+            self._count('queued', len(rows))
+            self._record(delivered, failed)
+            return len(rows)
+
+        submitted = 0
+        for row in rows:
+            with self._lock:
+                if row.id in self._in_flight:
+                    continue
+                self._in_flight.add(row.id)
+
+            content = row.content
+            if self.dispatcher.submit(row.id, row.webhook_url, content['message'],
+                                      content.get('embed'), content.get('summary')):
+                submitted += 1
+            else:
+                with self._lock:
+                    self._in_flight.discard(row.id)
+                self.schedule_replay(datetime.utcnow() + timedelta(seconds=self.config.OUTBOX_RETRY_BASE))
+        self._count('queued', submitted)
+        return submitted
+
+    def apply_results(self) -> Dict[str, int]:
+        """
+        批量写入分发器的发送结果
+
+        Returns:
+            结果统计
+        """
+        stats = {'delivered': 0, 'failed': 0}
+        if self.dispatcher is None or not self.dispatcher.has_results():
+            return stats
+
+        delivered, failed = [], []
+        for outbox_id, success in self.dispatcher.drain_results():
+            (delivered if success else failed).append(outbox_id)
+
+        with self._lock:
+            self._in_flight.difference_update(delivered)
+            self._in_flight.difference_update(failed)
+
+        self._record(delivered, failed)
+        stats['delivered'] = len(delivered)
+        stats['failed'] = len(failed)
+        return stats
+
+    def replay(self, force: bool = False, grace: float = 0) -> int:
+        """
+        重放到期的未投递通知
+
+        启动时调用以恢复崩溃前未投递的通知；之后只在有通知到达重试时间时查询。
+
+        Args:
+            force: 忽略内存中的重试时间，直接查询发件箱
+            grace: 跳过最近 grace 秒内到期的通知（接管领导者时传入租约有效期，
+                   前任领导者可能仍在投递这些通知），到期后再重放
+
+        Returns:
+            重新入队的通知数
+        """
+        now = datetime.utcnow()
+        if not force and (self._next_retry_at is None or self._next_retry_at > now):
+            return 0
+
+        with self._lock:
+            in_flight = set(self._in_flight)
+
+        query = NotificationOutbox.query.filter(
+            NotificationOutbox.status == NotificationOutbox.STATUS_PENDING,
+            NotificationOutbox.next_attempt_at <= now - timedelta(seconds=grace)
+        )
+        if in_flight:
+            query = query.filter(NotificationOutbox.id.notin_(in_flight))
+        rows = query.order_by(NotificationOutbox.id).limit(self.config.OUTBOX_REPLAY_BATCH).all()
+
+        # 计算下一次需要查询的时间
+        self._next_retry_at = None
+        if len(rows) >= self.config.OUTBOX_REPLAY_BATCH:
+            self.schedule_replay(now)
+        else:
+            upcoming = db.session.query(func.min(NotificationOutbox.next_attempt_at)).filter(
+                NotificationOutbox.status == NotificationOutbox.STATUS_PENDING,
+                NotificationOutbox.next_attempt_at > now
+            ).scalar()
+            if upcoming:
+                self.schedule_replay(upcoming)
+        if grace:
+            self.schedule_replay(now + timedelta(seconds=grace))
+
+        if rows:
+            logger.info(f"重放 {len(rows)} 条未投递的通知")
+        return self.deliver(rows)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """
+        获取发件箱统计（本进程的计数器，不查询数据库）
+
+        Returns:
+            统计信息字典
+        """
+        with self._lock:
+            stats = dict(self._counts)
+            stats['in_flight'] = len(self._in_flight)
+
+        stats['next_retry_at'] = self._next_retry_at.isoformat() if self._next_retry_at else None
+        return stats
+
+    def prune(self, force: bool = False) -> int:
+        """
+        清理过期的已投递和已放弃的通知，距上次清理不足 OUTBOX_PRUNE_INTERVAL 秒时跳过
+
+        Args:
+            force: 忽略清理间隔
+
+        Returns:
+            清理的记录数
+        """
+        now = time.monotonic()
+        if not force and self._pruned_at is not None and now - self._pruned_at < self.config.OUTBOX_PRUNE_INTERVAL:
+            return 0
+        self._pruned_at = now
+
+        try:
+            removed = NotificationOutbox.prune(self.config.OUTBOX_RETENTION_HOURS)
+            db.session.commit()
+        except Exception as e:
+            logger.warning(f"清理通知发件箱时发生错误: {e}")
+            db.session.rollback()
+            return 0
+
+        if removed:
+            self._count('pruned', removed)
+            logger.debug(f"已清理 {removed} 条过期的通知")
+        return removed
+
+    def schedule_replay(self, when: Optional[datetime] = None) -> None:
+        """
+        安排一次发件箱重放，只保留最早的时间
+
+        Args:
+            when: 重放时间，默认立即
+        """
+        when = when or datetime.utcnow()
+        if self._next_retry_at is None or when < self._next_retry_at:
+            self._next_retry_at = when
+
+    def _record(self, delivered: List[int], failed: List[int]) -> None:
+        """在一个事务中写入投递结果"""
+        if not delivered and not failed:
+            return
+
+        now = datetime.utcnow()
+        try:
+            for start in range(0, len(delivered), self.BULK_CHUNK_SIZE):
+                chunk = delivered[start:start + self.BULK_CHUNK_SIZE]
+                db.session.execute(
+                    update(NotificationOutbox).where(
+                        NotificationOutbox.id.in_(chunk)
+                    ).values(
+                        status=NotificationOutbox.STATUS_DELIVERED,
+                        delivered_at=now,
+                        attempts=NotificationOutbox.attempts + 1,
+                        last_error=None
+                    ),
+                    execution_options={'synchronize_session': False}
+                )
+
+            # 失败较少见，逐条计算退避时间
+            failed_rows = NotificationOutbox.query.filter(
+                NotificationOutbox.id.in_(failed)
+            ).all() if failed else []
+            abandoned = 0
+            for row in failed_rows:
+                row.attempts += 1
+                row.last_error = '发送失败'
+                if row.attempts >= self.config.OUTBOX_MAX_ATTEMPTS:
+                    row.status = NotificationOutbox.STATUS_FAILED
+                    abandoned += 1
+                    logger.error(f"通知 {row.idempotency_key} 在 {row.attempts} 轮投递后仍失败，已放弃")
+                else:
+                    delay = self.config.OUTBOX_RETRY_BASE * (2 ** (row.attempts - 1))
+                    row.next_attempt_at = now + timedelta(seconds=delay)
+                    self.schedule_replay(row.next_attempt_at)
+
+            db.session.commit()
+
+        except Exception as e:
+            logger.error(f"写入通知投递结果时发生错误: {e}")
+            db.session.rollback()
+            return
+
+        self._count('delivered', len(delivered))
+        self._count('failed', len(failed))
+        self._count('abandoned', abandoned)
+
+    def _count(self, name: str, value: int) -> None:
+        with self._lock:
+            self._counts[name] += value
@@ -5,10 +5,13 @@
 import requests
 import pandas as pd
 import numpy as np
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Tuple
 from datetime import datetime, timedelta
 import logging
+import time
 from ..config import get_config
+from ..utils.metrics import UPSTREAM_REQUEST_SECONDS, UPSTREAM_REQUESTS
+from .tick_trace import count_upstream_call
 
 logger = logging.getLogger(__name__)
 
@@ -19,6 +22,7 @@ class PriceService:
     def __init__(self):
         self.config = get_config()
         self.base_url = self.config.COINGECKO_API_URL
+        self.binance_url = self.config.BINANCE_API_URL
         self.timeout = self.config.API_REQUEST_TIMEOUT
         self.session = requests.Session()
         
@@ -28,6 +32,34 @@ class PriceService:
             'Accept': 'application/json'
         })
     
+    def _get(self, upstream: str, endpoint: str, url: str,
+             params: Optional[Dict[str, Any]] = None) -> requests.Response:
+        """
+        发送 GET 请求并记录上游耗时和状态码指标
+        
+        Args:
+            upstream: 上游名称（如 'coingecko'、'binance'）
+            endpoint: 接口名称（指标标签，不含路径参数）
+            url: 请求地址
+            params: 查询参数
+            
+        Returns:
+            HTTP响应
+            
+        Raises:
+            requests.RequestException: 网络错误
+        """
+        started = time.perf_counter()
+        status = 'error'
+        count_upstream_call()
+        try:
+            response = self.session.get(url, params=params, timeout=self.timeout)
+            status = str(response.status_code)
+            return response
+        finally:
+            UPSTREAM_REQUEST_SECONDS.observe(time.perf_counter() - started, (upstream, endpoint))
+            UPSTREAM_REQUESTS.inc(1, (upstream, endpoint, status))
+    
     def get_current_price(self, base_currency: str, quote_currency: str) -> Optional[float]:
         """
         获取当前价格
@@ -46,7 +78,7 @@ class PriceService:
                 'vs_currencies': quote_currency.lower()
             }
             
-            response = self.session.get(url, params=params, timeout=self.timeout)
+            response = self._get('coingecko', 'simple/price', url, params)
             response.raise_for_status()
             
             data = response.json()
@@ -90,7 +122,7 @@ class PriceService:
                 'interval': 'daily' if days > 30 else 'hourly'
             }
             
-            response = self.session.get(url, params=params, timeout=self.timeout)
+            response = self._get('coingecko', 'market_chart', url, params)
             response.raise_for_status()
             
             data = response.json()
@@ -127,6 +159,177 @@ class PriceService:
             logger.error(f"获取历史数据时发生未知错误: {e}")
             return None
     
+    def kline_symbol(self, currency: str) -> Optional[str]:
+        """
+        获取货币在币安K线中使用的符号（对 USDT 报价）
+        
+        Args:
+            currency: 货币ID（如 'bitcoin'）或符号（如 'btc'）
+            
+        Returns:
+            符号（如 'BTC'），法币或未知货币返回None
+        """
+        symbol = self.config.CURRENCY_SYMBOLS.get(currency.lower())
+        if symbol:
+            return symbol
+        
+        upper = currency.upper()
+        if upper in self.config.CURRENCY_SYMBOLS.values():
+            return upper
+        return None
+    
+    def get_minute_klines(self, symbol: str, start_ms: int) -> Optional[np.ndarray]:
+        """
+        获取某个时间之后的1分钟K线
+        
+        Args:
+            symbol: 币安符号（如 'BTC'），对 USDT 报价
+            start_ms: 起始时间（毫秒时间戳）
+            
+        Returns:
+            形状为 (n, 4) 的数组，列为开盘时间、最高价、最低价、收盘价，失败时返回None
+        """
+        return self.get_klines(symbol, '1m', start_ms)
+    
+    def get_klines(self, symbol: str, interval: str, start_ms: int) -> Optional[np.ndarray]:
+        """
+        获取某个时间之后的K线
+        
+        Args:
+            symbol: 币安符号（如 'BTC'），对 USDT 报价
+            interval: K线周期（如 '1m'、'1h'）
+            start_ms: 起始时间（毫秒时间戳）
+            
+        Returns:
+            形状为 (n, 4) 的数组，列为开盘时间、最高价、最低价、收盘价，失败时返回None
+        """
+        try:
+            url = f"{self.binance_url}/klines"
+            params = {
+                'symbol': f"{symbol}USDT",
+                'interval': interval,
+                'startTime': int(start_ms),
+                'limit': 1000
+            }
+            
+            response = self._get('binance', 'klines', url, params)
+            response.raise_for_status()
+            
+            return self.parse_klines(response.json())
+            
+        except requests.RequestException as e:
+            logger.error(f"获取 {symbol} K线时网络错误: {e}")
+            return None
+        except (ValueError, KeyError, IndexError, TypeError) as e:
+            logger.error(f"解析 {symbol} K线数据时出错: {e}")
+            return None
+    
+    @staticmethod
+    def parse_klines(data: List[list]) -> Optional[np.ndarray]:
+        """
+        将币安K线JSON转换为数组
+        
+        Args:
+            data: 币安K线接口返回的列表
+            
+        Returns:
+            形状为 (n, 4) 的数组，列为开盘时间、最高价、最低价、收盘价，没有K线时返回None
+        """
+        if not data:
+            return None
+        
+        return np.array([(k[0], k[2], k[3], k[4]) for k in data], dtype=float)
+    
+    def get_close_series(self, base_currency: str, quote_currency: str, current_price: float,
+                         klines: Dict[str, Optional[np.ndarray]],
+                         interval_seconds: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        根据K线生成货币对的收盘价序列
+        
+        与 get_price_range 相同，K线对 USDT 报价，按当前价格与最新收盘价的比值
+        换算到计价货币；计价货币为加密货币时使用收盘价之比。
+        
+        Args:
+            base_currency: 基础货币
+            quote_currency: 计价货币
+            current_price: 当前价格
+            klines: 按符号预先获取的K线
+            interval_seconds: K线周期（秒）
+            
+        Returns:
+            (收盘时间（Unix 时间戳）, 收盘价)，没有可用K线时为空数组
+        """
+        empty = (np.empty(0), np.empty(0))
+        base = klines.get(self.kline_symbol(base_currency) or '')
+        if base is None:
+            return empty
+        
+        quote_symbol = self.kline_symbol(quote_currency)
+        if quote_symbol is None:
+            open_times, closes = base[:, 0], base[:, 3]
+        else:
+            quote = klines.get(quote_symbol)
+            if quote is None:
+                return empty
+            open_times, bi, qi = np.intersect1d(base[:, 0], quote[:, 0], return_indices=True)
+            closes = base[bi, 3] / quote[qi, 3]
+        
+        if len(closes) == 0 or closes[-1] <= 0:
+            return empty
+        
+        return open_times / 1000 + interval_seconds, closes * (current_price / closes[-1])
+    
+    def get_price_range(self, base_currency: str, quote_currency: str, since_ms: int,
+                        current_price: float,
+                        klines: Dict[str, Optional[np.ndarray]]) -> Tuple[float, float]:
+        """
+        根据1分钟K线估算某个时间之后的最低价和最高价
+        
+        K线对 USDT 报价，按当前价格与最新收盘价的比值换算到计价货币。
+        计价货币为加密货币时，逐根K线用收盘价之比近似比价的区间。
+        在起始时间之前开盘的K线只使用收盘价，不把起始时间之前的价格算进区间。
+        没有可用K线时区间退化为当前价格。
+        
+        Args:
+            base_currency: 基础货币
+            quote_currency: 计价货币
+            since_ms: 起始时间（毫秒时间戳）
+            current_price: 当前价格
+            klines: 按符号预先获取的K线
+            
+        Returns:
+            (最低价, 最高价)
+        """
+        base = klines.get(self.kline_symbol(base_currency) or '')
+        if base is None:
+            return current_price, current_price
+        
+        # 与起始时间有重叠的K线
+        base = base[base[:, 0] + 60000 > since_ms]
+        
+        quote_symbol = self.kline_symbol(quote_currency)
+        if quote_symbol is None:
+            # 起始时间之前开盘的K线，最高价和最低价可能出现在起始时间之前，只取收盘价
+            partial = base[:, 0] < since_ms
+            closes = base[:, 3]
+            highs = np.where(partial, closes, base[:, 1])
+            lows = np.where(partial, closes, base[:, 2])
+        else:
+            quote = klines.get(quote_symbol)
+            if quote is None:
+                return current_price, current_price
+            quote = quote[quote[:, 0] + 60000 > since_ms]
+            _, bi, qi = np.intersect1d(base[:, 0], quote[:, 0], return_indices=True)
+            closes = base[bi, 3] / quote[qi, 3]
+            highs = lows = closes
+        
+        if len(closes) == 0 or closes[-1] <= 0:
+            return current_price, current_price
+        
+        scale = current_price / closes[-1]
+        return (min(current_price, float(lows.min()) * scale),
+                max(current_price, float(highs.max()) * scale))
+    
     def get_price_statistics(self, prices: List[float]) -> Dict[str, float]:
         """
         计算价格统计信息
@@ -162,7 +365,7 @@ class PriceService:
         """
         try:
             url = f"{self.base_url}/coins/list"
-            response = self.session.get(url, timeout=self.timeout)
+            response = self._get('coingecko', 'coins/list', url)
             response.raise_for_status()
             
             data = response.json()
@@ -0,0 +1,580 @@
+# src/services/rule_engine.py
+"""
+提醒规则引擎
+
+规则语法示例:
+    price > 50000
+    change(1h) >= 5 and price > sma(4h)
+    price crosses_above sma(30m) or not (change(24h) > -10)
+
+操作数:
+    price        当前价格
+    change(W)    相对 W 之前价格的涨跌幅（百分比）
+    sma(W)       最近 W 内收盘价的简单移动平均
+    数字常量
+其中 W 为时长，如 15m、1h、1d。
+
+比较运算: >  >=  <  <=  crosses_above  crosses_below（与上一次评估相比发生穿越）
+逻辑运算: and  or  not  以及括号
+"""
+import re
+import threading
+from itertools import product
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+import numpy as np
+from .threshold_index import Pair, ThresholdIndex
+
+# 特征键: ('price', 0)、('change', 秒数)、('sma', 秒数)
+Feature = Tuple[str, int]
+
+# 原子条件: (左侧特征, 运算符, 右侧特征或常量)
+Atom = Tuple[Feature, str, Union[Feature, float]]
+
+# 析取范式中的文字: (原子序号, 是否取反)
+Literal = Tuple[int, bool]
+
+OPERATORS = ('>', '>=', '<', '<=', 'crosses_above', 'crosses_below')
+_OP_CODES = {op: code for code, op in enumerate(OPERATORS)}
+
+# 常量在左侧时交换左右操作数对应的运算符
+_FLIPPED = {'>': '<', '>=': '<=', '<': '>', '<=': '>=',
+            'crosses_above': 'crosses_below', 'crosses_below': 'crosses_above'}
+
+_DURATION_UNITS = {'m': 60, 'h': 3600, 'd': 86400}
+
+_TOKEN = re.compile(r'\s*(?:(\d+(?:\.\d+)?[mhd]?)|([A-Za-z_]+)|(>=|<=|>|<|\(|\)|-))')
+
+# 单条规则展开成析取范式后允许的最大合取子句数
+MAX_CONJUNCTIONS = 32
+
+# 单条规则允许的最长时间窗口（秒）
+MAX_WINDOW = 30 * 86400
+
+
+class RuleSyntaxError(ValueError):
+    """规则语法错误"""
+
+
+def parse_duration(text: str) -> int:
+    """
+    解析时长，如 '15m'、'1h'、'1d'
+
+    Returns:
+        秒数
+    """
+    match = re.fullmatch(r'(\d+)([mhd])', text.strip().lower())
+    if not match:
+        raise RuleSyntaxError(f"无效的时长: {text}")
+
+    seconds = int(match.group(1)) * _DURATION_UNITS[match.group(2)]
+    if seconds <= 0 or seconds > MAX_WINDOW:
+        raise RuleSyntaxError(f"时长超出范围: {text}")
+    return seconds
+
+
+class _Parser:
+    """递归下降解析器，生成 ('or'|'and', [子节点])、('not', 子节点)、('atom', Atom) 节点"""
+
+    def __init__(self, text: str):
+        self.tokens = self._tokenize(text)
+        self.pos = 0
+
+    @staticmethod
+    def _tokenize(text: str) -> List[str]:
+        tokens, pos = [], 0
+        text = text.strip()
+        while pos < len(text):
+            match = _TOKEN.match(text, pos)
+            if not match or match.end() == pos:
+                raise RuleSyntaxError(f"无法识别的字符: {text[pos:pos + 10]!r}")
+            tokens.append(next(group for group in match.groups() if group is not None))
+            pos = match.end()
+        return tokens
+
+    def peek(self) -> Optional[str]:
+        return self.tokens[self.pos].lower() if self.pos < len(self.tokens) else None
+
+    def take(self, expected: Optional[str] = None) -> str:
+        token = self.peek()
+        if token is None or (expected is not None and token != expected):
+            raise RuleSyntaxError(f"期望 {expected or '更多内容'}，实际为 {token or '结尾'}")
+        self.pos += 1
+        return token
+
+    def parse(self):
+        if not self.tokens:
+            raise RuleSyntaxError("规则不能为空")
+        node = self.parse_or()
+        if self.peek() is not None:
+            raise RuleSyntaxError(f"多余的内容: {self.peek()}")
+        return node
+
+    def parse_or(self):
+        children = [self.parse_and()]
+        while self.peek() == 'or':
+            self.take()
+            children.append(self.parse_and())
+        return children[0] if len(children) == 1 else ('or', children)
+
+    def parse_and(self):
+        children = [self.parse_not()]
+        while self.peek() == 'and':
+            self.take()
+            children.append(self.parse_not())
+        return children[0] if len(children) == 1 else ('and', children)
+
+    def parse_not(self):
+        if self.peek() == 'not':
+            self.take()
+            return ('not', self.parse_not())
+        if self.peek() == '(':
+            self.take('(')
+            node = self.parse_or()
+            self.take(')')
+            return node
+        return ('atom', self.parse_comparison())
+
+    def parse_comparison(self) -> Atom:
+        lhs = self.parse_operand()
+        op = self.take()
+        if op not in _OP_CODES:
+            raise RuleSyntaxError(f"未知的比较运算符: {op}")
+        rhs = self.parse_operand()
+
+        if not isinstance(lhs, tuple):
+            if not isinstance(rhs, tuple):
+                raise RuleSyntaxError("比较的两侧不能都是常量")
+            lhs, op, rhs = rhs, _FLIPPED[op], lhs
+        return (lhs, op, rhs)
+
+    def parse_operand(self) -> Union[Feature, float]:
+        token = self.take()
+        if token == '-':
+            return -self._number(self.take())
+        if token == 'price':
+            return ('price', 0)
+        if token in ('change', 'sma'):
+            self.take('(')
+            seconds = parse_duration(self.take())
+            self.take(')')
+            return (token, seconds)
+        return self._number(token)
+
+    @staticmethod
+    def _number(token: str) -> float:
+        try:
+            return float(token)
+        except ValueError:
+            raise RuleSyntaxError(f"无效的操作数: {token}")
+
+
+def _to_dnf(node, negate: bool = False) -> List[List[Tuple[Atom, bool]]]:
+    """将语法树展开为析取范式（取反通过德摩根定律下推到原子）"""
+    kind = node[0]
+    if kind == 'atom':
+        return [[(node[1], negate)]]
+    if kind == 'not':
+        return _to_dnf(node[1], not negate)
+
+    parts = [_to_dnf(child, negate) for child in node[1]]
+    if (kind == 'or') != negate:
+        return [conj for part in parts for conj in part]
+
+    conjunctions = [sum(combo, []) for combo in product(*parts)]
+    if len(conjunctions) > MAX_CONJUNCTIONS:
+        raise RuleSyntaxError(f"规则过于复杂（展开后超过 {MAX_CONJUNCTIONS} 个子句）")
+    return conjunctions
+
+
+class CompiledRule:
+    """编译后的规则：去重的原子条件和析取范式子句"""
+
+    __slots__ = ('text', 'atoms', 'conjunctions', 'features', 'max_window')
+
+    def __init__(self, text: str, atoms: List[Atom], conjunctions: List[List[Literal]]):
+        self.text = text
+        self.atoms = atoms
+        self.conjunctions = conjunctions
+
+        features = set()
+        for lhs, _, rhs in atoms:
+            features.add(lhs)
+            if isinstance(rhs, tuple):
+                features.add(rhs)
+        self.features = features
+        self.max_window = max((seconds for _, seconds in features), default=0)
+
+    def __repr__(self) -> str:
+        return f'<CompiledRule {self.text!r} atoms={len(self.atoms)} clauses={len(self.conjunctions)}>'
+
+
+def compile_rule(text: str) -> CompiledRule:
+    """
+    编译规则文本
+
+    Args:
+        text: 规则文本
+
+    Returns:
+        编译后的规则
+
+    Raises:
+        RuleSyntaxError: 规则语法错误
+    """
+    if not isinstance(text, str):
+        raise RuleSyntaxError("规则必须是字符串")
+
+    conjunctions = _to_dnf(_Parser(text).parse())
+
+    atoms: List[Atom] = []
+    positions: Dict[Atom, int] = {}
+    compiled: List[List[Literal]] = []
+    for conj in conjunctions:
+        literals = []
+        for atom, negated in conj:
+            if atom not in positions:
+                positions[atom] = len(atoms)
+                atoms.append(atom)
+            literals.append((positions[atom], negated))
+        compiled.append(literals)
+
+    return CompiledRule(text.strip(), atoms, compiled)
+
+
+def compute_features(features: Iterable[Feature], times: np.ndarray, closes: np.ndarray,
+                     price: float, now: float) -> Dict[Feature, float]:
+    """
+    根据收盘价序列计算特征值，历史不足的特征为 NaN
+
+    Args:
+        features: 需要的特征
+        times: 每根K线的收盘时间（Unix 时间戳，升序）
+        closes: 对应的收盘价
+        price: 当前价格
+        now: 当前时间（Unix 时间戳）
+
+    Returns:
+        特征值字典
+    """
+    values: Dict[Feature, float] = {}
+    covered = len(times) > 0
+
+    for feature in features:
+        kind, seconds = feature
+        if kind == 'price':
+            values[feature] = price
+            continue
+
+        start = now - seconds
+        if not covered or times[0] > start:
+            values[feature] = float('nan')
+        elif kind == 'change':
+            # 窗口起点之前最后一根K线的收盘价
+            ref = closes[max(0, np.searchsorted(times, start, side='right') - 1)]
+            values[feature] = float((price / ref - 1) * 100) if ref else float('nan')
+        else:
+            window = closes[np.searchsorted(times, start, side='right'):]
+            values[feature] = float(window.mean()) if len(window) else float('nan')
+
+    return values
+
+
+def compute_feature_series(features: Iterable[Feature], times: np.ndarray,
+                           closes: np.ndarray) -> Dict[Feature, np.ndarray]:
+    """
+    计算每根K线收盘时的特征值，与 compute_features 的逐点结果一致
+
+    Args:
+        features: 需要的特征
+        times: 每根K线的收盘时间（Unix 时间戳，升序）
+        closes: 对应的收盘价（同时作为当时的价格）
+
+    Returns:
+        每个特征与 times 等长的取值数组，历史不足处为 NaN
+    """
+    values: Dict[Feature, np.ndarray] = {}
+    if len(times) == 0:
+        return {feature: np.empty(0) for feature in features}
+
+    sums = np.concatenate(([0.0], np.cumsum(closes)))
+    positions = np.arange(len(times))
+
+    for feature in features:
+        kind, seconds = feature
+        if kind == 'price':
+            values[feature] = closes.astype(float)
+            continue
+
+        starts = times - seconds
+        covered = times[0] <= starts
+        first = np.searchsorted(times, starts, side='right')
+        series = np.full(len(times), np.nan)
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            if kind == 'change':
+                ref = closes[np.maximum(first - 1, 0)]
+                change = (closes / ref - 1) * 100
+                series[covered] = np.where(ref != 0, change, np.nan)[covered]
+            else:
+                counts = positions + 1 - first
+                mean = (sums[positions + 1] - sums[first]) / counts
+                series[covered] = np.where(counts > 0, mean, np.nan)[covered]
+
+        values[feature] = series
+
+    return values
+
+
+class RuleSet:
+    """
+    同一货币对下所有规则的向量化求值
+
+    所有规则的原子条件、文字和子句被展平成数组，每次求值时：
+    1. 按运算符一次性计算所有原子条件
+    2. 用 logical_and.reduceat 计算每个子句
+    3. 用 logical_or.reduceat 计算每条规则
+    """
+
+    def __init__(self):
+        self.rules: Dict[int, CompiledRule] = {}
+        self._dirty = True
+
+    def add(self, alert_id: int, rule: CompiledRule) -> None:
+        self.rules[alert_id] = rule
+        self._dirty = True
+
+    def remove(self, alert_id: int) -> bool:
+        if self.rules.pop(alert_id, None) is None:
+            return False
+        self._dirty = True
+        return True
+
+    @property
+    def features(self) -> List[Feature]:
+        self._build()
+        return self._features
+
+    @property
+    def max_window(self) -> int:
+        return max((rule.max_window for rule in self.rules.values()), default=0)
+
+    def _build(self) -> None:
+        if not self._dirty:
+            return
+
+        features: Dict[Feature, int] = {}
+        atoms: Dict[Atom, int] = {}
+        lhs, rhs, const, ops = [], [], [], []
+        lit_atom, lit_neg, conj_starts, rule_starts, rule_ids = [], [], [], [], []
+
+        for alert_id, rule in self.rules.items():
+            rule_ids.append(alert_id)
+            rule_starts.append(len(conj_starts))
+            local = []
+            for atom in rule.atoms:
+                if atom not in atoms:
+                    left, op, right = atom
+                    atoms[atom] = len(ops)
+                    lhs.append(features.setdefault(left, len(features)))
+                    if isinstance(right, tuple):
+                        rhs.append(features.setdefault(right, len(features)))
+                        const.append(0.0)
+                    else:
+                        rhs.append(-1)
+                        const.append(right)
+                    ops.append(_OP_CODES[op])
+                local.append(atoms[atom])
+            for conj in rule.conjunctions:
+                conj_starts.append(len(lit_atom))
+                for atom_index, negated in conj:
+                    lit_atom.append(local[atom_index])
+                    lit_neg.append(negated)
+
+        self._features = list(features)
+        self._lhs = np.array(lhs, dtype=np.intp)
+        self._rhs = np.array(rhs, dtype=np.intp)
+        self._const = np.array(const, dtype=float)
+        self._ops = np.array(ops, dtype=np.int8)
+        self._lit_atom = np.array(lit_atom, dtype=np.intp)
+        self._lit_neg = np.array(lit_neg, dtype=bool)
+        self._conj_starts = np.array(conj_starts, dtype=np.intp)
+        self._rule_starts = np.array(rule_starts, dtype=np.intp)
+        self._rule_ids = np.array(rule_ids, dtype=np.int64)
+        self._dirty = False
+
+    def _operands(self, values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        # values 为一维（单次求值）或二维（特征 × 时间）
+        shape = (-1,) + (1,) * (values.ndim - 1)
+        left = values[self._lhs]
+        right = np.where(self._rhs.reshape(shape) >= 0, values[np.maximum(self._rhs, 0)],
+                         self._const.reshape(shape))
+        return left, right
+
+    def _fired(self, current: np.ndarray, previous: np.ndarray) -> np.ndarray:
+        """计算每条规则是否成立，返回与规则顺序对应的布尔数组（二维输入时每列一个时间点）"""
+        left, right = self._operands(current)
+        prev_left, prev_right = self._operands(previous)
+        shape = (-1,) + (1,) * (current.ndim - 1)
+        ops = self._ops.reshape(shape)
+
+        with np.errstate(invalid='ignore'):
+            result = np.select(
+                [ops == 0, ops == 1, ops == 2, ops == 3, ops == 4, ops == 5],
+                [left > right, left >= right, left < right, left <= right,
+                 (prev_left < prev_right) & (left >= right),
+                 (prev_left > prev_right) & (left <= right)],
+                default=False
+            )
+
+        known = ~(np.isnan(left) | np.isnan(right))
+        crossing = ops >= _OP_CODES['crosses_above']
+        known &= ~crossing | ~(np.isnan(prev_left) | np.isnan(prev_right))
+
+        literals = (result[self._lit_atom] ^ self._lit_neg.reshape(shape)) & known[self._lit_atom]
+        clauses = np.logical_and.reduceat(literals, self._conj_starts)
+        return np.logical_or.reduceat(clauses, self._rule_starts)
+
+    def evaluate(self, values: Dict[Feature, float],
+                 previous: Optional[Dict[Feature, float]] = None) -> List[int]:
+        """
+        对所有规则求值
+
+        规则集不保存上一次的特征值：同一货币对可能在不同的分片进程或协调进程中求值，
+        上一次的特征值由调用方（协调进程的提醒簿）保存并随快照传入。
+
+        Args:
+            values: 特征值（缺失或 NaN 的特征使相关原子条件不成立，取反后同样不成立）
+            previous: 上一次求值的特征值，None 或缺失时穿越条件视为未知（不成立）
+
+        Returns:
+            条件成立的提醒ID列表
+        """
+        self._build()
+        if not self.rules:
+            return []
+
+        previous = previous or {}
+        current = np.array([values.get(f, np.nan) for f in self._features], dtype=float)
+        previous = np.array([previous.get(f, np.nan) for f in self._features], dtype=float)
+
+        return self._rule_ids[self._fired(current, previous)].tolist()
+
+    def first_true(self, series: Dict[Feature, np.ndarray], chunk: int = 4096) -> Dict[int, int]:
+        """
+        对特征时间序列求值，找出每条规则第一次成立的位置
+
+        按时间分块计算，所有规则都已成立后提前结束。不修改单次求值使用的上一次特征值。
+
+        Args:
+            series: 每个特征在各时间点的取值（等长数组）
+            chunk: 每块的时间点数
+
+        Returns:
+            提醒ID到第一次成立的时间点序号的映射，从未成立的规则不在其中
+        """
+        self._build()
+        if not self.rules:
+            return {}
+
+        length = len(next(iter(series.values()))) if series else 0
+        matrix = np.full((len(self._features), length + 1), np.nan)
+        for row, feature in enumerate(self._features):
+            if feature in series:
+                matrix[row, 1:] = series[feature]
+
+        found: Dict[int, int] = {}
+        pending = np.ones(len(self._rule_ids), dtype=bool)
+        for start in range(0, length, chunk):
+            stop = min(length, start + chunk)
+            # 第 0 列为 NaN 占位，使每个时间点都能取到上一个时间点的值
+            fired = self._fired(matrix[:, start + 1:stop + 1], matrix[:, start:stop])
+            hit = pending & fired.any(axis=1)
+            if hit.any():
+                for rule, offset in zip(np.flatnonzero(hit), fired[hit].argmax(axis=1)):
+                    found[int(self._rule_ids[rule])] = start + int(offset)
+                pending &= ~hit
+                if not pending.any():
+                    break
+
+        return found
+
+    def __len__(self) -> int:
+        return len(self.rules)
+
+
+class RuleIndex:
+    """按货币对组织的规则提醒，规则在加入时编译一次"""
+
+    def __init__(self):
+        self._sets: Dict[Pair, RuleSet] = {}
+        self._entries: Dict[int, Pair] = {}
+        self._lock = threading.RLock()
+
+    def add(self, alert_id: int, base_currency: str, quote_currency: str, rule: str) -> CompiledRule:
+        """
+        编译并添加规则提醒
+
+        Raises:
+            RuleSyntaxError: 规则语法错误
+        """
+        compiled = compile_rule(rule)
+        pair = ThresholdIndex.make_pair(base_currency, quote_currency)
+        with self._lock:
+            self.remove(alert_id)
+            self._sets.setdefault(pair, RuleSet()).add(alert_id, compiled)
+            self._entries[alert_id] = pair
+        return compiled
+
+    def remove(self, alert_id: int) -> bool:
+        with self._lock:
+            pair = self._entries.pop(alert_id, None)
+            if pair is None:
+                return False
+            rule_set = self._sets[pair]
+            rule_set.remove(alert_id)
+            if not rule_set:
+                del self._sets[pair]
+            return True
+
+    def get(self, base_currency: str, quote_currency: str) -> Optional[RuleSet]:
+        with self._lock:
+            return self._sets.get(ThresholdIndex.make_pair(base_currency, quote_currency))
+
+    def pairs(self) -> List[Pair]:
+        with self._lock:
+            return list(self._sets)
+
+    def count(self, base_currency: str, quote_currency: str) -> int:
+        rule_set = self.get(base_currency, quote_currency)
+        return len(rule_set) if rule_set else 0
+
+    def clear(self) -> None:
+        with self._lock:
+            self._sets = {}
+            self._entries = {}
+
+    def __contains__(self, alert_id: int) -> bool:
+        return alert_id in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+# K线周期及其秒数，规则取能以不超过1000根K线覆盖最长窗口的最小周期
+KLINE_INTERVALS = (('1m', 60), ('5m', 300), ('15m', 900), ('1h', 3600), ('4h', 14400), ('1d', 86400))
+
+
+def choose_interval(window: int) -> Tuple[str, int]:
+    """
+    选择覆盖时间窗口的K线周期
+
+    Args:
+        window: 最长时间窗口（秒）
+
+    Returns:
+        (周期名称, 周期秒数)
+    """
+    for name, seconds in KLINE_INTERVALS:
+        if window / seconds <= 998:
+            return name, seconds
+    return KLINE_INTERVALS[-1]
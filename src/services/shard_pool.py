@@ -0,0 +1,431 @@
+# src/services/shard_pool.py
+"""
+分片评估进程池
+"""
+import bisect
+import hashlib
+import logging
+import multiprocessing
+import threading
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+from .alert_book import AlertBook, AlertRecord, PairSnapshot
+from .threshold_index import Pair, ThresholdIndex
+
+logger = logging.getLogger(__name__)
+
+
+class HashRing:
+    """
+    一致性哈希环
+
+    每个分片在环上放置若干虚拟节点，货币对归属于顺时针方向的第一个节点。
+    分片加入或退出时只有约 1/n 的货币对改变归属。
+    """
+
+    def __init__(self, replicas: int = 64):
+        self.replicas = replicas
+        self._keys: List[int] = []
+        self._nodes: List[int] = []
+
+    @staticmethod
+    def _hash(key: str) -> int:
+        return int.from_bytes(hashlib.md5(key.encode('utf-8')).digest()[:8], 'big')
+
+    def add(self, node: int) -> None:
+        for replica in range(self.replicas):
+            key = self._hash(f"shard-{node}#{replica}")
+            position = bisect.bisect_left(self._keys, key)
+            self._keys.insert(position, key)
+            self._nodes.insert(position, node)
+
+    def remove(self, node: int) -> None:
+        kept = [(key, owner) for key, owner in zip(self._keys, self._nodes) if owner != node]
+        self._keys = [key for key, _ in kept]
+        self._nodes = [owner for _, owner in kept]
+
+    def owner(self, pair: Pair) -> Optional[int]:
+        """获取货币对所属的分片，环为空时返回None"""
+        if not self._keys:
+            return None
+        position = bisect.bisect(self._keys, self._hash(f"{pair[0]}/{pair[1]}"))
+        return self._nodes[position % len(self._nodes)]
+
+    @property
+    def nodes(self) -> List[int]:
+        return sorted(set(self._nodes))
+
+
+def _shard_main(conn, shard_id: int) -> None:
+    """
+    分片进程入口
+
+    分片持有自己货币对的提醒簿，只处理协调进程发来的消息：
+        ('reset', [记录元组])    替换全部记录
+        ('add', [记录元组])      添加或更新记录
+        ('remove', [提醒ID])     移除记录
+        ('drop', [货币对])       移除货币对的全部记录（货币对迁出本分片）
+        ('evaluate', [快照])     评估并回复 ('ok', {货币对: [提醒ID]}, [失败的货币对], {货币对: 规则特征值})
+        ('stop', None)           退出
+
+    整批评估失败时回复 ('error', {}, [], {})，协调进程在本地重新评估该分片的全部快照。
+
+    规则穿越条件需要的上一次特征值随快照传入，由协调进程保存，分片不保存评估状态，
+    货币对迁移到其他分片或交回协调进程评估时不会丢失。
+    """
+    book = AlertBook()
+
+    while True:
+        try:
+            action, payload = conn.recv()
+        except (EOFError, OSError):
+            break
+        except Exception as e:
+            # 无法还原的消息：不知道是否需要回复，协调进程等待评估结果超时后会重启本分片
+            logger.error(f"分片 {shard_id} 无法读取消息: {e}")
+            continue
+
+        if action == 'stop':
+            break
+
+        try:
+            if action == 'reset':
+                book.replace(AlertRecord(*row) for row in payload)
+            elif action == 'add':
+                for row in payload:
+                    book.add(AlertRecord(*row))
+            elif action == 'remove':
+                for alert_id in payload:
+                    book.remove(alert_id)
+            elif action == 'drop':
+                dropped = set(payload)
+                for record in book.records():
+                    if ThresholdIndex.make_pair(record.base_currency, record.quote_currency) in dropped:
+                        book.remove(record.id)
+            elif action == 'evaluate':
+                results: Dict[Pair, List[int]] = {}
+                failed: List[Pair] = []
+                features: Dict[Pair, dict] = {}
+                for snapshot in payload:
+                    try:
+                        results[snapshot.pair] = book.evaluate(snapshot)
+                        if snapshot.features is not None:
+                            features[snapshot.pair] = snapshot.features
+                    except Exception as e:
+                        logger.error(f"分片 {shard_id} 评估 {snapshot.pair} 时发生错误: {e}")
+                        failed.append(snapshot.pair)
+                conn.send(('ok', results, failed, features))
+        except Exception as e:
+            logger.error(f"分片 {shard_id} 处理 {action} 时发生错误: {e}")
+            if action == 'evaluate':
+                # 协调进程收到 'error' 时在本地评估整组快照，不依赖可能有问题的快照内容
+                try:
+                    conn.send(('error', {}, [], {}))
+                except (OSError, ValueError):
+                    break
+
+    conn.close()
+
+
+class _Worker:
+    """协调进程一侧的分片句柄"""
+
+    __slots__ = ('shard_id', 'process', 'conn', 'pending')
+
+    def __init__(self, shard_id: int, process, conn):
+        self.shard_id = shard_id
+        self.process = process
+        self.conn = conn
+        # 尚未发送给分片的提醒簿变更
+        self.pending: List[Tuple[str, list]] = []
+
+    def queue(self, action: str, items: list) -> None:
+        """加入待发送的变更，相邻的同类变更合并为一条消息"""
+        if action == 'reset':
+            self.pending = [('reset', list(items))]
+        elif self.pending and self.pending[-1][0] == action:
+            self.pending[-1][1].extend(items)
+        else:
+            self.pending.append((action, list(items)))
+
+    def flush(self) -> None:
+        for message in self.pending:
+            self.conn.send(message)
+        self.pending = []
+
+
+class ShardPool:
+    """
+    按货币对一致性哈希分片的评估进程池
+
+    协调进程（监控领导者）的提醒簿仍是唯一的数据来源：进程池订阅它的变化，
+    把每条记录转发给所属分片；每轮检查由协调进程获取价格和K线并生成快照，
+    经管道发给各分片并行评估，分片只回复触发的提醒ID。
+
+    分片进程退出或超时未回复时，从哈希环上移除并把它的货币对迁移到其他分片，
+    该分片本轮的快照交回协调进程在本地评估；之后的检查中补足进程数，新分片
+    加入哈希环并接管约 1/n 的货币对。
+    """
+
+    def __init__(self, size: int, start_method: str = 'spawn', timeout: float = 10.0,
+                 replicas: int = 64):
+        self.size = size
+        self.timeout = timeout
+        self._context = multiprocessing.get_context(start_method)
+        self._ring = HashRing(replicas)
+        self._workers: Dict[int, _Worker] = {}
+        self._pair_owner: Dict[Pair, int] = {}
+        self._next_id = 0
+        self._book: Optional[AlertBook] = None
+        self._lock = threading.RLock()
+
+        self._rebalances = 0
+        self._failures = 0
+        self._fallbacks = 0
+
+    def start(self, book: AlertBook) -> None:
+        """
+        启动分片进程并订阅提醒簿
+
+        Args:
+            book: 协调进程的提醒簿
+        """
+        with self._lock:
+            for _ in range(self.size):
+                self._ring.add(self._spawn())
+        self._book = book
+        book.subscribe(self._on_book_change)
+        logger.info(f"分片评估进程池已启动，共 {self.size} 个分片")
+
+    def stop(self) -> None:
+        """停止所有分片进程"""
+        if self._book is not None:
+            self._book.unsubscribe(self._on_book_change)
+            self._book = None
+
+        with self._lock:
+            for shard_id in list(self._workers):
+                self._terminate(shard_id, graceful=True)
+            self._ring = HashRing(self._ring.replicas)
+            self._pair_owner = {}
+        logger.info("分片评估进程池已停止")
+
+    def resize(self, size: int) -> None:
+        """
+        调整分片数量，新分片加入或多余分片退出后重新分配货币对
+
+        Args:
+            size: 新的分片数量
+        """
+        if size < 1:
+            raise ValueError("分片数量至少为1")
+        self.size = size
+        self.ensure_size()
+
+    def ensure_size(self) -> None:
+        """补足或裁减分片进程到配置的数量"""
+        with self._lock:
+            changed = False
+            while len(self._workers) < self.size:
+                self._ring.add(self._spawn())
+                changed = True
+            while len(self._workers) > self.size:
+                shard_id = max(self._workers)
+                self._ring.remove(shard_id)
+                self._terminate(shard_id, graceful=True)
+                changed = True
+
+        if changed:
+            self._rebalance()
+
+    def evaluate(self, snapshots: List[PairSnapshot]) -> Tuple[Dict[Pair, List[int]], List[PairSnapshot]]:
+        """
+        把快照分发到所属分片并行评估
+
+        Args:
+            snapshots: 本轮的价格快照
+
+        Returns:
+            (每个货币对触发的提醒ID, 需要在本地评估的快照)
+        """
+        self.ensure_size()
+
+        results: Dict[Pair, List[int]] = {}
+        fallback: List[PairSnapshot] = []
+        failed_shards: List[int] = []
+
+        with self._lock:
+            groups: Dict[int, List[PairSnapshot]] = defaultdict(list)
+            for snapshot in snapshots:
+                shard_id = self._owner(snapshot.pair)
+                if shard_id is None:
+                    fallback.append(snapshot)
+                else:
+                    groups[shard_id].append(snapshot)
+
+            # 先把变更和快照发给所有分片，再依次收集结果，各分片并行计算
+            sent: List[int] = []
+            for shard_id, worker in list(self._workers.items()):
+                try:
+                    worker.flush()
+                    if shard_id in groups:
+                        worker.conn.send(('evaluate', groups[shard_id]))
+                        sent.append(shard_id)
+                except (OSError, ValueError) as e:
+                    logger.error(f"向分片 {shard_id} 发送数据失败: {e}")
+                    failed_shards.append(shard_id)
+
+            for shard_id in sent:
+                worker = self._workers[shard_id]
+                try:
+                    if not worker.conn.poll(self.timeout):
+                        raise TimeoutError(f"超过 {self.timeout} 秒未回复")
+                    status, shard_results, failed_pairs, features = worker.conn.recv()
+                    if status != 'ok':
+                        logger.error(f"分片 {shard_id} 整批评估失败，在本地评估 {len(groups[shard_id])} 个货币对")
+                        fallback.extend(groups[shard_id])
+                        continue
+                    results.update(shard_results)
+                    failed = set(failed_pairs)
+                    fallback.extend(s for s in groups[shard_id] if s.pair in failed)
+                    # 分片计算的特征值写回协调进程的快照，由提醒簿保存
+                    for snapshot in groups[shard_id]:
+                        if snapshot.pair in features:
+                            snapshot.features = features[snapshot.pair]
+                except (EOFError, OSError, TimeoutError) as e:
+                    logger.error(f"分片 {shard_id} 评估失败: {e}")
+                    failed_shards.append(shard_id)
+
+            for shard_id in failed_shards:
+                fallback.extend(groups.get(shard_id, []))
+                self._ring.remove(shard_id)
+                self._terminate(shard_id, graceful=False)
+                self._failures += 1
+
+            self._fallbacks += len(fallback)
+
+        if failed_shards:
+            self._rebalance()
+
+        return results, fallback
+
+    def get_stats(self) -> Dict[str, Any]:
+        """获取进程池统计"""
+        with self._lock:
+            pairs_per_shard: Dict[int, int] = defaultdict(int)
+            for shard_id in self._pair_owner.values():
+                pairs_per_shard[shard_id] += 1
+            return {
+                'size': self.size,
+                'alive': sum(1 for worker in self._workers.values() if worker.process.is_alive()),
+                'pairs': {str(shard_id): pairs_per_shard.get(shard_id, 0) for shard_id in self._workers},
+                'rebalances': self._rebalances,
+                'failures': self._failures,
+                'fallback_evaluations': self._fallbacks
+            }
+
+    def _owner(self, pair: Pair) -> Optional[int]:
+        shard_id = self._pair_owner.get(pair)
+        return shard_id if shard_id in self._workers else self._ring.owner(pair)
+
+    def _on_book_change(self, action: str, payload: Any) -> None:
+        """提醒簿变化时把变更排入所属分片的待发送队列（在提醒簿锁内调用）"""
+        with self._lock:
+            if action == 'load':
+                grouped: Dict[int, list] = {shard_id: [] for shard_id in self._workers}
+                self._pair_owner = {}
+                for record in payload:
+                    shard_id = self._route(record)
+                    if shard_id is not None:
+                        grouped[shard_id].append(record.as_tuple())
+                for shard_id, rows in grouped.items():
+                    self._workers[shard_id].queue('reset', rows)
+                return
+
+            shard_id = self._route(payload)
+            if shard_id is None:
+                return
+            if action == 'add':
+                self._workers[shard_id].queue('add', [payload.as_tuple()])
+            elif action == 'remove':
+                self._workers[shard_id].queue('remove', [payload.id])
+
+    def _route(self, record: AlertRecord) -> Optional[int]:
+        pair = ThresholdIndex.make_pair(record.base_currency, record.quote_currency)
+        shard_id = self._owner(pair)
+        # 原分片已退出的货币对保留旧的归属，由重新平衡把全部记录迁移到新分片
+        if shard_id is not None and pair not in self._pair_owner:
+            self._pair_owner[pair] = shard_id
+        return shard_id
+
+    def _rebalance(self) -> None:
+        """把归属发生变化的货币对迁移到新的分片"""
+        if self._book is None:
+            return
+
+        def move(records: List[AlertRecord]) -> None:
+            with self._lock:
+                by_pair: Dict[Pair, list] = defaultdict(list)
+                for record in records:
+                    by_pair[ThresholdIndex.make_pair(record.base_currency, record.quote_currency)] \
+                        .append(record.as_tuple())
+
+                moved = 0
+                owners: Dict[Pair, int] = {}
+                for pair, rows in by_pair.items():
+                    new_owner = self._ring.owner(pair)
+                    if new_owner is None:
+                        continue
+                    old_owner = self._pair_owner.get(pair)
+                    owners[pair] = new_owner
+                    if old_owner == new_owner:
+                        continue
+                    if old_owner in self._workers:
+                        self._workers[old_owner].queue('drop', [pair])
+                    self._workers[new_owner].queue('add', rows)
+                    moved += 1
+
+                self._pair_owner = owners
+                self._rebalances += 1
+                logger.info(f"分片重新平衡完成，迁移 {moved} 个货币对，"
+                            f"当前 {len(self._workers)} 个分片")
+
+        # 在提醒簿锁内完成迁移，避免与并发的提醒簿变更交错
+        self._book.visit(move)
+
+    def _spawn(self) -> int:
+        shard_id = self._next_id
+        self._next_id += 1
+
+        parent_conn, child_conn = self._context.Pipe()
+        process = self._context.Process(
+            target=_shard_main,
+            args=(child_conn, shard_id),
+            name=f"AlertShard-{shard_id}",
+            daemon=True
+        )
+        process.start()
+        child_conn.close()
+
+        self._workers[shard_id] = _Worker(shard_id, process, parent_conn)
+        logger.info(f"分片 {shard_id} 已启动 (pid: {process.pid})")
+        return shard_id
+
+    def _terminate(self, shard_id: int, graceful: bool) -> None:
+        worker = self._workers.pop(shard_id, None)
+        if worker is None:
+            return
+
+        try:
+            if graceful:
+                worker.conn.send(('stop', None))
+                worker.process.join(timeout=5)
+        except (OSError, ValueError):
+            pass
+        finally:
+            if worker.process.is_alive():
+                worker.process.terminate()
+                worker.process.join(timeout=5)
+            worker.conn.close()
+
+        logger.info(f"分片 {shard_id} 已退出")
@@ -0,0 +1,314 @@
+# src/services/threshold_index.py
+"""
+提醒阈值索引
+"""
+import threading
+from bisect import bisect_left, bisect_right, insort
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+# 货币对键，如 ('bitcoin', 'usd')
+Pair = Tuple[str, str]
+
+# 有序数组中的元素：(目标价格, 提醒ID)
+_Entry = Tuple[float, int]
+
+
+class _SortedBlocks:
+    """
+    分块的有序数组
+
+    元素按顺序保存在若干个长度不超过 2 * LOAD 的块中，另有一个数组记录每块的最大元素。
+    插入和删除先对块的最大值二分定位块（O(log n)），再在块内二分并移动最多 2 * LOAD 个元素，
+    移动的元素数与总数 n 无关；单个 Python 列表在 n 很大时每次插入删除都要移动 O(n) 个元素。
+    """
+
+    LOAD = 256
+
+    def __init__(self, items: Iterable[_Entry] = ()):
+        items = sorted(items)
+        self._blocks: List[List[_Entry]] = [items[i:i + self.LOAD] for i in range(0, len(items), self.LOAD)]
+        self._maxes: List[_Entry] = [block[-1] for block in self._blocks]
+        self._len = len(items)
+
+    def add(self, item: _Entry) -> None:
+        """插入元素"""
+        if not self._blocks:
+            self._blocks.append([item])
+            self._maxes.append(item)
+            self._len = 1
+            return
+
+        i = min(bisect_left(self._maxes, item), len(self._blocks) - 1)
+        block = self._blocks[i]
+        insort(block, item)
+        self._maxes[i] = block[-1]
+        self._len += 1
+
+        if len(block) > 2 * self.LOAD:
+            self._blocks[i:i + 1] = [block[:self.LOAD], block[self.LOAD:]]
+            self._maxes[i:i + 1] = [block[self.LOAD - 1], block[-1]]
+
+    def remove(self, item: _Entry) -> bool:
+        """删除元素，返回元素是否存在"""
+        i = bisect_left(self._maxes, item)
+        if i == len(self._blocks):
+            return False
+        block = self._blocks[i]
+        pos = bisect_left(block, item)
+        if pos == len(block) or block[pos] != item:
+            return False
+
+        del block[pos]
+        self._len -= 1
+        if block:
+            self._maxes[i] = block[-1]
+        else:
+            del self._blocks[i]
+            del self._maxes[i]
+        return True
+
+    def upto(self, key: _Entry) -> Iterator[_Entry]:
+        """按顺序遍历 <= key 的元素"""
+        j = bisect_right(self._maxes, key)
+        for block in self._blocks[:j]:
+            yield from block
+        if j < len(self._blocks):
+            block = self._blocks[j]
+            yield from block[:bisect_right(block, key)]
+
+    def from_(self, key: _Entry) -> Iterator[_Entry]:
+        """按顺序遍历 >= key 的元素"""
+        i = bisect_left(self._maxes, key)
+        if i < len(self._blocks):
+            block = self._blocks[i]
+            yield from block[bisect_left(block, key):]
+        for block in self._blocks[i + 1:]:
+            yield from block
+
+    def first_after(self, key: _Entry) -> Optional[_Entry]:
+        """> key 的最小元素"""
+        j = bisect_right(self._maxes, key)
+        if j == len(self._blocks):
+            return None
+        block = self._blocks[j]
+        return block[bisect_right(block, key)]
+
+    def last_before(self, key: _Entry) -> Optional[_Entry]:
+        """< key 的最大元素"""
+        i = bisect_left(self._maxes, key)
+        if i < len(self._blocks):
+            block = self._blocks[i]
+            pos = bisect_left(block, key)
+            if pos > 0:
+                return block[pos - 1]
+        return self._maxes[i - 1] if i > 0 else None
+
+    def __len__(self) -> int:
+        return self._len
+
+
+# 不存在的货币对使用的空数组（只读）
+_EMPTY = _SortedBlocks()
+
+
+class ThresholdIndex:
+    """
+    按货币对组织的内存阈值索引
+
+    每个货币对维护两个按目标价格排序的分块数组（_SortedBlocks）：
+    - above: 价格 >= 目标价格时触发，触发集合是数组的前缀
+    - below: 价格 <= 目标价格时触发，触发集合是数组的后缀
+
+    给定新价格时，通过二分查找定位触发的连续区间；插入和删除二分定位块后只移动块内的元素。
+    """
+
+    def __init__(self):
+        self._above: Dict[Pair, _SortedBlocks] = {}
+        self._below: Dict[Pair, _SortedBlocks] = {}
+        self._entries: Dict[int, Tuple[Pair, str, float]] = {}
+        self._lock = threading.RLock()
+        self.loaded = False
+
+    @staticmethod
+    def make_pair(base_currency: str, quote_currency: str) -> Pair:
+        """生成统一格式的货币对键"""
+        return (base_currency.lower(), quote_currency.lower())
+
+    def _bucket(self, condition_type: str) -> Optional[Dict[Pair, _SortedBlocks]]:
+        if condition_type == 'above':
+            return self._above
+        if condition_type == 'below':
+            return self._below
+        return None
+
+    def add(self, alert_id: int, base_currency: str, quote_currency: str,
+            condition_type: str, target_price: float) -> bool:
+        """
+        添加或更新一个提醒
+
+        Args:
+            alert_id: 提醒ID
+            base_currency: 基础货币
+            quote_currency: 计价货币
+            condition_type: 条件类型 ('above' 或 'below')
+            target_price: 目标价格
+
+        Returns:
+            是否已加入索引
+        """
+        bucket = self._bucket(condition_type)
+        if bucket is None:
+            return False
+
+        pair = self.make_pair(base_currency, quote_currency)
+        target_price = float(target_price)
+
+        with self._lock:
+            self.remove(alert_id)
+            targets = bucket.get(pair)
+            if targets is None:
+                targets = bucket[pair] = _SortedBlocks()
+            targets.add((target_price, alert_id))
+            self._entries[alert_id] = (pair, condition_type, target_price)
+        return True
+
+    def remove(self, alert_id: int) -> bool:
+        """
+        从索引中移除提醒
+
+        Args:
+            alert_id: 提醒ID
+
+        Returns:
+            提醒是否存在于索引中
+        """
+        with self._lock:
+            entry = self._entries.pop(alert_id, None)
+            if entry is None:
+                return False
+
+            pair, condition_type, target_price = entry
+            bucket = self._bucket(condition_type)
+            targets = bucket.get(pair)
+            if targets is not None:
+                targets.remove((target_price, alert_id))
+                if not targets:
+                    bucket.pop(pair, None)
+            return True
+
+    def triggered(self, base_currency: str, quote_currency: str, price: float) -> List[int]:
+        """
+        查找在给定价格下触发的提醒
+        
+        Args:
+            base_currency: 基础货币
+            quote_currency: 计价货币
+            price: 当前价格
+            
+        Returns:
+            触发的提醒ID列表
+        """
+        return self.crossed(base_currency, quote_currency, price, price)
+    
+    def crossed(self, base_currency: str, quote_currency: str,
+                low: float, high: float) -> List[int]:
+        """
+        查找在一段时间的价格区间内触发的提醒
+        
+        above 提醒在最高价达到目标时触发，below 提醒在最低价达到目标时触发。
+        
+        Args:
+            base_currency: 基础货币
+            quote_currency: 计价货币
+            low: 区间最低价
+            high: 区间最高价
+            
+        Returns:
+            触发的提醒ID列表
+        """
+        pair = self.make_pair(base_currency, quote_currency)
+        
+        with self._lock:
+            above = self._above.get(pair, _EMPTY)
+            below = self._below.get(pair, _EMPTY)
+            
+            # above: 目标价格 <= high 的前缀
+            # below: 目标价格 >= low 的后缀
+            return [alert_id for _, alert_id in above.upto((high, float('inf')))] + \
+                   [alert_id for _, alert_id in below.from_((low, float('-inf')))]
+    
+    def nearest(self, base_currency: str, quote_currency: str,
+                price: float) -> Tuple[Optional[float], Optional[float]]:
+        """
+        查找给定价格下最近的未触发目标价格
+        
+        Args:
+            base_currency: 基础货币
+            quote_currency: 计价货币
+            price: 当前价格
+            
+        Returns:
+            (above 中高于价格的最小目标, below 中低于价格的最大目标)，不存在时为None
+        """
+        pair = self.make_pair(base_currency, quote_currency)
+        
+        with self._lock:
+            upper = self._above.get(pair, _EMPTY).first_after((price, float('inf')))
+            lower = self._below.get(pair, _EMPTY).last_before((price, float('-inf')))
+            return (upper[0] if upper else None), (lower[0] if lower else None)
+    
+    def pairs(self) -> List[Pair]:
+        """获取索引中所有的货币对"""
+        with self._lock:
+            return list(set(self._above) | set(self._below))
+
+    def count(self, base_currency: str, quote_currency: str) -> int:
+        """获取某个货币对下的提醒数量"""
+        pair = self.make_pair(base_currency, quote_currency)
+        with self._lock:
+            return len(self._above.get(pair, _EMPTY)) + len(self._below.get(pair, _EMPTY))
+
+    def rebuild(self, rows: Iterable[Tuple[int, str, str, str, float]]) -> None:
+        """
+        用 (id, base, quote, condition_type, target_price) 行重建整个索引
+
+        Args:
+            rows: 提醒行
+        """
+        above: Dict[Pair, List[_Entry]] = {}
+        below: Dict[Pair, List[_Entry]] = {}
+        entries: Dict[int, Tuple[Pair, str, float]] = {}
+
+        for alert_id, base_currency, quote_currency, condition_type, target_price in rows:
+            if condition_type == 'above':
+                bucket = above
+            elif condition_type == 'below':
+                bucket = below
+            else:
+                continue
+            pair = self.make_pair(base_currency, quote_currency)
+            bucket.setdefault(pair, []).append((float(target_price), alert_id))
+            entries[alert_id] = (pair, condition_type, float(target_price))
+
+        above_blocks = {pair: _SortedBlocks(targets) for pair, targets in above.items()}
+        below_blocks = {pair: _SortedBlocks(targets) for pair, targets in below.items()}
+
+        with self._lock:
+            self._above = above_blocks
+            self._below = below_blocks
+            self._entries = entries
+            self.loaded = True
+
+    def clear(self) -> None:
+        """清空索引"""
+        with self._lock:
+            self._above = {}
+            self._below = {}
+            self._entries = {}
+            self.loaded = False
+
+    def __contains__(self, alert_id: int) -> bool:
+        return alert_id in self._entries
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,121 @@
+# src/services/tick_trace.py
+"""
+监控检查的分阶段耗时记录
+"""
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+_current = threading.local()
+
+
+class TickTrace:
+    """一轮检查的结构化记录：各阶段耗时、上游请求数、评估和触发的提醒数"""
+
+    def __init__(self, sequence: int, forced: bool = False):
+        self.sequence = sequence
+        self.forced = forced
+        self.started_at = datetime.utcnow()
+        self.phases: Dict[str, float] = {}
+        self.upstream_calls = 0
+        self.pairs = 0
+        self.stats: Dict[str, int] = {}
+        self.duration: Optional[float] = None
+        self.interval: Optional[float] = None
+        self.overrun = False
+        self._started = time.perf_counter()
+
+    @contextmanager
+    def phase(self, name: str):
+        """记录一个阶段的耗时，同名阶段多次进入时累加"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0.0) + time.perf_counter() - started
+
+    def finish(self, stats: Dict[str, int]) -> None:
+        self.duration = time.perf_counter() - self._started
+        self.stats = dict(stats)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """转换为字典格式（耗时单位为毫秒）"""
+        return {
+            'tick': self.sequence,
+            'started_at': self.started_at.isoformat(),
+            'duration_ms': round(self.duration * 1000, 2) if self.duration is not None else None,
+            'phases_ms': {name: round(seconds * 1000, 2) for name, seconds in self.phases.items()},
+            'upstream_calls': self.upstream_calls,
+            'pairs': self.pairs,
+            'alerts_evaluated': self.stats.get('checked', 0),
+            'alerts_fired': self.stats.get('triggered', 0),
+            'alerts_deferred': self.stats.get('deferred', 0),
+            'errors': self.stats.get('errors', 0),
+            'forced': self.forced,
+            'interval': self.interval,
+            'overrun': self.overrun
+        }
+
+
+class TickRecorder:
+    """保存最近若干轮检查记录的环形缓冲区"""
+
+    def __init__(self, capacity: int = 100):
+        self._traces: deque = deque(maxlen=capacity)
+        self._sequence = 0
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def record(self, forced: bool = False):
+        """
+        记录一轮检查，期间当前线程的上游请求计入该记录
+
+        Yields:
+            本轮的检查记录
+        """
+        with self._lock:
+            self._sequence += 1
+            trace = TickTrace(self._sequence, forced)
+
+        previous = getattr(_current, 'trace', None)
+        _current.trace = trace
+        try:
+            yield trace
+        finally:
+            _current.trace = previous
+            if trace.duration is None:
+                trace.finish(trace.stats)
+            with self._lock:
+                self._traces.append(trace)
+
+    def last(self) -> Optional[TickTrace]:
+        """最近一轮检查的记录"""
+        with self._lock:
+            return self._traces[-1] if self._traces else None
+
+    def recent(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        获取最近的检查记录，最新的在前
+
+        Args:
+            limit: 最多返回的条数
+
+        Returns:
+            记录字典列表
+        """
+        with self._lock:
+            traces = list(self._traces)
+        traces.reverse()
+        if limit is not None:
+            traces = traces[:max(0, limit)]
+        return [trace.to_dict() for trace in traces]
+
+
+def count_upstream_call() -> None:
+    """当前线程正在记录检查时，将一次上游请求计入该记录"""
+    trace = getattr(_current, 'trace', None)
+    if trace is not None:
+        trace.upstream_calls += 1
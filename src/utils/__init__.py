@@ -5,9 +5,11 @@
 from .logging_config import setup_logging
 from .validators import validate_currency, validate_price, validate_webhook_url
 from .formatters import format_price, format_currency_pair, format_datetime
+from .pagination import encode_cursor, decode_cursor, parse_fields, parse_limit
 
 __all__ = [
     'setup_logging',
     'validate_currency', 'validate_price', 'validate_webhook_url',
-    'format_price', 'format_currency_pair', 'format_datetime'
+    'format_price', 'format_currency_pair', 'format_datetime',
+    'encode_cursor', 'decode_cursor', 'parse_fields', 'parse_limit'
 ]
@@ -0,0 +1,334 @@
+# src/utils/metrics.py
+"""
+进程内指标注册表（Prometheus 文本格式）
+
+计数器和直方图的写入不加锁：每个线程写自己的一份数据，只有该线程会修改，
+抓取时再把所有线程的数据相加。线程退出后它的数据在下一次抓取时并入
+已退出线程的汇总，不会丢失。仪表盘（gauge）通过回调在抓取时计算。
+"""
+import bisect
+import threading
+import weakref
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# 文本格式的内容类型
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# 默认直方图分桶（秒）
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+LabelValues = Tuple[str, ...]
+
+
+class _Metric:
+    """指标基类"""
+
+    kind = 'untyped'
+
+    def __init__(self, registry: 'MetricsRegistry', name: str, documentation: str,
+                 labelnames: Sequence[str]):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def _key(self, labelvalues: Iterable) -> Tuple[str, LabelValues]:
+        values = tuple(str(value) for value in labelvalues)
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"指标 {self.name} 需要标签 {self.labelnames}")
+        return (self.name, values)
+
+
+class Counter(_Metric):
+    """单调递增的计数器"""
+
+    kind = 'counter'
+
+    def inc(self, amount: float = 1.0, labels: Iterable = ()) -> None:
+        values = self.registry._thread_values()
+        key = self._key(labels)
+        values[key] = values.get(key, 0.0) + amount
+
+    def labels(self, *labelvalues) -> '_BoundCounter':
+        return _BoundCounter(self.registry, self._key(labelvalues))
+
+
+class _BoundCounter:
+    __slots__ = ('registry', 'key')
+
+    def __init__(self, registry: 'MetricsRegistry', key):
+        self.registry = registry
+        self.key = key
+
+    def inc(self, amount: float = 1.0) -> None:
+        values = self.registry._thread_values()
+        values[self.key] = values.get(self.key, 0.0) + amount
+
+
+class Histogram(_Metric):
+    """分桶直方图，每个序列保存各桶计数、总和与次数"""
+
+    kind = 'histogram'
+
+    def __init__(self, registry: 'MetricsRegistry', name: str, documentation: str,
+                 labelnames: Sequence[str], buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(registry, name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, labels: Iterable = ()) -> None:
+        _observe(self.registry, self._key(labels), self.buckets, value)
+
+    def labels(self, *labelvalues) -> '_BoundHistogram':
+        return _BoundHistogram(self.registry, self._key(labelvalues), self.buckets)
+
+
+class _BoundHistogram:
+    __slots__ = ('registry', 'key', 'buckets')
+
+    def __init__(self, registry: 'MetricsRegistry', key, buckets: Tuple[float, ...]):
+        self.registry = registry
+        self.key = key
+        self.buckets = buckets
+
+    def observe(self, value: float) -> None:
+        _observe(self.registry, self.key, self.buckets, value)
+
+
+def _observe(registry: 'MetricsRegistry', key, buckets: Tuple[float, ...], value: float) -> None:
+    values = registry._thread_values()
+    state = values.get(key)
+    if state is None:
+        # 各桶计数（最后一个为 +Inf）、总和、次数
+        state = values[key] = [0] * (len(buckets) + 1) + [0.0, 0]
+    state[bisect.bisect_left(buckets, value)] += 1
+    state[-2] += value
+    state[-1] += 1
+
+
+class Gauge(_Metric):
+    """在抓取时通过回调计算的仪表盘"""
+
+    kind = 'gauge'
+
+    def __init__(self, registry: 'MetricsRegistry', name: str, documentation: str,
+                 labelnames: Sequence[str]):
+        super().__init__(registry, name, documentation, labelnames)
+        self._function: Optional[Callable[[], Dict[LabelValues, float]]] = None
+
+    def set_function(self, function: Optional[Callable[[], Dict[LabelValues, float]]]) -> None:
+        """
+        设置抓取时调用的回调
+
+        Args:
+            function: 返回 {标签值元组: 数值} 的函数，没有标签时键为空元组
+        """
+        self._function = function
+
+    def collect(self) -> Dict[LabelValues, float]:
+        if self._function is None:
+            return {}
+        return {tuple(str(v) for v in labels): value for labels, value in self._function().items()}
+
+
+class MetricsRegistry:
+    """指标注册表"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._local = threading.local()
+        # (线程弱引用, 该线程的数据)
+        self._threads: List[Tuple[weakref.ref, dict]] = []
+        # 已退出线程的数据汇总
+        self._retired: dict = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(self, name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(self, name, documentation, labelnames, buckets))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(self, name, documentation, labelnames))
+
+    def _register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                if type(existing) is not type(metric) or existing.labelnames != metric.labelnames:
+                    raise ValueError(f"指标 {metric.name} 已以不同的类型或标签注册")
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def _thread_values(self) -> dict:
+        values = getattr(self._local, 'values', None)
+        if values is None:
+            values = self._local.values = {}
+            with self._lock:
+                self._threads.append((weakref.ref(threading.current_thread()), values))
+        return values
+
+    def _merge(self, target: dict, source: dict) -> None:
+        for key, value in list(source.items()):
+            if isinstance(value, list):
+                merged = target.get(key)
+                if merged is None:
+                    target[key] = list(value)
+                else:
+                    for position, count in enumerate(value):
+                        merged[position] += count
+            else:
+                target[key] = target.get(key, 0.0) + value
+
+    def snapshot(self) -> dict:
+        """汇总所有线程的计数器和直方图数据"""
+        with self._lock:
+            alive = []
+            for ref, values in self._threads:
+                thread = ref()
+                if thread is None or not thread.is_alive():
+                    self._merge(self._retired, values)
+                else:
+                    alive.append((ref, values))
+            self._threads = alive
+
+            totals: dict = {}
+            self._merge(totals, self._retired)
+            for _, values in alive:
+                self._merge(totals, values)
+            return totals
+
+    def render(self) -> str:
+        """
+        生成 Prometheus 文本格式的指标
+
+        Returns:
+            文本内容
+        """
+        totals = self.snapshot()
+        by_metric: Dict[str, List[Tuple[LabelValues, object]]] = {}
+        for (name, labels), value in totals.items():
+            by_metric.setdefault(name, []).append((labels, value))
+
+        with self._lock:
+            metrics = list(self._metrics.values())
+
+        lines: List[str] = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {_escape_help(metric.documentation)}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+
+            if isinstance(metric, Gauge):
+                try:
+                    samples = sorted(metric.collect().items())
+                except Exception:
+                    samples = []
+                for labels, value in samples:
+                    lines.append(f"{metric.name}{_labels(metric.labelnames, labels)} {_number(value)}")
+                continue
+
+            for labels, value in sorted(by_metric.get(metric.name, [])):
+                if isinstance(metric, Histogram):
+                    cumulative = 0
+                    for bound, count in zip(metric.buckets + (float('inf'),), value):
+                        cumulative += count
+                        bucket_labels = _labels(metric.labelnames + ('le',), labels + (_number(bound),))
+                        lines.append(f"{metric.name}_bucket{bucket_labels} {cumulative}")
+                    series = _labels(metric.labelnames, labels)
+                    lines.append(f"{metric.name}_sum{series} {_number(value[-2])}")
+                    lines.append(f"{metric.name}_count{series} {value[-1]}")
+                else:
+                    lines.append(f"{metric.name}{_labels(metric.labelnames, labels)} {_number(value)}")
+
+        return '\n'.join(lines) + '\n'
+
+
+def _labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ''
+    pairs = ','.join(f'{name}="{_escape_label(value)}"' for name, value in zip(names, values))
+    return '{' + pairs + '}'
+
+
+def _escape_label(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _escape_help(text: str) -> str:
+    return text.replace('\\', '\\\\').replace('\n', '\\n')
+
+
+def _number(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def start_metrics_server(port: int, host: str = '0.0.0.0',
+                         registry: Optional[MetricsRegistry] = None) -> ThreadingHTTPServer:
+    """
+    在后台线程中启动只提供 /metrics 的 HTTP 服务（用于没有 Web 路由的独立进程）
+
+    Args:
+        port: 端口
+        host: 监听地址
+        registry: 指标注册表，默认使用全局注册表
+
+    Returns:
+        HTTP服务实例
+    """
+    registry = registry or REGISTRY
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] != '/metrics':
+                self.send_error(404)
+                return
+            body = registry.render().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', CONTENT_TYPE)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    thread = threading.Thread(target=server.serve_forever, name='MetricsServer', daemon=True)
+    thread.start()
+    return server
+
+
+# 全局注册表
+REGISTRY = MetricsRegistry()
+
+MONITOR_TICK_SECONDS = REGISTRY.histogram(
+    'cryptochart_monitor_tick_seconds', '一轮提醒检查的耗时（秒）')
+MONITOR_ALERTS_CHECKED = REGISTRY.counter(
+    'cryptochart_monitor_alerts_checked_total', '检查过的提醒数')
+MONITOR_ALERTS_TRIGGERED = REGISTRY.counter(
+    'cryptochart_monitor_alerts_triggered_total', '触发的提醒数')
+MONITOR_ERRORS = REGISTRY.counter(
+    'cryptochart_monitor_errors_total', '检查中出错的提醒或货币对数')
+UPSTREAM_REQUEST_SECONDS = REGISTRY.histogram(
+    'cryptochart_upstream_request_seconds', '上游接口请求耗时（秒）', ('upstream', 'endpoint'))
+UPSTREAM_REQUESTS = REGISTRY.counter(
+    'cryptochart_upstream_requests_total', '上游接口请求数（按状态码，网络错误为 error）',
+    ('upstream', 'endpoint', 'status'))
+NOTIFICATION_SEND_SECONDS = REGISTRY.histogram(
+    'cryptochart_notification_send_seconds', 'Discord 通知发送耗时（秒）', ('status',))
+CACHE_REQUESTS = REGISTRY.counter(
+    'cryptochart_cache_requests_total', '缓存查询次数', ('cache', 'result'))
+ACTIVE_ALERTS = REGISTRY.gauge(
+    'cryptochart_active_alerts', '内存提醒簿中的活跃提醒数', ('base_currency', 'quote_currency'))
+DB_LOCK_WAIT_SECONDS = REGISTRY.histogram(
+    'cryptochart_db_lock_wait_seconds', '写事务取得 SQLite 写锁的等待时间（秒）',
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0))
+DB_LOCK_ERRORS = REGISTRY.counter(
+    'cryptochart_db_lock_errors_total', '等待超过 busy_timeout 的 database is locked 错误数')
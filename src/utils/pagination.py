@@ -0,0 +1,96 @@
+# src/utils/pagination.py
+"""
+列表接口的游标分页和字段选择
+
+游标对客户端不透明：按 (created_at, id) 倒序排列时，上一页最后一行的这两个值
+编码为 URL 安全的 base64 字符串，下一页从它之后开始读取（keyset 分页），
+不论翻到第几页都只读取一页的行。
+"""
+import base64
+import json
+from datetime import datetime
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    """
+    生成指向某一行之后的游标
+
+    Args:
+        created_at: 该行的创建时间
+        row_id: 该行的ID
+
+    Returns:
+        游标字符串
+    """
+    raw = json.dumps([created_at.isoformat(), row_id], separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """
+    解析游标
+
+    Args:
+        cursor: encode_cursor 生成的游标
+
+    Returns:
+        (创建时间, ID)
+
+    Raises:
+        ValueError: 游标格式错误
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        created_at, row_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"无效的游标: {cursor}") from e
+
+
+def parse_fields(text: Optional[str], allowed: Sequence[str], default: Iterable[str]) -> List[str]:
+    """
+    解析逗号分隔的字段列表
+
+    Args:
+        text: 请求参数，为空时使用默认字段
+        allowed: 允许的字段（按该顺序输出）
+        default: 默认字段
+
+    Returns:
+        字段列表
+
+    Raises:
+        ValueError: 包含不允许的字段
+    """
+    if not text:
+        requested = set(default)
+    else:
+        requested = {name.strip() for name in text.split(',') if name.strip()}
+        unknown = requested - set(allowed)
+        if unknown:
+            raise ValueError(f"不支持的字段: {', '.join(sorted(unknown))}")
+    return [name for name in allowed if name in requested]
+
+
+def parse_limit(text: Optional[str], default: int, maximum: int) -> int:
+    """
+    解析每页数量
+
+    Args:
+        text: 请求参数，为空时使用默认值
+        default: 默认数量
+        maximum: 数量上限，超过时截断
+
+    Returns:
+        每页数量
+
+    Raises:
+        ValueError: 不是正整数
+    """
+    if text is None or text == '':
+        return default
+    limit = int(text)
+    if limit <= 0:
+        raise ValueError("limit 必须是正整数")
+    return min(limit, maximum)
@@ -0,0 +1,145 @@
+# src/worker.py
+"""
+独立的价格监控进程
+
+只运行价格获取和提醒评估，不加载任何 Web 路由。与 Web 进程分开部署时，
+Web 进程设置 MONITOR_IN_PROCESS=false 关闭进程内监控。
+
+用法:
+    python -m src.worker [--config production] [--interval 30] [--notification-workers 4]
+                         [--shards 4] [--metrics-port 9108] [--once]
+"""
+import argparse
+import logging
+import os
+import signal
+import sys
+import threading
+from typing import List, Optional
+from flask import Flask
+
+from .config import get_config
+from .models import configure_engine, db, read_db, upgrade_schema
+from .services.monitor_service import MonitorService
+from .services.notification_dispatcher import NotificationDispatcher
+from .utils import setup_logging
+from .utils.metrics import start_metrics_server
+
+logger = logging.getLogger(__name__)
+
+# 项目根目录
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def create_worker_app(config_name: Optional[str] = None) -> Flask:
+    """
+    创建只用于数据库访问的最小应用（不注册蓝图和路由）
+
+    Args:
+        config_name: 配置名称
+
+    Returns:
+        Flask应用实例
+    """
+    app = Flask(__name__, instance_path=os.path.join(BASE_DIR, 'instance'))
+
+    config = get_config(config_name)
+    app.config.from_object(config)
+
+    db.init_app(app)
+
+    with app.app_context():
+        configure_engine(db.engine, app.config)
+        read_db.init_app(app, db.engine)
+        db.create_all()
+        upgrade_schema(db.engine)
+
+    return app
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """解析命令行参数，未指定的参数使用配置中的默认值"""
+    parser = argparse.ArgumentParser(description='CryptoChart Pro 独立价格监控进程')
+    parser.add_argument('--config', default=None,
+                        help='配置名称（development / production / testing），默认读取 FLASK_ENV')
+    parser.add_argument('--interval', type=int, default=None,
+                        help='检查间隔（秒），默认 MONITOR_WORKER_CHECK_INTERVAL')
+    parser.add_argument('--notification-workers', type=int, default=None,
+                        help='通知发送线程数，默认 MONITOR_WORKER_NOTIFICATION_WORKERS')
+    parser.add_argument('--shards', type=int, default=None,
+                        help='分片评估进程数，默认 MONITOR_SHARDS（0 表示在监控线程内评估）')
+    parser.add_argument('--metrics-port', type=int, default=None,
+                        help='提供 /metrics 的端口，默认 MONITOR_WORKER_METRICS_PORT（0 表示不提供）')
+    parser.add_argument('--log-level', default=None,
+                        help='日志级别，默认根据 DEBUG 配置选择')
+    parser.add_argument('--once', action='store_true',
+                        help='只执行一轮检查并等待通知发送完成后退出')
+    return parser.parse_args(argv)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    """
+    独立监控进程入口
+
+    Returns:
+        进程退出码
+    """
+    args = parse_args(argv)
+    config = get_config(args.config)
+
+    if args.log_level:
+        log_level = getattr(logging, args.log_level.upper(), logging.INFO)
+    else:
+        log_level = logging.DEBUG if config.DEBUG else logging.INFO
+    setup_logging(log_level, os.path.join(BASE_DIR, config.MONITOR_WORKER_LOG_FILE), app_name="CryptoChartMonitor")
+
+    app = create_worker_app(args.config)
+
+    dispatcher = NotificationDispatcher(
+        workers=args.notification_workers or config.MONITOR_WORKER_NOTIFICATION_WORKERS
+    )
+    monitor = MonitorService(app, dispatcher=dispatcher)
+    if args.shards is not None:
+        monitor.shard_count = args.shards
+
+    interval = args.interval or config.MONITOR_WORKER_CHECK_INTERVAL
+    if not monitor.set_check_interval(interval):
+        return 2
+
+    if args.once:
+        stats = monitor.run_once()
+        logger.info(f"单次检查完成: {stats}")
+        return 0
+
+    stop_event = threading.Event()
+
+    def handle_signal(signum, frame):
+        logger.info(f"收到信号 {signum}，准备退出")
+        stop_event.set()
+
+    signal.signal(signal.SIGTERM, handle_signal)
+    signal.signal(signal.SIGINT, handle_signal)
+
+    metrics_port = args.metrics_port if args.metrics_port is not None else config.MONITOR_WORKER_METRICS_PORT
+    if metrics_port:
+        start_metrics_server(metrics_port)
+        logger.info(f"指标服务已启动: http://0.0.0.0:{metrics_port}/metrics")
+    
+    if not monitor.start():
+        logger.error("价格监控服务启动失败")
+        return 1
+
+    logger.info(f"独立监控进程已启动 (pid: {os.getpid()})，检查间隔: {monitor.check_interval} 秒")
+
+    # 监控线程意外退出时由进程管理器重启
+    while not stop_event.wait(timeout=5):
+        if not monitor.is_running():
+            logger.error("监控线程已退出")
+            return 1
+
+    monitor.stop()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,24 @@
+# tests/conftest.py
+"""
+测试公用的夹具
+"""
+import pytest
+from flask import Flask
+
+from src.config import get_config
+from src.models import db, upgrade_schema
+
+
+@pytest.fixture
+def app(tmp_path):
+    """使用临时 SQLite 数据库的最小应用，测试在应用上下文中执行"""
+    app = Flask(__name__)
+    app.config.from_object(get_config('testing'))
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tmp_path / 'test.db'}"
+    app.config['TESTING'] = True
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        upgrade_schema(db.engine)
+        yield app
+        db.session.remove()
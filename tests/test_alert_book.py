@@ -0,0 +1,53 @@
+# tests/test_alert_book.py
+"""
+提醒簿与变更日志同步的测试
+"""
+from datetime import datetime, timedelta
+
+from src.models import db, Alert, AlertChange
+from src.services.alert_book import AlertBook
+
+
+def create_alert(target_price: float) -> Alert:
+    """创建提醒并记录变更"""
+    alert = Alert(base_currency='bitcoin', quote_currency='usd', condition_type='above',
+                  target_price=target_price, discord_webhook_url='https://discord.com/api/webhooks/1/x')
+    db.session.add(alert)
+    db.session.flush()
+    AlertChange.record(alert.id, 'create')
+    db.session.commit()
+    return alert
+
+
+def expire_journal() -> None:
+    """把已有的变更日志改为超过保留时长"""
+    AlertChange.query.update({AlertChange.created_at: datetime.utcnow() - timedelta(hours=48)})
+    db.session.commit()
+
+
+def test_sync_applies_new_changes(app):
+    book = AlertBook()
+    book.load()
+
+    alert = create_alert(100.0)
+
+    assert book.sync() == 1
+    assert alert.id in book
+
+
+def test_sync_after_journal_pruned_empty(app):
+    first = create_alert(100.0)
+    expire_journal()
+
+    book = AlertBook()
+    book.load()
+    # 加载时清理了所有已应用的过期日志
+    assert AlertChange.query.count() == 0
+    assert first.id in book
+
+    second = create_alert(200.0)
+
+    # 清空后的新变更序号仍然大于已同步到的位置
+    assert AlertChange.latest_id() > 1
+    assert book.sync() == 1
+    assert second.id in book
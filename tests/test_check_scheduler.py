@@ -0,0 +1,60 @@
+# tests/test_check_scheduler.py
+"""
+自适应检查调度的测试
+"""
+import pytest
+
+from src.services.check_scheduler import CheckScheduler
+
+PAIR = ('bitcoin', 'usd')
+
+
+def make_scheduler() -> CheckScheduler:
+    return CheckScheduler(5, 600, interval=30, near_target=0.01)
+
+
+def test_unknown_variance_uses_floor():
+    scheduler = make_scheduler()
+    assert scheduler.delay(PAIR, 100.0, 100.02, None) == 5
+
+
+def test_unchanged_price_falls_back_to_interval():
+    scheduler = make_scheduler()
+    scheduler.observe(PAIR, 100.0, now=0.0)
+    scheduler.observe(PAIR, 100.0, now=30.0)
+
+    # 目标只差 0.02%，价格源返回了缓存的相同价格
+    assert scheduler.delay(PAIR, 100.0, 100.02, None) == 30
+    assert scheduler.delay(PAIR, 100.0, 1000.0, None) == 30
+
+
+def test_near_target_capped_at_interval():
+    scheduler = make_scheduler()
+    scheduler.observe(PAIR, 100.0, now=0.0)
+    scheduler.observe(PAIR, 100.0001, now=30.0)
+
+    # 波动率极低，按距离推算会超过固定间隔
+    assert scheduler.delay(PAIR, 100.0, 100.5, None) == 30
+    assert scheduler.delay(PAIR, 100.0, None, 99.5) == 30
+    # 较远的目标仍然可以推迟到上限
+    assert scheduler.delay(PAIR, 100.0, 150.0, None) == 600
+
+
+def test_delay_within_floor_and_ceiling():
+    scheduler = make_scheduler()
+    scheduler.observe(PAIR, 100.0, now=0.0)
+    scheduler.observe(PAIR, 110.0, now=1.0)
+
+    assert scheduler.delay(PAIR, 100.0, 100.5, None) == 5
+    assert scheduler.delay(PAIR, 100.0, None, None) == 600
+
+
+@pytest.mark.parametrize('max_delay', [10, 30])
+def test_schedule_respects_max_delay(max_delay):
+    scheduler = make_scheduler()
+    scheduler.observe(PAIR, 100.0, now=0.0)
+    scheduler.observe(PAIR, 100.0001, now=30.0)
+
+    assert scheduler.schedule(PAIR, 100.0, 150.0, None, now=30.0, max_delay=max_delay) == max_delay
+    assert not scheduler.is_due(PAIR, now=30.0 + max_delay - 1)
+    assert scheduler.is_due(PAIR, now=30.0 + max_delay)
@@ -0,0 +1,49 @@
+# tests/test_migrations.py
+"""
+数据库结构迁移的测试
+"""
+from src.models import db, AlertChange, upgrade_schema
+
+
+def table_sql(conn, name: str) -> str:
+    return conn.exec_driver_sql(
+        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)
+    ).scalar()
+
+
+def test_alert_changes_rebuilt_with_autoincrement(app):
+    # 模拟迁移 4 之前创建的 alert_changes 表
+    with db.engine.connect() as conn:
+        conn.exec_driver_sql('DROP TABLE alert_changes')
+        conn.exec_driver_sql(
+            'CREATE TABLE alert_changes (id INTEGER NOT NULL PRIMARY KEY, alert_id INTEGER NOT NULL, '
+            'action VARCHAR(20) NOT NULL, created_at DATETIME NOT NULL)'
+        )
+        conn.exec_driver_sql(
+            "INSERT INTO alert_changes (id, alert_id, action, created_at) "
+            "VALUES (7, 1, 'create', '2026-01-01 00:00:00')"
+        )
+        conn.exec_driver_sql('PRAGMA user_version = 3')
+        conn.commit()
+
+    applied = upgrade_schema(db.engine)
+    assert [item.version for item in applied] == [4]
+
+    with db.engine.connect() as conn:
+        assert 'AUTOINCREMENT' in table_sql(conn, 'alert_changes').upper()
+        assert table_sql(conn, 'alert_changes_new') is None
+
+    assert [change.id for change in AlertChange.query.all()] == [7]
+
+    # 清空后序号继续递增
+    AlertChange.query.delete()
+    AlertChange.record(1, 'update')
+    db.session.commit()
+    assert AlertChange.latest_id() == 8
+
+    # 已经是 AUTOINCREMENT 的表不会重建
+    with db.engine.connect() as conn:
+        conn.exec_driver_sql('PRAGMA user_version = 3')
+        conn.commit()
+    upgrade_schema(db.engine)
+    assert AlertChange.latest_id() == 8
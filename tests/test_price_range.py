@@ -0,0 +1,64 @@
+# tests/test_price_range.py
+"""
+用1分钟K线判断两次检查之间穿越目标价格的测试
+"""
+import numpy as np
+
+from src.services.alert_book import AlertBook, AlertRecord, PairSnapshot
+from src.services.price_service import PriceService
+
+MINUTE = 60000
+SINCE = 10 * MINUTE + 30000  # 区间起点在第11根K线中间
+
+
+def kline(minute: int, high: float, low: float, close: float):
+    """(开盘时间, 最高价, 最低价, 收盘价)"""
+    return (minute * MINUTE, high, low, close)
+
+
+def price_range(klines, quote_currency='usd', since_ms=SINCE, current_price=100.0):
+    return PriceService().get_price_range('bitcoin', quote_currency, since_ms, current_price, klines)
+
+
+def test_kline_opened_before_window_uses_close_only():
+    klines = {'BTC': np.array([
+        kline(9, 130.0, 70.0, 100.0),   # 完全在区间之前
+        kline(10, 120.0, 80.0, 100.0),  # 跨越区间起点，高低点可能在起点之前
+        kline(11, 101.0, 99.0, 100.0),
+    ])}
+
+    assert price_range(klines) == (99.0, 101.0)
+
+
+def test_kline_opened_at_window_start_counts_fully():
+    klines = {'BTC': np.array([
+        kline(10, 120.0, 80.0, 100.0),
+        kline(11, 101.0, 99.0, 100.0),
+    ])}
+
+    assert price_range(klines, since_ms=10 * MINUTE) == (80.0, 120.0)
+
+
+def test_cross_quote_uses_closes():
+    klines = {
+        'BTC': np.array([kline(10, 300.0, 100.0, 200.0), kline(11, 220.0, 200.0, 210.0)]),
+        'ETH': np.array([kline(10, 20.0, 1.0, 10.0), kline(11, 10.0, 10.0, 10.0)]),
+    }
+
+    low, high = price_range(klines, quote_currency='ethereum', current_price=21.0)
+    assert (low, high) == (20.0, 21.0)
+
+
+def test_alert_armed_before_window_ignores_earlier_spike():
+    book = AlertBook()
+    # 提醒在区间起点之前加入提醒簿，可以按区间判断穿越
+    book.replace([AlertRecord(1, 'bitcoin', 'usd', 'above', 110.0, armed_at=SINCE / 1000 - 5)])
+    klines = {'BTC': np.array([kline(10, 120.0, 80.0, 100.0), kline(11, 101.0, 99.0, 100.0)])}
+
+    low, high = price_range(klines)
+    assert book.evaluate(PairSnapshot('bitcoin', 'usd', 100.0, low, high, SINCE)) == []
+
+    # 区间内的K线达到目标时触发
+    klines['BTC'][1] = kline(11, 111.0, 99.0, 100.0)
+    low, high = price_range(klines)
+    assert book.evaluate(PairSnapshot('bitcoin', 'usd', 100.0, low, high, SINCE)) == [1]
@@ -0,0 +1,121 @@
+# tests/test_shard_pool.py
+"""
+分片评估进程池的测试
+"""
+import multiprocessing
+import os
+import signal
+import threading
+import time
+
+import pytest
+
+from src.services.alert_book import AlertBook, AlertRecord, PairSnapshot
+from src.services.shard_pool import HashRing, ShardPool, _shard_main
+
+QUOTES = [f'q{i}' for i in range(8)]
+
+
+@pytest.fixture
+def shard_conn():
+    """在线程中运行分片主循环，返回协调进程一侧的管道"""
+    parent, child = multiprocessing.Pipe()
+    thread = threading.Thread(target=_shard_main, args=(child, 0), daemon=True)
+    thread.start()
+    yield parent
+    parent.send(('stop', None))
+    thread.join(timeout=5)
+
+
+@pytest.fixture
+def pool_and_book():
+    book = AlertBook()
+    pool = ShardPool(2, start_method='fork', timeout=5)
+    pool.start(book)
+    yield pool, book
+    pool.stop()
+
+
+def evaluate(pool: ShardPool, book: AlertBook, snapshots):
+    """按监控服务的方式评估：分片失败的快照在本地评估，之后保存规则特征值"""
+    results, fallback = pool.evaluate(snapshots)
+    for snapshot in fallback:
+        results[snapshot.pair] = book.evaluate(snapshot)
+    book.remember_features(snapshots)
+    return sorted(alert_id for ids in results.values() for alert_id in ids), len(fallback)
+
+
+def rule_tick(book: AlertBook, price: float, now: float):
+    return [PairSnapshot('bitcoin', quote, price, now=now,
+                         previous=book.previous_features(('bitcoin', quote), now, 60))
+            for quote in QUOTES]
+
+
+def test_hash_ring_moves_few_pairs():
+    ring = HashRing()
+    for node in range(4):
+        ring.add(node)
+    pairs = [('bitcoin', f'q{i}') for i in range(2000)]
+    before = {pair: ring.owner(pair) for pair in pairs}
+
+    ring.remove(3)
+
+    moved = sum(1 for pair in pairs if ring.owner(pair) != before[pair])
+    assert moved == sum(1 for owner in before.values() if owner == 3)
+
+
+def test_shard_replies_error_for_bad_payload(shard_conn):
+    shard_conn.send(('add', [(1, 'bitcoin', 'usd', 'above', 100.0, None, 0.0)]))
+    shard_conn.send(('evaluate', [object()]))
+    assert shard_conn.poll(5)
+    assert shard_conn.recv() == ('error', {}, [], {})
+
+    # 分片仍然可以继续评估
+    shard_conn.send(('evaluate', [PairSnapshot('bitcoin', 'usd', 150.0)]))
+    assert shard_conn.poll(5)
+    status, results, failed, _ = shard_conn.recv()
+    assert (status, results, failed) == ('ok', {('bitcoin', 'usd'): [1]}, [])
+
+
+def test_pool_matches_local_evaluation(pool_and_book):
+    pool, book = pool_and_book
+    book.replace([AlertRecord(i + 1, 'bitcoin', quote, 'above', 100.0 + i, armed_at=0.0)
+                  for i, quote in enumerate(QUOTES)])
+
+    fired, fallback = evaluate(pool, book, [PairSnapshot('bitcoin', quote, 104.0) for quote in QUOTES])
+
+    assert fallback == 0
+    assert fired == [1, 2, 3, 4, 5]
+
+
+def test_rule_crossing_survives_shard_failure(pool_and_book):
+    pool, book = pool_and_book
+    book.replace([AlertRecord(i + 1, 'bitcoin', quote, 'rule', 0.0, 'price crosses_above 100', armed_at=0.0)
+                  for i, quote in enumerate(QUOTES)])
+
+    assert evaluate(pool, book, rule_tick(book, 90.0, 1000.0)) == ([], 0)
+
+    # 杀掉一个分片，它的货币对交回协调进程评估，上一次的特征值由协调进程保存
+    worker = next(iter(pool._workers.values()))
+    os.kill(worker.process.pid, signal.SIGKILL)
+    time.sleep(0.2)
+    fired, fallback = evaluate(pool, book, rule_tick(book, 110.0, 1030.0))
+    assert fired == list(range(1, len(QUOTES) + 1))
+    assert fallback > 0
+
+    # 迁移到其他分片的货币对同样可以判断穿越
+    assert evaluate(pool, book, rule_tick(book, 90.0, 1060.0))[0] == []
+    assert evaluate(pool, book, rule_tick(book, 110.0, 1090.0)) == (list(range(1, len(QUOTES) + 1)), 0)
+
+
+def test_stale_previous_features_do_not_cross(pool_and_book):
+    pool, book = pool_and_book
+    book.replace([AlertRecord(1, 'bitcoin', 'q0', 'rule', 0.0, 'price crosses_above 100', armed_at=0.0)])
+
+    evaluate(pool, book, [PairSnapshot('bitcoin', 'q0', 90.0, now=1000.0)])
+    now = 2000.0
+    snapshot = PairSnapshot('bitcoin', 'q0', 110.0, now=now,
+                            previous=book.previous_features(('bitcoin', 'q0'), now, 60))
+
+    assert snapshot.previous is None
+    assert evaluate(pool, book, [snapshot])[0] == []
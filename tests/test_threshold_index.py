@@ -0,0 +1,91 @@
+# tests/test_threshold_index.py
+"""
+阈值索引的测试
+"""
+import random
+
+import pytest
+
+from src.services.threshold_index import ThresholdIndex, _SortedBlocks
+
+
+@pytest.fixture
+def small_blocks(monkeypatch):
+    """使用很小的块，让少量数据也会触发块的拆分和合并"""
+    monkeypatch.setattr(_SortedBlocks, 'LOAD', 4)
+
+
+def test_triggered_at_boundaries():
+    index = ThresholdIndex()
+    index.add(1, 'BTC', 'USD', 'above', 100.0)
+    index.add(2, 'btc', 'usd', 'above', 110.0)
+    index.add(3, 'btc', 'usd', 'below', 90.0)
+    index.add(4, 'btc', 'usd', 'below', 80.0)
+
+    assert index.triggered('btc', 'usd', 100.0) == [1]
+    assert index.triggered('btc', 'usd', 99.99) == []
+    assert index.triggered('btc', 'usd', 90.0) == [3]
+    assert sorted(index.triggered('btc', 'usd', 80.0)) == [3, 4]
+    assert index.triggered('eth', 'usd', 1000.0) == []
+
+
+def test_crossed_and_nearest():
+    index = ThresholdIndex()
+    index.add(1, 'btc', 'usd', 'above', 105.0)
+    index.add(2, 'btc', 'usd', 'below', 95.0)
+    index.add(3, 'btc', 'usd', 'above', 120.0)
+
+    assert index.crossed('btc', 'usd', 96.0, 104.0) == []
+    assert sorted(index.crossed('btc', 'usd', 94.0, 106.0)) == [1, 2]
+    assert index.nearest('btc', 'usd', 100.0) == (105.0, 95.0)
+    assert index.nearest('btc', 'usd', 130.0) == (None, 95.0)
+
+
+def test_update_and_remove():
+    index = ThresholdIndex()
+    index.add(1, 'btc', 'usd', 'above', 100.0)
+    index.add(1, 'btc', 'usd', 'below', 100.0)
+
+    assert len(index) == 1
+    assert index.triggered('btc', 'usd', 150.0) == []
+    assert index.triggered('btc', 'usd', 50.0) == [1]
+
+    assert index.remove(1)
+    assert not index.remove(1)
+    assert index.pairs() == []
+
+
+def test_matches_reference_under_random_changes(small_blocks):
+    rng = random.Random(1)
+    index = ThresholdIndex()
+    reference = {}
+
+    for step in range(5000):
+        alert_id = rng.randrange(200)
+        if rng.random() < 0.6:
+            condition, price = rng.choice(['above', 'below']), float(rng.randrange(100))
+            index.add(alert_id, 'btc', 'usd', condition, price)
+            reference[alert_id] = (condition, price)
+        else:
+            assert index.remove(alert_id) == (alert_id in reference)
+            reference.pop(alert_id, None)
+
+        if step % 25 == 0:
+            low = rng.randrange(100)
+            high = low + rng.randrange(20)
+            expected = sorted(alert_id for alert_id, (condition, price) in reference.items()
+                              if (condition == 'above' and price <= high)
+                              or (condition == 'below' and price >= low))
+            assert sorted(index.crossed('btc', 'usd', low, high)) == expected
+
+            price = low + 0.5
+            uppers = [p for c, p in reference.values() if c == 'above' and p > price]
+            lowers = [p for c, p in reference.values() if c == 'below' and p < price]
+            assert index.nearest('btc', 'usd', price) == (min(uppers, default=None),
+                                                          max(lowers, default=None))
+            assert index.count('btc', 'usd') == len(reference)
+
+    rebuilt = ThresholdIndex()
+    rebuilt.rebuild((alert_id, 'btc', 'usd', condition, price)
+                    for alert_id, (condition, price) in reference.items())
+    assert sorted(rebuilt.crossed('btc', 'usd', 0, 100)) == sorted(index.crossed('btc', 'usd', 0, 100))